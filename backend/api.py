@@ -4,18 +4,351 @@ The frontend sends a POST request to the backend to run a simulation,
 and gets the result back in return.
 """
 
-from fastapi import FastAPI
+import hashlib
+import os
+from contextlib import asynccontextmanager
+from typing import Annotated
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from pydantic import TypeAdapter, ValidationError
 import uvicorn
-from backend.backend import run_simulation
-from frontend.computation_request import ComputationRequest
+from backend import backend
+from backend.backend import (NonConvergingChainError,
+                             get_response_kernel,
+                             response_kernel_cache,
+                             run_simulation, 
+                             run_simulation_trajectory,
+                             run_steady_state_simulation, 
+                             transition_matrix_cache)
+from backend.batch import run_simulation_batch
+from backend.cache import LRUCache, SingleFlight, get_cache_size
+from backend.chain import run_chain_simulation
+from backend.chain_request import ChainRequest
+from backend.chain_result import ChainResult
+from backend.columnar import (NPZ_MEDIA_TYPE,
+                              decode_columns,
+                              encode_columns,
+                              run_simulation_columns)
+from backend.inverse import solve_required_inputs
+from backend.inverse_request import InverseRequest
+from backend.inverse_result import InverseResult
+from backend.job_request import JobRequest
+from backend.job_status import JobStatus
+from backend.jobs import JobQueueFullError, create_job_manager
+from backend import metrics
+from backend.kernel_result import KernelResult
+from backend.monte_carlo import run_monte_carlo
+from backend.monte_carlo_request import MonteCarloRequest
+from backend.monte_carlo_result import MonteCarloResult
+from backend.optimization_request import OptimizationRequest
+from backend.optimization_result import OptimizationResult
+from backend.optimizer import optimize_layout
+from backend.precompute import load_precomputed_kernels
 from backend.result_request import ResultRequest
+from backend.sensitivity import run_sensitivity_analysis, run_sensitivity_grid
+from backend.sensitivity_request import SensitivityGridRequest
+from backend.sensitivity_result import SensitivityGridResult, SensitivityResult
+from backend.steady_state_result import SteadyStateResult
+from backend.throughput import plan_throughput
+from backend.throughput_request import ThroughputRequest
+from backend.throughput_result import ThroughputResult
+from frontend.computation_request import ComputationRequest
+
+job_manager = create_job_manager()
+#Results of /simulate, keyed on the canonical JSON of the request (see get_request_key).
+#The size can be tuned with the RESPONSE_CACHE_SIZE environment variable.
+response_cache = LRUCache(get_cache_size("RESPONSE_CACHE_SIZE", 4096))
+#Identical /simulate requests which arrive at the same time share one computation.
+simulate_flight = SingleFlight()
+#How long clients and proxies may reuse a /simulate result, see simulate.
+CACHE_MAX_AGE_SECONDS = int(os.environ.get("SIMULATE_CACHE_MAX_AGE_SECONDS", 3600))
+#Part of every ETag, so it has to be changed whenever the results of the simulation change.
+#Otherwise clients would keep using results from before the change.
+ETAG_VERSION = "1"
+#Every worker memory-maps the same file, so the table is only held in memory once.
+backend.use_precomputed_kernels(load_precomputed_kernels())
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    """
+    Stops the process pool running the jobs when the API shuts down.
+    """
+    yield
+    job_manager.shutdown()
+
+app = FastAPI(lifespan=lifespan)
+#The instrumentation is only added if the metrics are turned on (see metrics.py).
+#The route class has to be set before the endpoints below are added.
+if metrics.enabled:
+    app.router.route_class = metrics.InstrumentedRoute
+    app.add_middleware(metrics.MetricsMiddleware)
+
+@app.exception_handler(NonConvergingChainError)
+def non_converging_chain(_: Request, error: NonConvergingChainError) -> JSONResponse:
+    """
+    Returns 422 for layouts which never converge, from any endpoint.
+    """
+    return JSONResponse(status_code=422, content={"detail": str(error)})
+
+def get_request_key(computation_request: ComputationRequest) -> str:
+    """
+    Returns the canonical JSON of the request. Requests which only differ in the order
+    of their fields, their whitespace or left out defaults have the same key.
+    """
+    return computation_request.model_dump_json()
 
-app = FastAPI()
+def get_etag(request_key: str) -> str:
+    """
+    Returns the ETag of the result of a request. The simulation is deterministic,
+    so the ETag only depends on the request and not on the computed result.
+    """
+    return '"' + hashlib.sha256((ETAG_VERSION + request_key).encode()).hexdigest()[:32] + '"'
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Returns True if the If-None-Match header contains the ETag (or is *).
+    """
+    if if_none_match is None:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
 
 @app.post("/simulate", response_model=ResultRequest)
-def simulate(computation_request: ComputationRequest) -> ResultRequest:
-    result = run_simulation(computation_request)
-    return result
+def simulate(computation_request: ComputationRequest,
+             request: Request,
+             response: Response) -> ResultRequest:
+    """
+    Runs a single simulation.
+    Returns 304 Not Modified without running it if the client already has the result,
+    i.e. if it sends the ETag of an earlier response in the If-None-Match header.
+    """
+    metrics.observe_iterations(computation_request.number_of_iterations)
+    request_key = get_request_key(computation_request)
+    headers = {"ETag": get_etag(request_key),
+               "Cache-Control": f"max-age={CACHE_MAX_AGE_SECONDS}"}
+    if etag_matches(request.headers.get("If-None-Match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return response_cache.get_or_create(
+        request_key,
+        lambda: simulate_flight.run(request_key, lambda: run_simulation(computation_request)))
+
+@app.post("/simulate/stream")
+def simulate_stream(computation_request: ComputationRequest) -> StreamingResponse:
+    """
+    Streams the result after every iteration as newline-delimited JSON,
+    one ResultRequest per line, so line i is the result after i iterations.
+    """
+    if computation_request.number_of_iterations == "infinite":
+        raise HTTPException(status_code=422, 
+                            detail="The trajectory needs a finite number of iterations.")
+    metrics.observe_iterations(computation_request.number_of_iterations)
+    lines = (result.model_dump_json() + "\n" 
+             for result in run_simulation_trajectory(computation_request))
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+def run_json_batch(body: bytes) -> list[ResultRequest]:
+    """
+    Runs the simulations for a JSON list of ComputationRequests.
+    """
+    try:
+        computation_requests = computation_requests_adapter.validate_json(body)
+    except ValidationError as e:
+        #Same error format as the endpoints which let FastAPI validate the body.
+        raise RequestValidationError([{**error, "loc": ("body", *error["loc"])}
+                                      for error in e.errors(include_url=False)]) from e
+    for computation_request in computation_requests:
+        metrics.observe_iterations(computation_request.number_of_iterations)
+    return run_simulation_batch(computation_requests)
+
+def run_columnar_batch(body: bytes) -> Response:
+    """
+    Runs the simulations for an .npz archive of columns, see columnar.py.
+    """
+    try:
+        columns = decode_columns(body)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e)) from e
+    metrics.observe_iteration_counts(columns["number_of_iterations"],
+                                     columns["infinite_iterations"])
+    return Response(encode_columns(run_simulation_columns(columns)), media_type=NPZ_MEDIA_TYPE)
+
+computation_requests_adapter = TypeAdapter(list[ComputationRequest])
+
+@app.post("/simulate_batch", response_model=list[ResultRequest], openapi_extra={
+    "requestBody": {"required": True, "content": {
+        "application/json": {"schema": computation_requests_adapter.json_schema(
+            ref_template="#/components/schemas/{model}")},
+        NPZ_MEDIA_TYPE: {"schema": {"type": "string", "format": "binary"}}}}})
+async def simulate_batch(request: Request):
+    """
+    Runs many simulations at once. The results are returned in request order.
+    The body is either a JSON list of ComputationRequests, or (with the Content-Type
+    application/x-npz) an .npz archive with one array per field, in which case
+    the results are returned as an .npz archive with one array per quality_N_count.
+    """
+    body = await request.body()
+    #The simulations run in the thread pool, just like the other (non-async) endpoints.
+    if request.headers.get("content-type", "").startswith(NPZ_MEDIA_TYPE):
+        return await run_in_threadpool(run_columnar_batch, body)
+    return await run_in_threadpool(run_json_batch, body)
+
+@app.post("/simulate_chain", response_model=ChainResult)
+def simulate_chain(chain_request: ChainRequest) -> ChainResult:
+    """
+    Runs a simulation of a chain of production stages, each with its own machine and modules.
+    """
+    try:
+        return run_chain_simulation(chain_request)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e)) from e
+
+@app.post("/steady_state", response_model=SteadyStateResult)
+def steady_state(computation_request: ComputationRequest, 
+                 threshold: Annotated[float, Query(gt=0)] = 0.01) -> SteadyStateResult:
+    """
+    Returns the result after infinitely many iterations, and how many iterations it takes
+    until less than threshold items are left which aren't legendary yet.
+    """
+    return run_steady_state_simulation(computation_request, threshold)
+
+@app.post("/optimize", response_model=OptimizationResult)
+def optimize(optimization_request: OptimizationRequest) -> OptimizationResult:
+    """
+    Returns the module layouts with the best trade-off between legendary yield and module cost.
+    """
+    try:
+        return optimize_layout(optimization_request)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e)) from e
+
+@app.post("/kernel", response_model=KernelResult)
+def kernel(computation_request: ComputationRequest) -> KernelResult:
+    """
+    Returns the response kernel for the layout and number of iterations in the request,
+    so clients can calculate the result for any starting counts themselves.
+    The starting counts in the request are ignored.
+    """
+    return KernelResult(kernel=get_response_kernel(computation_request).tolist())
+
+@app.post("/sensitivity", response_model=SensitivityResult)
+def sensitivity(computation_request: ComputationRequest) -> SensitivityResult:
+    """
+    Returns the result of the simulation along with the derivatives of every tier
+    with respect to the productivity and quality boost of the assembly machine.
+    """
+    return run_sensitivity_analysis(computation_request)
+
+@app.post("/sensitivity/grid", response_model=SensitivityGridResult)
+def sensitivity_grid(grid_request: SensitivityGridRequest) -> SensitivityGridResult:
+    """
+    Returns the number of legendary items and its derivatives for every combination
+    of research level and module count.
+    """
+    try:
+        return run_sensitivity_grid(grid_request)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e)) from e
+
+@app.post("/inverse", response_model=InverseResult)
+def inverse(inverse_request: InverseRequest) -> InverseResult:
+    """
+    Returns the starting items needed to end up with the target number of items of each quality.
+    """
+    try:
+        return solve_required_inputs(inverse_request)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e)) from e
+
+@app.post("/throughput", response_model=ThroughputResult)
+def throughput(throughput_request: ThroughputRequest) -> ThroughputResult:
+    """
+    Returns the input rate and the number of assemblers and recyclers needed
+    for every production line to make its target number of legendary items per minute.
+    """
+    try:
+        return plan_throughput(throughput_request)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e)) from e
+
+@app.post("/monte_carlo", response_model=MonteCarloResult)
+def monte_carlo(monte_carlo_request: MonteCarloRequest) -> MonteCarloResult:
+    """
+    Samples the number of items of each quality over many trials and returns
+    the mean, standard deviation and quantiles for each quality.
+    """
+    try:
+        return run_monte_carlo(monte_carlo_request)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e)) from e
+
+@app.post("/jobs", response_model=JobStatus, status_code=202)
+def submit_job(job_request: JobRequest) -> JobStatus:
+    """
+    Submits a long-running job and returns its id right away.
+    The job runs in a separate process pool, so it doesn't slow down /simulate.
+    """
+    try:
+        return job_manager.submit(job_request)
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e)) from e
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e)) from e
+
+@app.get("/jobs/{job_id}", response_model=JobStatus)
+def get_job(job_id: str) -> JobStatus:
+    """
+    Returns the status and progress of a job, and its result once it's done.
+    """
+    job_status = job_manager.get(job_id)
+    if job_status is None:
+        raise HTTPException(status_code=404, detail="No such job, or the job has expired.")
+    return job_status
+
+@app.delete("/jobs/{job_id}", response_model=JobStatus)
+def cancel_job(job_id: str) -> JobStatus:
+    """
+    Cancels a job.
+    """
+    job_status = job_manager.cancel(job_id)
+    if job_status is None:
+        raise HTTPException(status_code=404, detail="No such job, or the job has expired.")
+    return job_status
+
+def get_cache_stats() -> dict:
+    """
+    Returns the stats of every cache, and of the precomputed kernels if there are any.
+    """
+    stats = {"transition_matrices": transition_matrix_cache.stats(),
+             "response_kernels": response_kernel_cache.stats(),
+             "responses": response_cache.stats()}
+    if backend.precomputed_kernels is not None:
+        stats["precomputed_kernels"] = backend.precomputed_kernels.stats()
+    return stats
+
+@app.get("/cache_stats")
+def cache_stats() -> dict:
+    """
+    Returns the size and hit/miss/eviction counters of the backend caches,
+    and how many /simulate requests shared a computation with an identical request.
+    """
+    return {**get_cache_stats(), "coalescing": simulate_flight.stats()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics() -> PlainTextResponse:
+    """
+    Returns the request counters, the latency histograms of every stage,
+    the distribution of the number of iterations and the cache counters
+    in the Prometheus text format.
+    """
+    if not metrics.enabled:
+        raise HTTPException(status_code=404, detail="Metrics are turned off.")
+    cache_lines = metrics.render_cache_stats(get_cache_stats()) + \
+        metrics.render_coalescing_stats(simulate_flight.stats())
+    return PlainTextResponse(metrics.render_metrics(cache_lines),
+                             media_type="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)
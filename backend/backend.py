@@ -10,8 +10,13 @@ compared to the base machine. Same thing goes for quality boost.
 """
 
 
+from functools import cache
+from typing import Iterator
 import numpy as np
+from backend.cache import LRUCache, MatrixPowers, TransitionMatrixCache, get_cache_size
+from backend.metrics import time_stage, timed_stage
 from backend.result_request import ResultRequest
+from backend.steady_state_result import SteadyStateResult
 from frontend.computation_request import ComputationRequest
 
 def get_quality_chip_score():
@@ -35,53 +40,74 @@ def calculate_productivity_boost(number_of_productivity_chips=0,
                                  research_boost=0):
     """
     Calculates the total productivity boost from prod chips, research etc.
+    Works on scalars as well as NumPy arrays of equal shape (one entry per request).
     """
     if recycling:
         #Recyclers always destroy 75% of the input, 
         #which is effectively a -75% productivity boost.
         return -0.75
-    prod_boost_from_chips = (number_of_productivity_chips * 
-                             get_productivity_chip_score()[type_of_productivity_chip - 1])
-    prod_boost = research_boost + prod_boost_from_chips + 0.5 * fifty_percent_boost
-    return min(prod_boost, 3) #productivity boost is capped at +300%
+    chip_scores = np.asarray(get_productivity_chip_score())
+    prod_boost_from_chips = (np.asarray(number_of_productivity_chips) * 
+                             chip_scores[np.asarray(type_of_productivity_chip) - 1])
+    prod_boost = research_boost + prod_boost_from_chips + 0.5 * np.asarray(fifty_percent_boost)
+    return np.minimum(prod_boost, 3) #productivity boost is capped at +300%
 
 def calculate_quality_boost(number_of_quality_chips=5, type_of_quality_boost=5):
     """
     Returns the quality boost from quality chips.
+    Works on scalars as well as NumPy arrays of equal shape (one entry per request).
     """
-    quality_boost_from_chips = (number_of_quality_chips * 
-                                get_quality_chip_score()[type_of_quality_boost - 1])
+    chip_scores = np.asarray(get_quality_chip_score())
+    quality_boost_from_chips = (np.asarray(number_of_quality_chips) * 
+                                chip_scores[np.asarray(type_of_quality_boost) - 1])
     return quality_boost_from_chips
 
-def get_probabilities_of_upgrading(productivity_boost=1, quality_boost=1):
+def get_probabilities_of_upgrading(productivity_boost=1, quality_boost=1, number_of_tiers=5):
     """
-    Returns a list of probabilities of upgrading by 0, 1, 2, 3 or 4 tiers.
+    Returns an array of probabilities of upgrading by 0, 1, ..., number_of_tiers - 1 tiers.
+    If the boosts are arrays of shape (N,), the result has shape (N, number_of_tiers).
     """
+    productivity_boost = np.asarray(productivity_boost)[..., np.newaxis]
+    quality_boost = np.asarray(quality_boost)[..., np.newaxis]
     #See https://wiki.factorio.com/Quality 
     #for information on how the probabilities are calculated.
-    return [
+    #Upgrading by 1 tier has a 9/10 chance, by 2 tiers a 9/100 chance and so on,
+    #except for the last tier which gets the remaining 1/10^(number_of_tiers - 2).
+    tiers_upgraded = np.arange(1, number_of_tiers)
+    numerators = np.where(tiers_upgraded < number_of_tiers - 1, 9, 1)
+    denominators = 10.0 ** np.minimum(tiers_upgraded, number_of_tiers - 2)
+    return np.concatenate([
         (1 + productivity_boost) * (1 - quality_boost),
-        (1 + productivity_boost) * quality_boost * 9 / 10,
-        (1 + productivity_boost) * quality_boost * 9 / 100,
-        (1 + productivity_boost) * quality_boost * 9 / 1000,
-        (1 + productivity_boost) * quality_boost * 1 / 1000
-    ]
+        (1 + productivity_boost) * quality_boost * numerators / denominators
+    ], axis=-1)
 
-def get_base_matrix(productivity_boost, quality_boost):
+def get_base_matrices(productivity_boost, quality_boost, number_of_tiers=5):
     """
     Returns the base matrix for calculating the upper right or
     lower left part of the transition matrix.
+    If the boosts are arrays of shape (N,), the result has shape 
+    (N, number_of_tiers, number_of_tiers).
     """
-    prob = get_probabilities_of_upgrading(productivity_boost, quality_boost)
+    prob = get_probabilities_of_upgrading(productivity_boost, quality_boost, number_of_tiers)
     #See https://wiki.factorio.com/Quality 
     #for information on how the transition matrix is calculated.
-    return [
-        [prob[0], prob[1], prob[2], prob[3], 1 + productivity_boost - np.sum(prob[0:4])],
-        [0, prob[0], prob[1], prob[2], 1 + productivity_boost - np.sum(prob[0:3])],
-        [0, 0, prob[0], prob[1], 1 + productivity_boost - np.sum(prob[0:2])],
-        [0, 0, 0, prob[0], 1 + productivity_boost - prob[0]],
-        [0, 0, 0, 0, 1 + productivity_boost]
-    ]
+    #Entry (i, j) is the probability of upgrading by j - i tiers, except for the last
+    #column which gets the remaining probability, since we can't upgrade past legendary.
+    tiers = np.arange(number_of_tiers)
+    tiers_upgraded = tiers[np.newaxis, :] - tiers[:, np.newaxis]
+    base_matrices = np.where(tiers_upgraded >= 0, 
+                             np.take(prob, np.maximum(tiers_upgraded, 0), axis=-1), 
+                             0)
+    base_matrices[..., -1] = (1 + np.asarray(productivity_boost))[..., np.newaxis] - \
+        np.sum(base_matrices[..., :-1], axis=-1)
+    return base_matrices
+
+def get_base_matrix(productivity_boost, quality_boost):
+    """
+    Returns the 5x5 base matrix for a single productivity and quality boost,
+    see get_base_matrices.
+    """
+    return get_base_matrices(productivity_boost, quality_boost)
 
 def get_part_of_transition_matrix(productivity_boost, quality_boost, recycling=False):
     """
@@ -96,46 +122,46 @@ def get_part_of_transition_matrix(productivity_boost, quality_boost, recycling=F
     if recycling:
         #We don't recycle legendary items, so when recycling we set
         #the probability of producing a legendary item from legendary ingredients to 0.
-        base_matrix[-1] = [0, 0, 0, 0, 0]
+        base_matrix[-1] = 0
 
-    return np.array(base_matrix)    
+    return base_matrix
 
-def concatenate_transition_matrices(upper_left, 
-                                    upper_right, 
-                                    lower_left, 
-                                    bottom_right):
+def build_transition_matrices(productivity_boost, 
+                              quality_boost, 
+                              recycler_quality_boost, 
+                              number_of_tiers=5):
     """
-    Concatenates the four parts of the transition matrix into one matrix.
+    Returns the transition matrix for the Markov chain of an assembly machine
+    followed by a recycler. If the boosts are arrays of shape (N,), the result
+    is a stack of N matrices, each of shape (2 * number_of_tiers, 2 * number_of_tiers).
+    The first number_of_tiers states are ingredients entering the assembly machine
+    (i.e. items that just left the recycler), the rest are items leaving the assembly machine.
     """
-    return np.concatenate(
-        (np.concatenate((upper_left, upper_right), axis=1),
-        np.concatenate((lower_left, bottom_right), axis=1)),
-        axis=0
-    )
-
-def get_upper_left_of_transition_matrix():
-    """
-    Returns the upper left of the transition matrix, which is always the same.
-    """
-    return np.array([
-        [0,0,0,0,0],
-        [0,0,0,0,0],
-        [0,0,0,0,0],
-        [0,0,0,0,0],
-        [0,0,0,0,0]
-    ])
+    #See https://wiki.factorio.com/Quality for information on how 
+    #the transition matrix is constructed.
+    tiers = number_of_tiers
+    batch_shape = np.broadcast_shapes(np.shape(productivity_boost), 
+                                      np.shape(quality_boost),
+                                      np.shape(recycler_quality_boost))
+    transition_matrices = np.zeros(batch_shape + (2 * tiers, 2 * tiers))
+    #Upper right: the assembly machine.
+    transition_matrices[..., :tiers, tiers:] = get_base_matrices(productivity_boost, 
+                                                                 quality_boost, 
+                                                                 tiers)
+    #Lower left: the recycler, which always has a -75% productivity boost.
+    transition_matrices[..., tiers:, :tiers] = get_base_matrices(
+        calculate_productivity_boost(recycling=True), recycler_quality_boost, tiers)
+    #We don't recycle legendary items, they stay legendary items forever (bottom right).
+    transition_matrices[..., -1, :tiers] = 0
+    transition_matrices[..., -1, -1] = 1
+    return transition_matrices
 
-def get_bottom_right_of_transition_matrix():
+def read_only(array: np.array) -> np.array:
     """
-    Returns the bottom right of the transition matrix, which is always the same.
+    Marks the array as read-only and returns it, so cached arrays can't be changed by accident.
     """
-    return np.array([
-        [0,0,0,0,0],
-        [0,0,0,0,0],
-        [0,0,0,0,0],
-        [0,0,0,0,0],
-        [0,0,0,0,1]
-    ])
+    array.setflags(write=False)
+    return array
 
 def is_electromagnetic_plant(machine_type: str) -> bool:
     """
@@ -143,17 +169,20 @@ def is_electromagnetic_plant(machine_type: str) -> bool:
     """
     return machine_type == "Electromagnetic plant"
 
+#Chip qualities from worst to best, so chip number n is CHIP_TYPES[n - 1].
+CHIP_TYPES = ["Normal", "Uncommon", "Rare", "Epic", "Legendary"]
+
 def chip_type_to_number(chip_type: str) -> int:
     """
     Returns the number of the chip type (1-5).
     """
     #The .index method will throw a value exception if the chip type is not found,
     #but the frontend should ensure that the chip type is valid.
-    return ["Normal", "Uncommon", "Rare", "Epic", "Legendary"].index(chip_type) + 1
+    return CHIP_TYPES.index(chip_type) + 1
 
-def get_upper_right_of_transition_matrix(request: ComputationRequest) -> np.array:
+def get_effective_boosts(request: ComputationRequest) -> tuple[float, float]:
     """
-    Returns the upper right of the transition matrix.
+    Returns the productivity and quality boost of the assembly machine.
     """
     prod_boost = calculate_productivity_boost(
         request.number_of_productivity_modules,
@@ -163,43 +192,66 @@ def get_upper_right_of_transition_matrix(request: ComputationRequest) -> np.arra
         request.productivity_boost_from_research)
     qual_boost = calculate_quality_boost(request.number_of_quality_modules,
                                          chip_type_to_number(request.quality_of_quality_modules))
+    return float(prod_boost), float(qual_boost)
+
+def get_upper_right_of_transition_matrix(request: ComputationRequest) -> np.array:
+    """
+    Returns the upper right of the transition matrix.
+    """
+    prod_boost, qual_boost = get_effective_boosts(request)
     return get_part_of_transition_matrix(prod_boost, 
                                          qual_boost, 
                                          recycling=False)
 
-def get_lower_left_of_transition_matrix() -> np.array:
+def get_recycler_boosts(request: ComputationRequest) -> tuple[float, float]:
     """
-    Returns the lower left of the transition matrix.
+    Returns the productivity and quality boost of the recycler.
     """
     productivity_boost = calculate_productivity_boost(recycling=True, 
                                                       fifty_percent_boost=False)
-    #I've chosen to hardcode the recycling step, since noone will realistically
-    #want to experiment with it.
-    quality_boost = calculate_quality_boost(number_of_quality_chips=4, 
-                                            type_of_quality_boost=5)
-    return get_part_of_transition_matrix(productivity_boost, 
-                                         quality_boost, 
-                                         recycling=True)
+    quality_boost = calculate_quality_boost(
+        request.number_of_recycler_quality_modules,
+        chip_type_to_number(request.quality_of_recycler_quality_modules))
+    return float(productivity_boost), float(quality_boost)
 
-def generate_transition_matrix(computation_request: ComputationRequest):
+def get_matrix_boosts(request: ComputationRequest) -> tuple[float, float, float]:
+    """
+    Returns the productivity and quality boost of the assembly machine, and the quality boost
+    of the recycler. These are the only settings that change the transition matrix.
+    """
+    _, recycler_quality_boost = get_recycler_boosts(request)
+    return (*get_effective_boosts(request), recycler_quality_boost)
+
+@cache
+def get_lower_left_of_transition_matrix(quality_boost: float) -> np.array:
+    """
+    Returns the lower left of the transition matrix for a recycler with the quality boost.
+    The array is cached and read-only, since most requests use the same recycler.
+    """
+    return read_only(get_part_of_transition_matrix(-0.75, quality_boost, recycling=True))
+
+@timed_stage("build_transition_matrix")
+def build_transition_matrix(productivity_boost: float, 
+                            quality_boost: float, 
+                            recycler_quality_boost: float) -> np.array:
+    """
+    Returns the 10x10 transition matrix for the Markov chain of an assembly machine with
+    the given productivity and quality boost, see build_transition_matrices.
+    """
+    return build_transition_matrices(productivity_boost, quality_boost, recycler_quality_boost)
+
+#Cache of transition matrices and their binary powers, keyed on get_matrix_boosts.
+#The size can be tuned with the TRANSITION_MATRIX_CACHE_SIZE environment variable,
+#and the hit rate can be checked with transition_matrix_cache.stats().
+transition_matrix_cache = TransitionMatrixCache(
+    build_transition_matrix, get_cache_size("TRANSITION_MATRIX_CACHE_SIZE", 1024))
+
+def generate_transition_matrix(computation_request: ComputationRequest) -> np.array:
     """
     Returns the transition matrix for the Markov chain.
-    The transition matrix is a massive 10x10 matrix,
-    so we generate it in parts and concatenate them at the end.
+    The matrix comes from a cache, so it's read-only.
     """
-    #See https://wiki.factorio.com/Quality for information on how 
-    #the transition matrix is constructed.
-    upper_left = get_upper_left_of_transition_matrix()
-    upper_right = get_upper_right_of_transition_matrix(computation_request)
-    lower_left = get_lower_left_of_transition_matrix()
-    bottom_right = get_bottom_right_of_transition_matrix()
-
-    transition_matrix = concatenate_transition_matrices(upper_left, 
-                                                        upper_right, 
-                                                        lower_left, 
-                                                        bottom_right)
-    
-    return transition_matrix
+    return transition_matrix_cache.get(*get_matrix_boosts(computation_request)).matrix
 
 def get_starting_distribution(computation_request: ComputationRequest) -> np.array:
     """
@@ -224,12 +276,18 @@ def calculate_result_request(distribution: np.array) -> ResultRequest:
     #Similarly for the other qualities.
     #Final entry is the number of legendary items produced in total,
     #since we don't recycle legendary items.
+    return counts_to_result_request(distribution[:5] + distribution[5:])
+
+def counts_to_result_request(counts: np.array) -> ResultRequest:
+    """
+    Returns the result for the expected number of items of each quality, from normal to legendary.
+    """
     decimals = 2 #Number of decimals to round to.
-    return ResultRequest(quality_1_count=round(distribution[0] + distribution[5], decimals),
-                         quality_2_count=round(distribution[1] + distribution[6], decimals),
-                         quality_3_count=round(distribution[2] + distribution[7], decimals),
-                         quality_4_count=round(distribution[3] + distribution[8], decimals),
-                         quality_5_count=round(distribution[4] + distribution[9], decimals))
+    return ResultRequest(quality_1_count=round(counts[0], decimals),
+                         quality_2_count=round(counts[1], decimals),
+                         quality_3_count=round(counts[2], decimals),
+                         quality_4_count=round(counts[3], decimals),
+                         quality_5_count=round(counts[4], decimals))
 
 def calculate_iterations(iterations: int, 
                          transition_matrix: np.array, 
@@ -245,12 +303,223 @@ def calculate_iterations(iterations: int,
     result_request = calculate_result_request(distribution)
     return result_request
 
+def run_simulation_trajectory(computation_request: ComputationRequest) -> Iterator[ResultRequest]:
+    """
+    Yields the result after every iteration from 1 up to the number of iterations in the request.
+    Each iteration is a single vector-matrix product with the matrix for a full cycle,
+    so the whole trajectory costs as much as one matrix power, and memory doesn't grow
+    with the number of iterations.
+    """
+    if computation_request.number_of_iterations == "infinite":
+        raise ValueError("The trajectory needs a finite number of iterations.")
+    matrix_powers = transition_matrix_cache.get(*get_matrix_boosts(computation_request))
+    #The matrix for a full cycle is M^2, see calculate_iterations.
+    cycle_matrix = matrix_powers.binary_power(1)
+    distribution = get_starting_distribution(computation_request)
+    for _ in range(computation_request.number_of_iterations):
+        distribution = distribution @ cycle_matrix
+        yield calculate_result_request(distribution)
+
+def split_transition_matrix(transition_matrix: np.array) -> tuple[np.array, np.array]:
+    """
+    Splits the transition matrix into the transitions between the transient states (Q)
+    and the transitions from the transient states into the absorbing state (R).
+    """
+    #State 9 (legendary items leaving the assembly machine) is the only absorbing state.
+    #All other states leak mass, since the recycler destroys 75% of its input.
+    transient_to_transient = transition_matrix[..., :9, :9]
+    transient_to_absorbing = transition_matrix[..., :9, 9]
+    return transient_to_transient, transient_to_absorbing
+
+class NonConvergingChainError(ValueError):
+    """
+    Raised when the items never leave the loop between the assembly machine and the recycler,
+    so there's no result after infinitely many iterations.
+    """
+
+def is_non_converging(transient_to_transient: np.array) -> np.array:
+    """
+    Returns True for the chains whose items never leave the loop, i.e. whose I - Q is singular.
+    This happens without any quality boost, if the productivity makes up for the recycler.
+    Works on a single matrix or a stack of them.
+    """
+    #The determinant isn't a test for singularity, since it shrinks with every state:
+    #chains which are close to the limit (e.g. 2.999 productivity) still converge,
+    #but their determinant is ~1e-15. The condition number doesn't depend on the scale,
+    #and I - Q can't be solved accurately once it's above 1 / machine epsilon.
+    condition_numbers = np.linalg.cond(np.eye(9) - transient_to_transient)
+    return ~(condition_numbers < 1 / np.finfo(np.float64).eps)
+
+def check_convergence(transient_to_transient: np.array):
+    """
+    Raises a NonConvergingChainError if any of the chains never converges.
+    """
+    if np.any(is_non_converging(transient_to_transient)):
+        raise NonConvergingChainError(
+            "The items never leave the loop between the assembly machine and the recycler, "
+            "so the simulation doesn't converge. Add quality modules or lower the productivity.")
+
+def calculate_steady_state(transition_matrix: np.array, 
+                           starting_distribution: np.array) -> np.array:
+    """
+    Returns the distribution after infinitely many iterations.
+    """
+    #The expected number of visits to each transient state is given by
+    #the fundamental matrix N = (I - Q)^-1, see 
+    #https://en.wikipedia.org/wiki/Absorbing_Markov_chain#Fundamental_matrix
+    #Everything ends up in the absorbing state, so the number of legendary items is 
+    #starting_distribution * N * R, which we get from a linear solve instead of inverting.
+    transient_to_transient, transient_to_absorbing = split_transition_matrix(transition_matrix)
+    check_convergence(transient_to_transient)
+    expected_visits = np.linalg.solve((np.eye(9) - transient_to_transient).T,
+                                      starting_distribution[:9])
+    distribution = np.zeros(10)
+    distribution[9] = expected_visits @ transient_to_absorbing + starting_distribution[9]
+    return distribution
+
+def calculate_cycles_until_converged(transition_matrix: np.array,
+                                     starting_distribution: np.array,
+                                     threshold: float = 0.01) -> int:
+    """
+    Returns the number of iterations needed until the expected number of items 
+    which aren't legendary yet drops below the threshold.
+    """
+    #The remaining mass never increases, so we can find the number of iterations
+    #by binary search over the powers M^(2^k) of the full cycle matrix M.
+    #This only takes O(log(iterations)) matrix multiplications.
+    def remaining_mass(distribution):
+        return np.sum(distribution[:9])
+
+    if remaining_mass(starting_distribution) < threshold:
+        return 0
+    check_convergence(split_transition_matrix(transition_matrix)[0])
+    powers = [transition_matrix @ transition_matrix]
+    while remaining_mass(starting_distribution @ powers[-1]) >= threshold:
+        if len(powers) > 60:
+            raise NonConvergingChainError("The simulation does not converge.")
+        powers.append(powers[-1] @ powers[-1])
+    iterations = 0
+    distribution = starting_distribution
+    for exponent in reversed(range(len(powers))):
+        candidate = distribution @ powers[exponent]
+        if remaining_mass(candidate) >= threshold:
+            distribution = candidate
+            iterations += 2 ** exponent
+    return iterations + 1
+
+def calculate_distribution(computation_request: ComputationRequest) -> np.array:
+    """
+    Returns the expected distribution of items over all 10 states 
+    after the number of iterations in the request.
+    """
+    matrix_powers = transition_matrix_cache.get(*get_matrix_boosts(computation_request))
+    starting_distribution = get_starting_distribution(computation_request)
+    if computation_request.number_of_iterations == "infinite":
+        return calculate_steady_state(matrix_powers.matrix, starting_distribution)
+    #Same as calculate_iterations, but the cached binary powers of the matrix are reused.
+    with time_stage("matrix_power"):
+        power = matrix_powers.power(2 * computation_request.number_of_iterations)
+    return starting_distribution @ power
+
+@timed_stage("response_kernel")
+def calculate_response_kernel(matrix_powers: MatrixPowers, 
+                              number_of_iterations: int | str) -> np.array:
+    """
+    Returns the 4x5 response kernel for a layout and a number of iterations.
+    Entry (i, j) is the expected number of items of quality j + 1 we end up with
+    for every item of quality i + 1 we start out with.
+    """
+    #The result is linear in the starting distribution, so the kernel is just
+    #the rows of the starting qualities, with the states for the same quality added together.
+    if number_of_iterations == "infinite":
+        #Starting in state i, the expected number of items absorbed in the legendary state
+        #is entry i of N * R, where N is the fundamental matrix, see calculate_steady_state.
+        transient_to_transient, transient_to_absorbing = \
+            split_transition_matrix(matrix_powers.matrix)
+        check_convergence(transient_to_transient)
+        with time_stage("steady_state_solve"):
+            absorbed = np.linalg.solve(np.eye(9) - transient_to_transient,
+                                       transient_to_absorbing)
+        kernel = np.zeros((4, 5))
+        kernel[:, 4] = absorbed[:4]
+    else:
+        with time_stage("matrix_power"):
+            power = matrix_powers.power(2 * number_of_iterations)
+        kernel = power[:4, :5] + power[:4, 5:]
+    return read_only(kernel)
+
+#Cache of response kernels, keyed on get_matrix_boosts and the number of iterations.
+#The size can be tuned with the RESPONSE_KERNEL_CACHE_SIZE environment variable.
+response_kernel_cache = LRUCache(get_cache_size("RESPONSE_KERNEL_CACHE_SIZE", 4096))
+
+#Table of precomputed kernels (see precompute.py), which is looked up before
+#a kernel is computed live. It's None unless the API was started with a table.
+precomputed_kernels = None
+
+def use_precomputed_kernels(table):
+    """
+    Looks up kernels in the table (a PrecomputedKernels, or None to turn it off)
+    before computing them, and clears the cached kernels.
+    """
+    global precomputed_kernels # pylint: disable=global-statement
+    precomputed_kernels = table
+    response_kernel_cache.clear()
+
+def create_response_kernel(computation_request: ComputationRequest) -> np.array:
+    """
+    Returns the response kernel from the precomputed table if it's in there,
+    otherwise computes it.
+    """
+    if precomputed_kernels is not None:
+        kernel = precomputed_kernels.get(computation_request)
+        if kernel is not None:
+            return kernel
+    return calculate_response_kernel(
+        transition_matrix_cache.get(*get_matrix_boosts(computation_request)),
+        computation_request.number_of_iterations)
+
+def get_response_kernel(computation_request: ComputationRequest) -> np.array:
+    """
+    Returns the cached 4x5 response kernel for the layout and number of iterations
+    in the request, see calculate_response_kernel.
+    """
+    boosts = get_matrix_boosts(computation_request)
+    number_of_iterations = computation_request.number_of_iterations
+    return response_kernel_cache.get_or_create(
+        (*boosts, number_of_iterations),
+        lambda: create_response_kernel(computation_request))
+
+def get_starting_counts(computation_request: ComputationRequest) -> np.array:
+    """
+    Returns the number of items of each quality that the user starts out with.
+    """
+    return np.array([computation_request.quality_1_count,
+                     computation_request.quality_2_count,
+                     computation_request.quality_3_count,
+                     computation_request.quality_4_count])
+
 def run_simulation(computation_request: ComputationRequest) -> ResultRequest:
     """
     Runs the simulation and returns the result.
     """
+    #Requests which only differ in the starting counts share the same kernel,
+    #so most requests don't need any matrix powers at all.
+    kernel = get_response_kernel(computation_request)
+    return counts_to_result_request(get_starting_counts(computation_request) @ kernel)
+
+def run_steady_state_simulation(computation_request: ComputationRequest,
+                                threshold: float = 0.01) -> SteadyStateResult:
+    """
+    Runs the simulation for infinitely many iterations and returns the result,
+    along with how many iterations are needed to get within the threshold of it.
+    The number of iterations in the request is ignored.
+    """
     transition_matrix = generate_transition_matrix(computation_request)
     starting_distribution = get_starting_distribution(computation_request)
-    return calculate_iterations(computation_request.number_of_iterations, 
-                                transition_matrix,
-                                starting_distribution)
+    distribution = calculate_steady_state(transition_matrix, starting_distribution)
+    iterations = calculate_cycles_until_converged(transition_matrix, 
+                                                  starting_distribution, 
+                                                  threshold)
+    return SteadyStateResult(result=calculate_result_request(distribution),
+                             iterations_until_converged=iterations,
+                             threshold=threshold)
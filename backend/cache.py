@@ -0,0 +1,197 @@
+"""
+Bounded caches for the backend.
+The transition matrix only depends on the productivity and quality boost,
+so most requests reuse a matrix (and its powers) which has been computed before.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable
+import numpy as np
+
+class LRUCache:
+    """
+    A thread-safe dictionary which holds at most maxsize entries.
+    When it's full, the least recently used entry is evicted.
+    Hits, misses and evictions are counted so the size can be tuned.
+    """
+    def __init__(self, maxsize: int = 1024):
+        if maxsize < 1:
+            raise ValueError("The cache must be able to hold at least one entry.")
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_create(self, key, create: Callable):
+        """
+        Returns the entry for the key, calling create() to make it if it isn't cached.
+        """
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            self.misses += 1
+        #The entry is created without holding the lock, so a slow computation
+        #doesn't block the other threads. If two threads miss at the same time,
+        #both compute the entry and the last one wins.
+        value = create()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        """
+        Removes all entries and resets the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self) -> dict:
+        """
+        Returns the size of the cache and the hit/miss/eviction counters.
+        """
+        with self._lock:
+            return {"size": len(self._entries),
+                    "maxsize": self.maxsize,
+                    "hits": self.hits,
+                    "misses": self.misses,
+                    "evictions": self.evictions}
+
+class MatrixPowers:
+    """
+    A transition matrix along with its binary powers M, M^2, M^4, M^8, ...
+    Any power of the matrix is the product of the binary powers given by
+    the bits of the exponent, so once the binary powers are known, a power
+    only costs a few matrix multiplications.
+    """
+    def __init__(self, matrix: np.array):
+        matrix.setflags(write=False)
+        self.matrix = matrix
+        self._binary_powers = [matrix]
+        self._lock = threading.Lock()
+
+    def binary_power(self, k: int) -> np.array:
+        """
+        Returns M^(2^k).
+        """
+        with self._lock:
+            while len(self._binary_powers) <= k:
+                square = self._binary_powers[-1] @ self._binary_powers[-1]
+                square.setflags(write=False)
+                self._binary_powers.append(square)
+            return self._binary_powers[k]
+
+    def power(self, exponent: int) -> np.array:
+        """
+        Returns M^exponent.
+        """
+        result = np.eye(self.matrix.shape[0])
+        k = 0
+        while exponent > 0:
+            if exponent & 1:
+                result = result @ self.binary_power(k)
+            exponent >>= 1
+            k += 1
+        return result
+
+class TransitionMatrixCache:
+    """
+    LRU cache of transition matrices and their binary powers,
+    keyed on the boosts which determine the matrix.
+    """
+    def __init__(self, build_matrix: Callable, maxsize: int = 1024):
+        self._build_matrix = build_matrix
+        self._cache = LRUCache(maxsize)
+
+    def get(self, *boosts: float) -> MatrixPowers:
+        """
+        Returns the matrix and its powers for the boosts, building the matrix if needed.
+        """
+        key = tuple(float(boost) for boost in boosts)
+        return self._cache.get_or_create(key, lambda: MatrixPowers(self._build_matrix(*key)))
+
+    def clear(self):
+        """
+        Removes all cached matrices and resets the counters.
+        """
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        """
+        Returns the size of the cache and the hit/miss/eviction counters.
+        """
+        return self._cache.stats()
+
+class SingleFlight:
+    """
+    Lets concurrent callers with the same key share one computation (request coalescing).
+    The first caller computes the value, and callers which arrive while it's running
+    wait for it and get the same value (or the same exception) instead of computing it again.
+    """
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.coalesced = 0
+
+    def run(self, key, create: Callable):
+        """
+        Returns create(), or the value of the running call with the same key if there is one.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            is_first_caller = call is None
+            if is_first_caller:
+                call = self._calls[key] = Future()
+                self.calls += 1
+            else:
+                self.coalesced += 1
+        if not is_first_caller:
+            return call.result()
+        try:
+            value = create()
+            call.set_result(value)
+            return value
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def clear(self):
+        """
+        Resets the counters.
+        """
+        with self._lock:
+            self.calls = 0
+            self.coalesced = 0
+
+    def stats(self) -> dict:
+        """
+        Returns the number of computations, the number of callers which shared one
+        instead of computing, and the number of computations running right now.
+        """
+        with self._lock:
+            return {"calls": self.calls,
+                    "coalesced": self.coalesced,
+                    "in_flight": len(self._calls)}
+
+def get_cache_size(environment_variable: str, default: int) -> int:
+    """
+    Returns the cache size given by the environment variable, or the default if it isn't set.
+    """
+    return int(os.environ.get(environment_variable, default))
@@ -0,0 +1,198 @@
+"""
+Simulation of a chain of production stages, each with its own machine and modules.
+Every stage has 10 states just like the single stage in backend.py: 5 for the
+ingredients entering the assembly machine, and 5 for the items leaving it.
+The 5x5 blocks from backend.py are placed in one sparse transition matrix,
+so chains with hundreds of states are still cheap to build, to power and to solve.
+A chain with a single recycling stage gives exactly the same numbers as run_simulation.
+"""
+
+import warnings
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import MatrixRankWarning, spsolve
+from backend.backend import (NonConvergingChainError,
+                             calculate_productivity_boost,
+                             calculate_quality_boost,
+                             chip_type_to_number,
+                             counts_to_result_request,
+                             get_lower_left_of_transition_matrix,
+                             get_part_of_transition_matrix,
+                             get_recycler_boosts,
+                             is_electromagnetic_plant)
+from backend.chain_request import ChainRequest, StageRequest
+from backend.chain_result import ChainResult
+from frontend.computation_request import ComputationRequest
+
+STATES_PER_STAGE = 10
+
+def get_stage_boosts(stage: StageRequest, research_boost: float) -> tuple[float, float]:
+    """
+    Returns the productivity and quality boost of the assembly machine of the stage.
+    """
+    prod_boost = calculate_productivity_boost(
+        stage.number_of_productivity_modules,
+        chip_type_to_number(stage.quality_of_production_modules),
+        False,
+        is_electromagnetic_plant(stage.machine_type),
+        research_boost)
+    qual_boost = calculate_quality_boost(stage.number_of_quality_modules,
+                                         chip_type_to_number(stage.quality_of_quality_modules))
+    return float(prod_boost), float(qual_boost)
+
+def generate_chain_transition_matrix(chain_request: ChainRequest) -> sparse.csr_matrix:
+    """
+    Returns the sparse transition matrix of the whole chain.
+    States 10s to 10s + 4 are the ingredients of stage s, and states 10s + 5 to 10s + 9
+    are the items made by stage s, from normal to legendary.
+    """
+    blocks = [] #(first row, first column, dense block)
+    identity = np.eye(5)
+    number_of_stages = len(chain_request.stages)
+    for index, stage in enumerate(chain_request.stages):
+        if stage.ingredients_per_item <= 0:
+            raise ValueError("A stage needs a positive number of ingredients per item.")
+        ingredients = index * STATES_PER_STAGE
+        products = ingredients + 5
+        next_ingredients = ingredients + STATES_PER_STAGE
+        is_last_stage = index == number_of_stages - 1
+
+        #Assembly machine, see get_upper_right_of_transition_matrix in backend.py.
+        boosts = get_stage_boosts(stage, chain_request.productivity_boost_from_research)
+        blocks.append((ingredients, products,
+                       get_part_of_transition_matrix(*boosts, recycling=False) /
+                       stage.ingredients_per_item))
+
+        #Items which aren't recycled are either passed on to the next stage,
+        #or stay where they are if this is the last stage.
+        passed_on = identity.copy()
+        if stage.recycle:
+            #Recycling gives back the ingredients, see get_lower_left_of_transition_matrix.
+            #The legendary row is 0, since we don't recycle legendary items.
+            _, recycler_quality_boost = get_recycler_boosts(stage)
+            blocks.append((products, ingredients,
+                           get_lower_left_of_transition_matrix(recycler_quality_boost) *
+                           stage.ingredients_per_item))
+            passed_on[:4] = 0
+        if is_last_stage:
+            blocks.append((products, products, passed_on))
+        else:
+            blocks.append((products, next_ingredients, passed_on))
+
+    rows, columns, values = [], [], []
+    for first_row, first_column, block in blocks:
+        block_rows, block_columns = np.nonzero(block)
+        rows.append(block_rows + first_row)
+        columns.append(block_columns + first_column)
+        values.append(block[block_rows, block_columns])
+    size = number_of_stages * STATES_PER_STAGE
+    return sparse.coo_matrix((np.concatenate(values), (np.concatenate(rows),
+                                                       np.concatenate(columns))),
+                             shape=(size, size)).tocsr()
+
+def get_chain_starting_distribution(chain_request: ChainRequest) -> np.array:
+    """
+    Returns the starting distribution of the chain, with the starting items
+    as ingredients of the first stage.
+    """
+    starting_distribution = np.zeros(len(chain_request.stages) * STATES_PER_STAGE)
+    starting_distribution[:4] = [chain_request.quality_1_count,
+                                 chain_request.quality_2_count,
+                                 chain_request.quality_3_count,
+                                 chain_request.quality_4_count]
+    return starting_distribution
+
+def get_absorbing_states(transition_matrix: sparse.csr_matrix) -> np.array:
+    """
+    Returns a boolean array which is True for the states that items never leave.
+    """
+    diagonal = transition_matrix.diagonal()
+    row_sums = np.asarray(transition_matrix.sum(axis=1)).ravel()
+    return (diagonal == 1) & (row_sums == 1)
+
+def calculate_chain_steady_state(transition_matrix: sparse.csr_matrix,
+                                 starting_distribution: np.array) -> np.array:
+    """
+    Returns the distribution after infinitely many iterations,
+    with the same fundamental matrix trick as calculate_steady_state in backend.py.
+    Raises a NonConvergingChainError if the items of a stage never leave its loop.
+    """
+    absorbing = get_absorbing_states(transition_matrix)
+    transient = ~absorbing
+    transient_to_transient = transition_matrix[transient][:, transient]
+    transient_to_absorbing = transition_matrix[transient][:, absorbing]
+    identity = sparse.identity(transient_to_transient.shape[0], format="csc")
+    with warnings.catch_warnings():
+        #A singular I - Q gives NaN, which is turned into an error below.
+        warnings.simplefilter("ignore", MatrixRankWarning)
+        expected_visits = spsolve((identity - transient_to_transient).T.tocsc(),
+                                  starting_distribution[transient])
+    if not np.all(np.isfinite(expected_visits)):
+        raise NonConvergingChainError(
+            "The items of a stage never leave the loop between its assembly machine and "
+            "recycler, so the simulation doesn't converge.")
+    distribution = np.zeros(starting_distribution.shape)
+    distribution[absorbing] = starting_distribution[absorbing] + \
+        transient_to_absorbing.T @ np.atleast_1d(expected_visits)
+    return distribution
+
+def calculate_chain_iterations(iterations: int,
+                               transition_matrix: sparse.csr_matrix,
+                               starting_distribution: np.array) -> np.array:
+    """
+    Returns the distribution after a number of iterations (2 steps per iteration,
+    see calculate_iterations in backend.py), by exponentiation by squaring.
+    Only the powers of the matrix are squared, the distribution is multiplied by them
+    one vector-matrix product at a time.
+    """
+    distribution = starting_distribution
+    power = transition_matrix
+    exponent = 2 * iterations
+    while exponent > 0:
+        if exponent & 1:
+            distribution = power.T @ distribution
+        exponent >>= 1
+        if exponent > 0:
+            power = power @ power
+    return distribution
+
+def run_chain_simulation(chain_request: ChainRequest) -> ChainResult:
+    """
+    Runs the simulation of the chain and returns the result of every stage.
+    """
+    if not chain_request.stages:
+        raise ValueError("A chain needs at least one stage.")
+    transition_matrix = generate_chain_transition_matrix(chain_request)
+    starting_distribution = get_chain_starting_distribution(chain_request)
+    if chain_request.number_of_iterations == "infinite":
+        distribution = calculate_chain_steady_state(transition_matrix, starting_distribution)
+    else:
+        distribution = calculate_chain_iterations(chain_request.number_of_iterations,
+                                                  transition_matrix,
+                                                  starting_distribution)
+    #Just like calculate_result_request, the ingredients and the made items
+    #of the same quality are added together for every stage.
+    stages = distribution.reshape(-1, 2, 5).sum(axis=1)
+    return ChainResult(stages=[counts_to_result_request(counts) for counts in stages])
+
+def chain_request_from_computation_request(
+        computation_request: ComputationRequest) -> ChainRequest:
+    """
+    Returns the chain with a single recycling stage which is the same as the request.
+    """
+    stage = StageRequest(
+        machine_type=computation_request.machine_type,
+        quality_of_production_modules=computation_request.quality_of_production_modules,
+        number_of_productivity_modules=computation_request.number_of_productivity_modules,
+        quality_of_quality_modules=computation_request.quality_of_quality_modules,
+        number_of_quality_modules=computation_request.number_of_quality_modules,
+        number_of_recycler_quality_modules=computation_request.number_of_recycler_quality_modules,
+        quality_of_recycler_quality_modules=computation_request.quality_of_recycler_quality_modules)
+    return ChainRequest(
+        productivity_boost_from_research=computation_request.productivity_boost_from_research,
+        stages=[stage],
+        number_of_iterations=computation_request.number_of_iterations,
+        quality_1_count=computation_request.quality_1_count,
+        quality_2_count=computation_request.quality_2_count,
+        quality_3_count=computation_request.quality_3_count,
+        quality_4_count=computation_request.quality_4_count)
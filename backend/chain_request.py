@@ -0,0 +1,39 @@
+"""
+Data models for simulating a chain of quality-aware production stages,
+e.g. an ingredient crafted upstream, then an intermediate, then the final product.
+"""
+
+from typing import Annotated, Literal
+from pydantic import BaseModel, Field
+
+class StageRequest(BaseModel):
+    """
+    A single production stage: an assembly machine with its own modules,
+    optionally followed by a recycler for the items which aren't legendary.
+    """
+    machine_type: str
+    quality_of_production_modules: str
+    number_of_productivity_modules: int
+    quality_of_quality_modules: str
+    number_of_quality_modules: int
+    #If True, the items which aren't legendary are recycled back into this stage's ingredients,
+    #and only legendary items are passed on. If False, every item is passed on.
+    recycle: bool = True
+    #Number of ingredients (items from the previous stage) used to craft a single item.
+    ingredients_per_item: float = 1
+    #Quality modules in the recyclers, see ComputationRequest.
+    number_of_recycler_quality_modules: int = 4
+    quality_of_recycler_quality_modules: str = "Legendary"
+
+class ChainRequest(BaseModel):
+    """
+    Data model for sending chain simulation requests from frontend to backend.
+    The starting counts are the ingredients of the first stage.
+    """
+    productivity_boost_from_research: float
+    stages: list[StageRequest]
+    number_of_iterations: Annotated[int, Field(ge=0)] | Literal["infinite"]
+    quality_1_count: int
+    quality_2_count: int
+    quality_3_count: int
+    quality_4_count: int
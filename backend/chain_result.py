@@ -0,0 +1,14 @@
+"""
+Data model for returning the result of a chain simulation.
+"""
+
+from pydantic import BaseModel
+from backend.result_request import ResultRequest
+
+class ChainResult(BaseModel):
+    """
+    Data model for sending the result of a chain simulation from backend to frontend.
+    There's one result per stage, counting both the ingredients waiting in that stage
+    and the items it has made. The last entry is the final product.
+    """
+    stages: list[ResultRequest]
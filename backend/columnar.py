@@ -0,0 +1,136 @@
+"""
+Columnar wire format for bulk simulation requests.
+Instead of a JSON list with one object per request, the client sends a NumPy .npz archive
+with one array per field of ComputationRequest, and gets back an .npz archive
+with one float array per quality_N_count of ResultRequest.
+The arrays are decoded straight into the columns used by batch.py, so no
+ComputationRequest or ResultRequest objects are created for the individual requests.
+
+String fields (the machine type and the chip qualities) can either be sent as string arrays
+or already converted: chip qualities as their chip number (1-5), and the machine type
+as a boolean which is True for an electromagnetic plant. Infinitely many iterations
+are sent as -1. The recycler fields can be left out, just like in ComputationRequest.
+"""
+
+import io
+import numpy as np
+from backend.backend import CHIP_TYPES
+from backend.batch import calculate_distributions
+
+NPZ_MEDIA_TYPE = "application/x-npz"
+
+REQUIRED_COLUMNS = ["productivity_boost_from_research",
+                    "machine_type",
+                    "quality_of_production_modules",
+                    "number_of_productivity_modules",
+                    "quality_of_quality_modules",
+                    "number_of_quality_modules",
+                    "number_of_iterations",
+                    "quality_1_count",
+                    "quality_2_count",
+                    "quality_3_count",
+                    "quality_4_count"]
+#Columns which can be left out, along with their default value (see ComputationRequest).
+OPTIONAL_COLUMNS = {"number_of_recycler_quality_modules": 4,
+                    "quality_of_recycler_quality_modules": CHIP_TYPES.index("Legendary") + 1}
+CHIP_COLUMNS = ["quality_of_production_modules",
+                "quality_of_quality_modules",
+                "quality_of_recycler_quality_modules"]
+INTEGER_COLUMNS = ["number_of_productivity_modules",
+                   "number_of_quality_modules",
+                   "number_of_recycler_quality_modules",
+                   "number_of_iterations",
+                   "quality_1_count",
+                   "quality_2_count",
+                   "quality_3_count",
+                   "quality_4_count"]
+RESULT_COLUMNS = [f"quality_{quality}_count" for quality in range(1, 6)]
+
+def chips_to_numbers(column: str, values: np.array) -> np.array:
+    """
+    Returns the chip numbers (1-5) of a column of chip qualities,
+    which are either strings like "Legendary" or already chip numbers.
+    Raises a ValueError for unknown chip qualities.
+    """
+    if values.dtype.kind in "US":
+        chip_types, inverse = np.unique(values.astype(str), return_inverse=True)
+        unknown = [chip_type for chip_type in chip_types if chip_type not in CHIP_TYPES]
+        if unknown:
+            raise ValueError(f"Unknown chip quality in {column}: {unknown[0]}.")
+        numbers = np.array([CHIP_TYPES.index(chip_type) + 1 for chip_type in chip_types])
+        return numbers[inverse.reshape(values.shape)]
+    if values.dtype.kind not in "iu" or np.any((values < 1) | (values > len(CHIP_TYPES))):
+        raise ValueError(f"{column} must contain chip qualities or chip numbers from 1 to 5.")
+    return values
+
+def decode_columns(body: bytes) -> dict:
+    """
+    Returns the columns of an .npz archive in the format used by calculate_distributions.
+    Raises a ValueError if the archive is invalid or a column is missing or malformed.
+    """
+    try:
+        #allow_pickle=False makes sure that only plain arrays are loaded.
+        with np.load(io.BytesIO(body), allow_pickle=False) as archive:
+            arrays = {name: archive[name] for name in archive.files}
+    except Exception as e: # pylint: disable=broad-exception-caught
+        #np.load raises many kinds of errors for invalid archives.
+        raise ValueError("The body isn't an .npz archive of plain (not pickled) arrays.") from e
+    return arrays_to_columns(arrays)
+
+def arrays_to_columns(arrays: dict) -> dict:
+    """
+    Returns the columns in the format used by calculate_distributions,
+    given one array per field of ComputationRequest.
+    Raises a ValueError if a column is missing or malformed.
+    """
+    missing = [column for column in REQUIRED_COLUMNS if column not in arrays]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}.")
+    number_of_requests = len(arrays["number_of_iterations"])
+    columns = {column: np.full(number_of_requests, default)
+               for column, default in OPTIONAL_COLUMNS.items()}
+    for column in REQUIRED_COLUMNS + list(OPTIONAL_COLUMNS):
+        if column not in arrays:
+            continue
+        values = arrays[column]
+        if values.shape != (number_of_requests,):
+            raise ValueError(f"{column} must be a 1D array with {number_of_requests} entries.")
+        if column in INTEGER_COLUMNS and values.dtype.kind not in "iu":
+            raise ValueError(f"{column} must be an integer array.")
+        columns[column] = values
+    for column in CHIP_COLUMNS:
+        columns[column] = chips_to_numbers(column, columns[column])
+    if columns["machine_type"].dtype.kind in "US":
+        columns["machine_type"] = columns["machine_type"] == "Electromagnetic plant"
+    elif columns["machine_type"].dtype.kind != "b":
+        raise ValueError("machine_type must contain machine types or booleans.")
+    columns["productivity_boost_from_research"] = \
+        columns["productivity_boost_from_research"].astype(float)
+    if np.any(columns["number_of_iterations"] < -1):
+        raise ValueError("number_of_iterations must be at least 0, or -1 for infinite.")
+    #-1 only means infinite on the wire, batch.py has a separate column for it.
+    columns["infinite_iterations"] = columns["number_of_iterations"] == -1
+    columns["number_of_iterations"] = np.where(columns["infinite_iterations"], 0,
+                                               columns["number_of_iterations"])
+    return columns
+
+def encode_columns(columns: dict) -> bytes:
+    """
+    Returns the columns as an .npz archive.
+    """
+    buffer = io.BytesIO()
+    np.savez(buffer, **columns)
+    return buffer.getvalue()
+
+def run_simulation_columns(columns: dict) -> dict:
+    """
+    Runs the simulation for every request in the columns, and returns one float array
+    per quality_N_count, rounded to the same 2 decimals as ResultRequest.
+    """
+    if len(columns["number_of_iterations"]) == 0:
+        return {column: np.zeros(0) for column in RESULT_COLUMNS}
+    distributions = calculate_distributions(columns)
+    #Just like calculate_result_request, the ingredients and the made items
+    #of the same quality are added together.
+    counts = np.round(distributions[:, :5] + distributions[:, 5:], 2)
+    return {column: counts[:, tier] for tier, column in enumerate(RESULT_COLUMNS)}
@@ -0,0 +1,80 @@
+"""
+Works backwards from the items we need to the items we have to start out with.
+The result is linear in the starting counts (see calculate_response_kernel),
+so instead of searching over the starting counts with repeated simulations,
+we solve a single small linear program (or a nonnegative least squares problem)
+with the cached 4x5 response kernel.
+"""
+
+import numpy as np
+from scipy.optimize import linprog, nnls
+from backend.backend import chip_type_to_number, counts_to_result_request, get_response_kernel
+from backend.inverse_request import InverseRequest
+from backend.inverse_result import InverseResult
+
+#Targets are met up to this many items, to allow for rounding errors in the solvers.
+TOLERANCE = 1e-6
+
+def validate_inverse_request(inverse_request: InverseRequest) -> tuple[np.array, np.array]:
+    """
+    Raises a ValueError if the request is invalid, otherwise returns the indices
+    of the input qualities (0-3) and the cost of a single item of each of them.
+    """
+    if len(inverse_request.target_counts) != 5:
+        raise ValueError("Expected a target count for each of the 5 qualities.")
+    if min(inverse_request.target_counts) < 0:
+        raise ValueError("The target counts can't be negative.")
+    if not inverse_request.input_qualities:
+        raise ValueError("At least one input quality is needed.")
+    if "Legendary" in inverse_request.input_qualities:
+        raise ValueError("Legendary items can't be used as input, they're already legendary.")
+    inputs = np.array([chip_type_to_number(quality) - 1
+                       for quality in inverse_request.input_qualities])
+    if len(np.unique(inputs)) != len(inputs):
+        raise ValueError("Every input quality can only be given once.")
+    if inverse_request.input_costs is None:
+        costs = np.ones(len(inputs))
+    else:
+        costs = np.asarray(inverse_request.input_costs, dtype=float)
+        if len(costs) != len(inputs):
+            raise ValueError("Expected a cost for each input quality.")
+        if np.any(costs <= 0):
+            raise ValueError("The input costs must be positive.")
+    return inputs, costs
+
+def solve_required_inputs(inverse_request: InverseRequest) -> InverseResult:
+    """
+    Returns the starting items needed to end up with the target counts.
+    Raises a ValueError if the target can't be reached with the allowed input qualities.
+    """
+    inputs, costs = validate_inverse_request(inverse_request)
+    kernel = get_response_kernel(inverse_request.computation_request)[inputs]
+    target_counts = np.asarray(inverse_request.target_counts, dtype=float)
+
+    if inverse_request.method == "exact":
+        #Closest nonnegative solution to starting_counts @ kernel = target_counts.
+        solution, _ = nnls(kernel.T, target_counts)
+    else:
+        #Cheapest nonnegative solution to starting_counts @ kernel >= target_counts.
+        optimization = linprog(costs, A_ub=-kernel.T, b_ub=-target_counts,
+                               bounds=(0, None), method="highs")
+        if optimization.status == 2:
+            #E.g. rare items are wanted, but with infinitely many iterations
+            #every item ends up legendary.
+            raise ValueError("The target counts can't be reached with these input qualities.")
+        if not optimization.success:
+            raise ValueError(f"The target counts couldn't be solved for: {optimization.message}")
+        solution = np.maximum(optimization.x, 0)
+
+    starting_counts = np.zeros(4)
+    starting_counts[inputs] = solution
+    expected_counts = solution @ kernel
+    if inverse_request.method == "at_least":
+        max_deviation = max(float(np.max(target_counts - expected_counts)), 0)
+        max_deviation = 0 if max_deviation < TOLERANCE else max_deviation
+    else:
+        max_deviation = float(np.max(np.abs(expected_counts - target_counts)))
+    return InverseResult(starting_counts=starting_counts.tolist(),
+                         total_cost=float(costs @ solution),
+                         expected_result=counts_to_result_request(expected_counts),
+                         max_deviation=max_deviation)
@@ -0,0 +1,25 @@
+"""
+Data model for working backwards from the items we need to the items we have to put in.
+"""
+
+from typing import Literal
+from pydantic import BaseModel
+from frontend.computation_request import ComputationRequest
+
+class InverseRequest(BaseModel):
+    """
+    Data model for asking the backend how many items we need to start out with
+    to end up with target_counts items of each quality (from normal to legendary),
+    with the layout and number of iterations of the computation request.
+    The starting counts in the computation request are ignored.
+    """
+    computation_request: ComputationRequest
+    target_counts: list[float]
+    #Qualities of the items we can start out with.
+    input_qualities: list[str] = ["Normal"]
+    #Relative cost of a single starting item of each input quality, 1 for each if None.
+    #Only used by the "at_least" method.
+    input_costs: list[float] | None = None
+    #"at_least" finds the cheapest starting items which give at least the target counts,
+    #"exact" finds the starting items which come closest to giving exactly the target counts.
+    method: Literal["at_least", "exact"] = "at_least"
@@ -0,0 +1,21 @@
+"""
+Data model for returning the starting items needed for a target result.
+"""
+
+from pydantic import BaseModel
+from backend.result_request import ResultRequest
+
+class InverseResult(BaseModel):
+    """
+    Data model for sending the starting items needed for a target result.
+    Entry i of starting_counts is the number of items of quality i + 1 to start out with.
+    The counts aren't rounded, since the expected values are linear in the starting counts
+    (so e.g. 2.5 items means 5 items give twice the target).
+    """
+    starting_counts: list[float]
+    total_cost: float
+    #Expected result when starting out with starting_counts.
+    expected_result: ResultRequest
+    #Largest difference between the expected result and the target counts,
+    #only non-zero for the "exact" method if the target can't be hit exactly.
+    max_deviation: float
@@ -0,0 +1,25 @@
+"""
+Data models for submitting long-running jobs to the backend.
+"""
+
+from typing import Annotated, Literal
+from pydantic import BaseModel, Field
+from backend.monte_carlo_request import MonteCarloRequest
+from frontend.computation_request import ComputationRequest
+
+class BatchJobRequest(BaseModel):
+    """
+    A job running many simulations, like POST /simulate_batch.
+    """
+    kind: Literal["batch"] = "batch"
+    computation_requests: list[ComputationRequest]
+
+class MonteCarloJobRequest(BaseModel):
+    """
+    A job running a Monte Carlo simulation, like POST /monte_carlo.
+    """
+    kind: Literal["monte_carlo"] = "monte_carlo"
+    monte_carlo_request: MonteCarloRequest
+
+#The kind field decides which of the job types is used.
+JobRequest = Annotated[BatchJobRequest | MonteCarloJobRequest, Field(discriminator="kind")]
@@ -0,0 +1,22 @@
+"""
+Data model for returning the status of a job.
+"""
+
+from typing import Literal
+from pydantic import BaseModel
+from backend.monte_carlo_result import MonteCarloResult
+from backend.result_request import ResultRequest
+
+class JobStatus(BaseModel):
+    """
+    Data model for sending the status, progress and result of a job from backend to frontend.
+    """
+    id: str
+    kind: str
+    status: Literal["queued", "running", "done", "failed", "cancelled"]
+    #Fraction of the work which is done, from 0 to 1.
+    progress: float
+    #Only set when the status is "done".
+    result: list[ResultRequest] | MonteCarloResult | None = None
+    #Only set when the status is "failed".
+    error: str | None = None
@@ -0,0 +1,204 @@
+"""
+Runs long simulations (big batches and Monte Carlo simulations) as jobs in a process pool,
+so they don't hold on to the threads which serve the cheap /simulate requests.
+A job is split into chunks, which are submitted to the pool separately.
+This lets us report progress, and cancel the chunks which haven't started yet.
+"""
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable
+import numpy as np
+from backend.batch import run_simulation_batch
+from backend.job_request import BatchJobRequest, JobRequest, MonteCarloJobRequest
+from backend.job_status import JobStatus
+from backend.monte_carlo import (get_chunks,
+                                 get_trial_arguments,
+                                 simulate_trials,
+                                 summarize_trials,
+                                 validate_monte_carlo_request)
+
+#Number of simulations in each chunk of a batch job.
+BATCH_CHUNK_SIZE = 1000
+
+class JobQueueFullError(Exception):
+    """
+    Raised when a job is submitted while too many jobs are already queued or running.
+    """
+
+class Job:
+    """
+    A submitted job, consisting of one future per chunk.
+    Once every chunk is done, finish is called with the chunk results to create the result.
+    """
+    def __init__(self, kind: str, futures: list[Future], finish: Callable):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.futures = futures
+        self.finish = finish
+        self.cancelled = False
+        self.result = None
+        self.error = None
+        #Time at which the job was done, failed or cancelled, used for expiring the job.
+        self.finished_at = None
+
+    def is_finished(self) -> bool:
+        """
+        Returns True if no more work will be done for the job.
+        """
+        return self.cancelled or all(future.done() for future in self.futures)
+
+    def get_status(self) -> JobStatus:
+        """
+        Returns the status of the job. Should only be called while holding the lock
+        of the job manager, since it creates the result the first time the job is done.
+        """
+        done = sum(future.done() for future in self.futures)
+        progress = done / len(self.futures) if self.futures else 1
+        if self.cancelled:
+            status = "cancelled"
+        elif done < len(self.futures):
+            started = done > 0 or any(future.running() for future in self.futures)
+            status = "running" if started else "queued"
+        else:
+            status = self._finish()
+        return JobStatus(id=self.id, kind=self.kind, status=status, progress=progress,
+                         result=self.result, error=self.error)
+
+    def _finish(self) -> str:
+        """
+        Creates the result from the chunk results, and returns either "done" or "failed".
+        """
+        if self.result is None and self.error is None:
+            try:
+                self.result = self.finish([future.result() for future in self.futures])
+            except Exception as e: # pylint: disable=broad-exception-caught
+                #Errors from the worker processes are reported to the client.
+                self.error = f"{type(e).__name__}: {e}"
+        return "failed" if self.error is not None else "done"
+
+class JobManager:
+    """
+    Keeps track of the jobs and the process pool running them.
+    At most max_active_jobs can be queued or running at the same time,
+    and finished jobs are forgotten result_ttl seconds after they're finished.
+    """
+    def __init__(self, workers: int | None = None,
+                 max_active_jobs: int = 100,
+                 result_ttl: float = 600):
+        self.workers = workers or os.cpu_count()
+        self.max_active_jobs = max_active_jobs
+        self.result_ttl = result_ttl
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """
+        Returns the process pool, starting it the first time a job is submitted.
+        """
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def _remove_expired_jobs(self):
+        """
+        Forgets the jobs which finished more than result_ttl seconds ago.
+        """
+        now = time.monotonic()
+        for job in self._jobs.values():
+            if job.finished_at is None and job.is_finished():
+                job.finished_at = now
+        self._jobs = {job_id: job for job_id, job in self._jobs.items()
+                      if job.finished_at is None or now - job.finished_at < self.result_ttl}
+
+    def submit(self, job_request: JobRequest) -> JobStatus:
+        """
+        Splits the job into chunks and submits them to the process pool.
+        Raises JobQueueFullError if too many jobs are already queued or running,
+        and ValueError if the request is invalid.
+        """
+        with self._lock:
+            self._remove_expired_jobs()
+            active_jobs = sum(not job.is_finished() for job in self._jobs.values())
+            if active_jobs >= self.max_active_jobs:
+                raise JobQueueFullError(f"There are already {active_jobs} jobs in the queue.")
+            if isinstance(job_request, BatchJobRequest):
+                job = self._submit_batch(job_request)
+            else:
+                job = self._submit_monte_carlo(job_request)
+            self._jobs[job.id] = job
+            return job.get_status()
+
+    def _submit_batch(self, job_request: BatchJobRequest) -> Job:
+        """
+        Submits a batch job in chunks of BATCH_CHUNK_SIZE simulations.
+        """
+        requests = job_request.computation_requests
+        futures = [self._get_executor().submit(run_simulation_batch,
+                                               requests[start:start + BATCH_CHUNK_SIZE])
+                   for start in range(0, len(requests), BATCH_CHUNK_SIZE)]
+        def finish(chunk_results):
+            return [result for chunk in chunk_results for result in chunk]
+        return Job(job_request.kind, futures, finish)
+
+    def _submit_monte_carlo(self, job_request: MonteCarloJobRequest) -> Job:
+        """
+        Submits a Monte Carlo job, with one chunk per chunk of trials.
+        """
+        monte_carlo_request = job_request.monte_carlo_request
+        seed = validate_monte_carlo_request(monte_carlo_request)
+        arguments = get_trial_arguments(monte_carlo_request)
+        futures = [self._get_executor().submit(simulate_trials, size, chunk_seed, *arguments)
+                   for size, chunk_seed in get_chunks(monte_carlo_request.number_of_trials, seed)]
+        def finish(chunk_results):
+            return summarize_trials(monte_carlo_request, seed, np.concatenate(chunk_results))
+        return Job(job_request.kind, futures, finish)
+
+    def get(self, job_id: str) -> JobStatus | None:
+        """
+        Returns the status of the job, or None if there's no such job (or it has expired).
+        """
+        with self._lock:
+            self._remove_expired_jobs()
+            job = self._jobs.get(job_id)
+            return None if job is None else job.get_status()
+
+    def cancel(self, job_id: str) -> JobStatus | None:
+        """
+        Cancels the job, or returns None if there's no such job.
+        Chunks which are already running will finish, but their results are thrown away.
+        Jobs which are already finished aren't changed.
+        """
+        with self._lock:
+            self._remove_expired_jobs()
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if not job.is_finished():
+                for future in job.futures:
+                    future.cancel()
+                job.cancelled = True
+                job.finished_at = time.monotonic()
+            return job.get_status()
+
+    def shutdown(self):
+        """
+        Stops the process pool, cancelling every chunk which hasn't started yet.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+def create_job_manager() -> JobManager:
+    """
+    Returns a job manager configured with the JOB_WORKERS, JOB_QUEUE_DEPTH
+    and JOB_RESULT_TTL_SECONDS environment variables.
+    """
+    workers = os.environ.get("JOB_WORKERS")
+    return JobManager(workers=int(workers) if workers else None,
+                      max_active_jobs=int(os.environ.get("JOB_QUEUE_DEPTH", 100)),
+                      result_ttl=float(os.environ.get("JOB_RESULT_TTL_SECONDS", 600)))
@@ -0,0 +1,14 @@
+"""
+Data model for returning the response kernel of a layout.
+"""
+
+from pydantic import BaseModel
+
+class KernelResult(BaseModel):
+    """
+    Data model for sending the 4x5 response kernel from backend to frontend.
+    Entry (i, j) of the kernel is the expected number of items of quality j + 1
+    for every item of quality i + 1 we start out with, so the expected result for any
+    starting counts is just the starting counts multiplied by the kernel.
+    """
+    kernel: list[list[float]]
@@ -0,0 +1,413 @@
+"""
+Counters, gauges and histograms for the API, exposed on /metrics in the Prometheus text format.
+This is a small implementation of the parts of the Prometheus client we need,
+so the metrics can be tested without any external service.
+
+The metrics can be turned off with the METRICS_ENABLED environment variable (set it to 0).
+The functions timed with timed_stage are then left as they are, and the API doesn't
+install the middleware or the instrumented routes, so the instrumentation costs nothing.
+"""
+
+import functools
+import inspect
+import math
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable
+import numpy as np
+from fastapi.routing import APIRoute
+
+#Upper bounds of the latency buckets in seconds, from 10 microseconds to 10 seconds.
+LATENCY_BUCKETS = [1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+#Upper bounds of the buckets for the number of iterations of a simulation.
+ITERATION_BUCKETS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 10**4, 10**5, 10**6]
+
+def format_labels(label_names: tuple, label_values: tuple, extra: str = "") -> str:
+    """
+    Returns the labels in the Prometheus format, e.g. {path="/simulate",status="200"}.
+    """
+    labels = [f'{name}="{value}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        labels.append(extra)
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+def format_value(value: float) -> str:
+    """
+    Returns the value in the Prometheus format.
+    """
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    """
+    A metric with one value per combination of label values.
+    """
+    kind = "untyped"
+
+    def __init__(self, name: str, description: str, label_names: tuple = ()):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def clear(self):
+        """
+        Resets the metric.
+        """
+        with self._lock:
+            self._values.clear()
+
+    def render(self) -> list[str]:
+        """
+        Returns the lines of the metric in the Prometheus text format.
+        """
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            values = self._values
+            if not values and not self.label_names and self.kind != "histogram":
+                #A counter without labels is reported as 0 before it's increased.
+                values = {(): 0}
+            for label_values, value in sorted(values.items()):
+                lines.extend(self._render_value(label_values, value))
+        return lines
+
+    def _render_value(self, label_values: tuple, value) -> list[str]:
+        """
+        Returns the lines for the value of a single combination of label values.
+        """
+        return [f"{self.name}{format_labels(self.label_names, label_values)} "
+                f"{format_value(value)}"]
+
+class Counter(Metric):
+    """
+    A value which only goes up, e.g. the number of requests.
+    """
+    kind = "counter"
+
+    def inc(self, *label_values, amount: float = 1):
+        """
+        Increases the counter for the label values.
+        """
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def get(self, *label_values) -> float:
+        """
+        Returns the value of the counter for the label values.
+        """
+        with self._lock:
+            return self._values.get(label_values, 0)
+
+class Gauge(Counter):
+    """
+    A value which goes up and down, e.g. the number of requests being handled.
+    """
+    kind = "gauge"
+
+    def dec(self, *label_values, amount: float = 1):
+        """
+        Decreases the gauge for the label values.
+        """
+        self.inc(*label_values, amount=-amount)
+
+class Histogram(Metric):
+    """
+    Counts observations in buckets, e.g. how long a stage of a request took.
+    Each bucket counts the observations less than or equal to its upper bound.
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, label_names: tuple = (),
+                 buckets: list[float] | None = None):
+        super().__init__(name, description, label_names)
+        self.buckets = sorted(buckets or LATENCY_BUCKETS) + [math.inf]
+
+    def _get_histogram(self, label_values: tuple) -> dict:
+        """
+        Returns the bucket counts, sum and count for the label values.
+        Should only be called while holding the lock.
+        """
+        if label_values not in self._values:
+            self._values[label_values] = {"buckets": [0] * len(self.buckets),
+                                          "sum": 0.0, "count": 0}
+        return self._values[label_values]
+
+    def observe(self, value: float, *label_values):
+        """
+        Adds an observation for the label values.
+        """
+        with self._lock:
+            histogram = self._get_histogram(label_values)
+            #Only the first bucket the value fits in is counted here,
+            #the cumulative counts are computed when the histogram is rendered.
+            for index, upper_bound in enumerate(self.buckets):
+                if value <= upper_bound:
+                    histogram["buckets"][index] += 1
+                    break
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def observe_many(self, values: np.array, *label_values):
+        """
+        Adds an observation for every value in the array, without a Python loop over them.
+        """
+        counts = np.bincount(np.searchsorted(self.buckets, values, side="left"),
+                             minlength=len(self.buckets))
+        with self._lock:
+            histogram = self._get_histogram(label_values)
+            histogram["buckets"] = [int(total + count) for total, count
+                                    in zip(histogram["buckets"], counts)]
+            histogram["sum"] += float(np.sum(values))
+            histogram["count"] += len(values)
+
+    def get_count(self, *label_values) -> int:
+        """
+        Returns the number of observations for the label values.
+        """
+        with self._lock:
+            histogram = self._values.get(label_values)
+            return 0 if histogram is None else histogram["count"]
+
+    def _render_value(self, label_values: tuple, value) -> list[str]:
+        lines = []
+        cumulative_count = 0
+        for upper_bound, count in zip(self.buckets, value["buckets"]):
+            cumulative_count += count
+            labels = format_labels(self.label_names, label_values,
+                                   f'le="{format_value(upper_bound)}"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative_count}")
+        labels = format_labels(self.label_names, label_values)
+        lines.append(f"{self.name}_sum{labels} {format_value(value['sum'])}")
+        lines.append(f"{self.name}_count{labels} {value['count']}")
+        return lines
+
+class StageTimer:
+    """
+    Context manager which adds the time spent in the with block to the stage histogram.
+    """
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_):
+        stage_seconds.observe(time.perf_counter() - self.start, self.stage)
+
+class DisabledTimer:
+    """
+    Context manager which does nothing, used when the metrics are turned off.
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        pass
+
+DISABLED_TIMER = DisabledTimer()
+
+enabled = os.environ.get("METRICS_ENABLED", "1") not in ("0", "false", "False")
+
+requests_total = Counter("http_requests_total",
+                         "Number of handled requests.", ("method", "path", "status"))
+request_errors_total = Counter("http_request_errors_total",
+                               "Number of requests which failed with a 4xx or 5xx status.",
+                               ("method", "path", "status"))
+requests_in_flight = Gauge("http_requests_in_flight",
+                           "Number of requests which are being handled right now.")
+request_seconds = Histogram("http_request_duration_seconds",
+                            "Time from receiving a request until the response is sent.",
+                            ("path",))
+stage_seconds = Histogram("simulation_stage_duration_seconds",
+                          "Time spent in each stage of handling a request.", ("stage",))
+simulation_iterations = Histogram("simulation_iterations",
+                                  "Number of iterations of finite simulations.",
+                                  buckets=ITERATION_BUCKETS)
+infinite_simulations_total = Counter("simulation_infinite_iterations_total",
+                                     "Number of simulations with infinitely many iterations.")
+METRICS = [requests_total, request_errors_total, requests_in_flight, request_seconds,
+           stage_seconds, simulation_iterations, infinite_simulations_total]
+
+#Timestamps of the request being handled, shared between MetricsMiddleware
+#and the endpoint function (which runs in another thread with a copy of the context).
+request_timestamps = ContextVar("request_timestamps", default=None)
+
+def time_stage(stage: str) -> StageTimer | DisabledTimer:
+    """
+    Returns a context manager which times the stage, e.g.
+        with time_stage("build_transition_matrix"):
+            ...
+    """
+    if not enabled:
+        return DISABLED_TIMER
+    return StageTimer(stage)
+
+def timed_stage(stage: str) -> Callable:
+    """
+    Decorator which times every call of the function as the stage.
+    If the metrics are turned off, the function is returned as it is.
+    """
+    def decorator(function: Callable) -> Callable:
+        if not enabled:
+            return function
+        @functools.wraps(function)
+        def timed_function(*args, **kwargs):
+            with StageTimer(stage):
+                return function(*args, **kwargs)
+        return timed_function
+    return decorator
+
+def observe_iterations(number_of_iterations: int | str):
+    """
+    Adds the number of iterations of a simulation to the iteration histogram.
+    """
+    if not enabled:
+        return
+    if number_of_iterations == "infinite":
+        infinite_simulations_total.inc()
+    else:
+        simulation_iterations.observe(number_of_iterations)
+
+def observe_iteration_counts(number_of_iterations: np.array, infinite: np.array):
+    """
+    Adds the numbers of iterations of many simulations to the iteration histogram.
+    Simulations which are marked as infinite are counted separately (see batch.py).
+    """
+    if not enabled:
+        return
+    infinite_simulations_total.inc(amount=int(np.sum(infinite)))
+    simulation_iterations.observe_many(number_of_iterations[~infinite])
+
+def render_metrics(extra_lines: list[str] | None = None) -> str:
+    """
+    Returns every metric in the Prometheus text format.
+    """
+    lines = [line for metric in METRICS for line in metric.render()]
+    return "\n".join(lines + (extra_lines or [])) + "\n"
+
+def clear_metrics():
+    """
+    Resets every metric.
+    """
+    for metric in METRICS:
+        metric.clear()
+
+def render_cache_stats(cache_stats: dict[str, dict]) -> list[str]:
+    """
+    Returns the hit, miss and eviction counters and the size of the caches
+    (see LRUCache.stats) in the Prometheus text format.
+    """
+    lines = []
+    for counter in ["hits", "misses", "evictions"]:
+        name = f"cache_{counter}_total"
+        lines += [f"# HELP {name} Number of cache {counter}.", f"# TYPE {name} counter"]
+        lines += [f'{name}{{cache="{cache}"}} {stats[counter]}'
+                  for cache, stats in cache_stats.items()]
+    lines += ["# HELP cache_size Number of cached entries.", "# TYPE cache_size gauge"]
+    lines += [f'cache_size{{cache="{cache}"}} {stats["size"]}'
+              for cache, stats in cache_stats.items()]
+    return lines
+
+def render_coalescing_stats(coalescing_stats: dict) -> list[str]:
+    """
+    Returns the number of coalesced /simulate requests and the number of computations
+    (see SingleFlight.stats) in the Prometheus text format.
+    """
+    return ["# HELP simulate_computations_total Number of /simulate computations "
+            "which weren't cached or coalesced.",
+            "# TYPE simulate_computations_total counter",
+            f"simulate_computations_total {coalescing_stats['calls']}",
+            "# HELP simulate_coalesced_requests_total Number of /simulate requests "
+            "which shared the computation of an identical request.",
+            "# TYPE simulate_coalesced_requests_total counter",
+            f"simulate_coalesced_requests_total {coalescing_stats['coalesced']}"]
+
+def instrument_endpoint(endpoint: Callable) -> Callable:
+    """
+    Wraps the endpoint function so the time until it's called (reading and validating
+    the request) and the time spent in it are added to the stage histogram.
+    """
+    def before():
+        timestamps = request_timestamps.get()
+        if timestamps is not None:
+            stage_seconds.observe(time.perf_counter() - timestamps["received"], "validation")
+        return timestamps, time.perf_counter()
+
+    def after(timestamps, start):
+        now = time.perf_counter()
+        stage_seconds.observe(now - start, "handler")
+        if timestamps is not None:
+            timestamps["handled"] = now
+
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def instrumented_async_endpoint(*args, **kwargs):
+            timestamps, start = before()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                after(timestamps, start)
+        return instrumented_async_endpoint
+
+    @functools.wraps(endpoint)
+    def instrumented_endpoint(*args, **kwargs):
+        timestamps, start = before()
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            after(timestamps, start)
+    return instrumented_endpoint
+
+class InstrumentedRoute(APIRoute):
+    """
+    Route which times the validation of the request and the endpoint function.
+    """
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, instrument_endpoint(endpoint), **kwargs)
+
+class MetricsMiddleware:
+    """
+    ASGI middleware which counts the requests, errors and requests in flight,
+    and times the whole request as well as the serialization of the response.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timestamps = {"received": time.perf_counter(), "handled": None}
+        token = request_timestamps.set(timestamps)
+        status = 500 #Used if the app raises before sending a response.
+
+        async def send_with_metrics(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if timestamps["handled"] is not None:
+                    stage_seconds.observe(time.perf_counter() - timestamps["handled"],
+                                          "serialization")
+            await send(message)
+
+        requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            requests_in_flight.dec()
+            request_timestamps.reset(token)
+            #The route is only known after routing, and the path template is used
+            #instead of the actual path, so /jobs/{job_id} is a single label.
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            request_seconds.observe(time.perf_counter() - timestamps["received"], path)
+            requests_total.inc(scope["method"], path, str(status))
+            if status >= 400:
+                request_errors_total.inc(scope["method"], path, str(status))
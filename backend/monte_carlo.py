@@ -0,0 +1,188 @@
+"""
+Monte Carlo version of the simulation in backend.py.
+The Markov chain in backend.py only gives the expected number of items of each quality.
+Here we instead sample whole numbers of items going through the assembler and the recycler,
+which gives us the spread of the outcome, e.g. how often 1000 normal items
+give fewer than 50 legendary items.
+
+Every trial is simulated at once with vectorized binomial and multinomial draws,
+and the trials are split into chunks which are run on a process pool.
+Every chunk has its own seed derived from the request seed, so the result only
+depends on the seed and not on the number of processes.
+"""
+
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from backend.backend import (calculate_distribution,
+                             calculate_result_request,
+                             check_convergence,
+                             generate_transition_matrix,
+                             get_effective_boosts,
+                             get_probabilities_of_upgrading,
+                             get_recycler_boosts,
+                             split_transition_matrix)
+from backend.monte_carlo_request import MonteCarloRequest
+from backend.monte_carlo_result import MonteCarloResult, TierStatistics
+
+#Number of trials simulated by a single process at a time.
+CHUNK_SIZE = 50000
+#Upper limit on the number of cycles for infinitely many iterations.
+#The number of items left shrinks exponentially, so this is never reached in practice.
+MAX_CYCLES = 100000
+
+def craft(rng: np.random.Generator,
+          ingredients: np.array,
+          productivity_boost: float,
+          quality_boost: float) -> np.array:
+    """
+    Samples the number of items of each quality made from a (trials, 5) array of ingredients.
+    Every ingredient is one craft, whose quality is rolled once, and which gives
+    1 + productivity_boost items on average. The fractional part of the productivity boost
+    is treated as the chance of getting an extra item.
+    """
+    #The probabilities from get_probabilities_of_upgrading are multiplied by the
+    #number of items per craft, so we divide that back out.
+    upgrade_probabilities = get_probabilities_of_upgrading(productivity_boost,
+                                                           quality_boost) / (1 + productivity_boost)
+    items_per_craft = math.floor(1 + productivity_boost)
+    chance_of_extra_item = 1 + productivity_boost - items_per_craft
+    products = np.zeros(ingredients.shape, dtype=np.int64)
+    for tier in range(5):
+        if not np.any(ingredients[:, tier]):
+            continue
+        crafts = rng.multinomial(ingredients[:, tier], upgrade_probabilities)
+        #Upgrades past legendary are still legendary.
+        for upgrade in range(5):
+            products[:, min(tier + upgrade, 4)] += crafts[:, upgrade]
+    return products * items_per_craft + rng.binomial(products, chance_of_extra_item)
+
+def simulate_trials(number_of_trials: int,
+                    seed: np.random.SeedSequence,
+                    starting_counts: list[int],
+                    number_of_iterations: int | str,
+                    assembler_boosts: tuple[float, float],
+                    recycler_boosts: tuple[float, float]) -> np.array:
+    """
+    Returns a (number_of_trials, 5) array with the number of items of each quality
+    at the end of each trial.
+    """
+    rng = np.random.default_rng(seed)
+    ingredients = np.zeros((number_of_trials, 5), dtype=np.int64)
+    ingredients[:, :4] = starting_counts
+    legendary_products = np.zeros(number_of_trials, dtype=np.int64)
+    if number_of_iterations == "infinite":
+        number_of_iterations = MAX_CYCLES
+    for _ in range(number_of_iterations):
+        products = craft(rng, ingredients, *assembler_boosts)
+        #Legendary items aren't recycled.
+        legendary_products += products[:, 4]
+        products[:, 4] = 0
+        ingredients = craft(rng, products, *recycler_boosts)
+        if not np.any(ingredients):
+            break
+    #Just like in calculate_result_request, the legendary items are the legendary products
+    #plus the legendary ingredients that just left the recycler.
+    ingredients[:, 4] += legendary_products
+    return ingredients
+
+def get_chunks(number_of_trials: int, seed: int) -> list[tuple[int, np.random.SeedSequence]]:
+    """
+    Splits the trials into chunks of at most CHUNK_SIZE trials, each with its own seed.
+    """
+    number_of_chunks = math.ceil(number_of_trials / CHUNK_SIZE)
+    seeds = np.random.SeedSequence(seed).spawn(number_of_chunks)
+    sizes = [min(CHUNK_SIZE, number_of_trials - chunk * CHUNK_SIZE)
+             for chunk in range(number_of_chunks)]
+    return list(zip(sizes, seeds))
+
+def get_trial_arguments(monte_carlo_request: MonteCarloRequest) -> tuple:
+    """
+    Returns the arguments for simulate_trials after the number of trials and the seed.
+    """
+    computation_request = monte_carlo_request.computation_request
+    starting_counts = [computation_request.quality_1_count,
+                       computation_request.quality_2_count,
+                       computation_request.quality_3_count,
+                       computation_request.quality_4_count]
+    return (starting_counts,
+            computation_request.number_of_iterations,
+            get_effective_boosts(computation_request),
+            get_recycler_boosts(computation_request))
+
+def run_trials(monte_carlo_request: MonteCarloRequest, seed: int) -> np.array:
+    """
+    Runs all trials, using a process pool if there's more than one chunk,
+    and returns a (number_of_trials, 5) array with the outcome of each trial.
+    """
+    arguments = get_trial_arguments(monte_carlo_request)
+    chunks = get_chunks(monte_carlo_request.number_of_trials, seed)
+    workers = monte_carlo_request.workers or os.cpu_count()
+    if len(chunks) == 1 or workers == 1:
+        outcomes = [simulate_trials(size, chunk_seed, *arguments) for size, chunk_seed in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+            futures = [executor.submit(simulate_trials, size, chunk_seed, *arguments)
+                       for size, chunk_seed in chunks]
+            outcomes = [future.result() for future in futures]
+    return np.concatenate(outcomes)
+
+def validate_monte_carlo_request(monte_carlo_request: MonteCarloRequest) -> int:
+    """
+    Raises a ValueError if the request is invalid, otherwise returns the seed to use.
+    Layouts which never converge raise a NonConvergingChainError with infinitely many
+    iterations, before any trials are run (they would run for MAX_CYCLES cycles).
+    """
+    if monte_carlo_request.number_of_trials < 2:
+        raise ValueError("At least 2 trials are needed to estimate the spread.")
+    if any(not 0 <= quantile <= 1 for quantile in monte_carlo_request.quantiles):
+        raise ValueError("Quantiles must be between 0 and 1.")
+    if monte_carlo_request.workers is not None and monte_carlo_request.workers < 1:
+        raise ValueError("At least 1 worker is needed.")
+    computation_request = monte_carlo_request.computation_request
+    if computation_request.number_of_iterations == "infinite":
+        transient_to_transient, _ = split_transition_matrix(
+            generate_transition_matrix(computation_request))
+        check_convergence(transient_to_transient)
+    if monte_carlo_request.seed is None:
+        return int(np.random.SeedSequence().entropy % 2**63)
+    return monte_carlo_request.seed
+
+def summarize_trials(monte_carlo_request: MonteCarloRequest, 
+                     seed: int, 
+                     outcomes: np.array) -> MonteCarloResult:
+    """
+    Returns statistics for each quality from a (number_of_trials, 5) array of outcomes,
+    along with a comparison to the expected values from the Markov chain.
+    """
+    means = outcomes.mean(axis=0)
+    standard_deviations = outcomes.std(axis=0, ddof=1)
+    quantiles = np.quantile(outcomes, monte_carlo_request.quantiles, axis=0)
+
+    distribution = calculate_distribution(monte_carlo_request.computation_request)
+    analytic_means = distribution[:5] + distribution[5:]
+    #A tier without any spread (e.g. no items left) has a standard error of 0,
+    #but the sampled mean can't be more precise than a single item in a single trial.
+    standard_errors = np.maximum(standard_deviations / math.sqrt(len(outcomes)),
+                                 1 / len(outcomes))
+    errors = np.abs(means - analytic_means) / standard_errors
+
+    tiers = [TierStatistics(mean=means[tier],
+                            standard_deviation=standard_deviations[tier],
+                            quantiles=quantiles[:, tier].tolist())
+             for tier in range(5)]
+    return MonteCarloResult(tiers=tiers,
+                            number_of_trials=len(outcomes),
+                            seed=seed,
+                            analytic_result=calculate_result_request(distribution),
+                            max_standard_errors_from_analytic=np.max(errors))
+
+def run_monte_carlo(monte_carlo_request: MonteCarloRequest) -> MonteCarloResult:
+    """
+    Samples the number of items of each quality and returns statistics for each quality,
+    along with a comparison to the expected values from the Markov chain.
+    """
+    seed = validate_monte_carlo_request(monte_carlo_request)
+    outcomes = run_trials(monte_carlo_request, seed)
+    return summarize_trials(monte_carlo_request, seed, outcomes)
@@ -0,0 +1,19 @@
+"""
+Data model for Monte Carlo simulations.
+"""
+
+from pydantic import BaseModel
+from frontend.computation_request import ComputationRequest
+
+class MonteCarloRequest(BaseModel):
+    """
+    Data model for asking the backend to sample the number of items of each quality,
+    instead of only calculating the expected number.
+    """
+    computation_request: ComputationRequest
+    number_of_trials: int = 100000
+    #The same seed always gives the same result. None picks a random seed.
+    seed: int | None = None
+    quantiles: list[float] = [0.05, 0.5, 0.95]
+    #Number of processes to split the trials over. None uses every core.
+    workers: int | None = None
@@ -0,0 +1,29 @@
+"""
+Data model for returning the result of a Monte Carlo simulation.
+"""
+
+from pydantic import BaseModel
+from backend.result_request import ResultRequest
+
+class TierStatistics(BaseModel):
+    """
+    Statistics of the number of items of a single quality across all trials.
+    """
+    mean: float
+    standard_deviation: float
+    #One entry for each quantile in the request, in the same order.
+    quantiles: list[float]
+
+class MonteCarloResult(BaseModel):
+    """
+    Data model for sending the result of a Monte Carlo simulation from backend to frontend.
+    """
+    #One entry for each quality, from normal to legendary.
+    tiers: list[TierStatistics]
+    number_of_trials: int
+    seed: int
+    #The expected number of items calculated with the Markov chain in backend.py.
+    analytic_result: ResultRequest
+    #The largest difference between the sampled mean and the analytic result,
+    #measured in standard errors. Values above ~4 suggest that something is wrong.
+    max_standard_errors_from_analytic: float
@@ -0,0 +1,28 @@
+"""
+Data model for searching for the best module layout.
+"""
+
+from typing import Annotated, Literal
+from pydantic import BaseModel, Field
+
+class OptimizationRequest(BaseModel):
+    """
+    Data model for asking the backend which module layout gives the most
+    legendary items for a given research level.
+    """
+    productivity_boost_from_research: float
+    #None means that every machine type is searched.
+    machine_type: str | None = None
+    #None means that the number of module slots of the machine type is used.
+    module_slots: int | None = None
+    #Relative cost of a single module of each quality, from normal to legendary.
+    #None means that get_module_tier_costs in optimizer.py is used.
+    module_tier_costs: list[float] | None = None
+    number_of_iterations: Annotated[int, Field(ge=0)] | Literal["infinite"] = "infinite"
+    quality_1_count: int = 1
+    quality_2_count: int = 0
+    quality_3_count: int = 0
+    quality_4_count: int = 0
+    #Quality modules in the recyclers, see ComputationRequest.
+    number_of_recycler_quality_modules: int = 4
+    quality_of_recycler_quality_modules: str = "Legendary"
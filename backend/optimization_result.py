@@ -0,0 +1,27 @@
+"""
+Data model for returning the best module layouts.
+"""
+
+from pydantic import BaseModel
+
+class LayoutCandidate(BaseModel):
+    """
+    A single module layout along with how well it performs.
+    """
+    machine_type: str
+    quality_of_production_modules: str
+    number_of_productivity_modules: int
+    quality_of_quality_modules: str
+    number_of_quality_modules: int
+    #Expected number of legendary items per item we start out with.
+    legendary_yield: float
+    module_cost: float
+
+class OptimizationResult(BaseModel):
+    """
+    Data model for sending the Pareto front of module layouts from backend to frontend.
+    The candidates are sorted from highest to lowest yield,
+    so the cheapest layout that still is worth considering comes last.
+    """
+    candidates: list[LayoutCandidate]
+    number_of_evaluated_layouts: int
@@ -0,0 +1,146 @@
+"""
+Searches every module layout for the ones that give the most legendary items.
+A layout is a machine type, a number of productivity and quality modules
+that fit in the machine, and the quality of both module types.
+All layouts are scored in one vectorized batch (see batch.py), after which
+we only keep the layouts that aren't dominated by a cheaper layout with a higher yield.
+"""
+
+import numpy as np
+from backend.backend import (CHIP_TYPES,
+                             chip_type_to_number,
+                             is_non_converging,
+                             split_transition_matrix)
+from backend.batch import calculate_distributions, generate_transition_matrices
+from backend.optimization_request import OptimizationRequest
+from backend.optimization_result import LayoutCandidate, OptimizationResult
+
+MACHINE_TYPES = ["Electromagnetic plant", "Other (e.g. Assembling machine 3)"]
+
+def get_module_slots(machine_type: str) -> int:
+    """
+    Returns the number of module slots of the machine type.
+    """
+    if machine_type == "Electromagnetic plant":
+        return 5
+    return 4 #Assembling machine 3, foundry etc. all have 4 module slots.
+
+def get_module_tier_costs():
+    """
+    Returns a list with the relative cost of a single module of each quality.
+    Order is from worst to best. These are rough estimates,
+    since the true cost depends on how the modules are produced.
+    """
+    return [1, 2, 4, 8, 16]
+
+def enumerate_layouts(machine_types: list[str], module_slots: int | None) -> dict:
+    """
+    Returns one array per layout setting, with one entry for every valid layout.
+    Chip qualities are stored as their chip number (1-5).
+    """
+    layouts = {"machine_type": [], "number_of_productivity_modules": [],
+               "quality_of_production_modules": [], "number_of_quality_modules": [],
+               "quality_of_quality_modules": []}
+    for machine_type in machine_types:
+        slots = get_module_slots(machine_type) if module_slots is None else module_slots
+        productivity, quality = np.meshgrid(np.arange(slots + 1), np.arange(slots + 1),
+                                            indexing="ij")
+        fits = productivity + quality <= slots
+        for number_of_productivity, number_of_quality in zip(productivity[fits], quality[fits]):
+            #The quality of the modules doesn't matter if there aren't any,
+            #so we only include the normal quality in that case.
+            productivity_tiers = range(1, 6) if number_of_productivity > 0 else [1]
+            quality_tiers = range(1, 6) if number_of_quality > 0 else [1]
+            for productivity_tier in productivity_tiers:
+                for quality_tier in quality_tiers:
+                    layouts["machine_type"].append(machine_type)
+                    layouts["number_of_productivity_modules"].append(number_of_productivity)
+                    layouts["quality_of_production_modules"].append(productivity_tier)
+                    layouts["number_of_quality_modules"].append(number_of_quality)
+                    layouts["quality_of_quality_modules"].append(quality_tier)
+    return {setting: np.asarray(values) for setting, values in layouts.items()}
+
+def get_pareto_front(legendary_yields: np.array, module_costs: np.array) -> np.array:
+    """
+    Returns the indices of the layouts which aren't dominated by another layout,
+    i.e. no other layout has a higher yield for the same or a lower cost.
+    The indices are sorted from highest to lowest yield.
+    """
+    #Sort by cost and then by yield, both with the best first.
+    #A layout is on the front if it beats the yield of every cheaper layout.
+    #Yields which only differ by rounding errors (e.g. when productivity is capped)
+    #don't count as an improvement.
+    order = np.lexsort((-legendary_yields, module_costs))
+    sorted_yields = legendary_yields[order]
+    best_cheaper_yield = np.concatenate(([-np.inf], np.maximum.accumulate(sorted_yields)[:-1]))
+    improves = (sorted_yields > best_cheaper_yield) & \
+        ~np.isclose(sorted_yields, best_cheaper_yield, rtol=1e-9, atol=0)
+    front = order[improves]
+    return front[::-1]
+
+def optimize_layout(optimization_request: OptimizationRequest) -> OptimizationResult:
+    """
+    Scores every layout and returns the Pareto front of yield against module cost.
+    With infinitely many iterations, layouts whose items never leave the loop
+    have no yield, so they're left out instead of failing the whole search.
+    """
+    if optimization_request.machine_type is None:
+        machine_types = MACHINE_TYPES
+    else:
+        machine_types = [optimization_request.machine_type]
+    layouts = enumerate_layouts(machine_types, optimization_request.module_slots)
+    number_of_layouts = len(layouts["machine_type"])
+
+    columns = dict(layouts)
+    columns["machine_type"] = layouts["machine_type"] == "Electromagnetic plant"
+    columns["productivity_boost_from_research"] = np.full(
+        number_of_layouts, optimization_request.productivity_boost_from_research)
+    columns["number_of_recycler_quality_modules"] = np.full(
+        number_of_layouts, optimization_request.number_of_recycler_quality_modules)
+    columns["quality_of_recycler_quality_modules"] = np.full(
+        number_of_layouts,
+        chip_type_to_number(optimization_request.quality_of_recycler_quality_modules))
+    iterations = optimization_request.number_of_iterations
+    columns["infinite_iterations"] = np.full(number_of_layouts, iterations == "infinite")
+    columns["number_of_iterations"] = np.full(number_of_layouts,
+                                              0 if iterations == "infinite" else iterations)
+    starting_counts = []
+    for quality in range(1, 5):
+        count = getattr(optimization_request, f"quality_{quality}_count")
+        starting_counts.append(count)
+        columns[f"quality_{quality}_count"] = np.full(number_of_layouts, count)
+    if sum(starting_counts) <= 0:
+        raise ValueError("At least one starting item is needed to calculate the yield.")
+    if iterations == "infinite":
+        converging = ~is_non_converging(
+            split_transition_matrix(generate_transition_matrices(columns))[0])
+        layouts = {setting: values[converging] for setting, values in layouts.items()}
+        columns = {column: values[converging] for column, values in columns.items()}
+
+    distributions = calculate_distributions(columns)
+    #Legendary items are either leaving the recycler (entry 4) or the assembler (entry 9).
+    legendary_yields = (distributions[:, 4] + distributions[:, 9]) / sum(starting_counts)
+
+    tier_costs = optimization_request.module_tier_costs or get_module_tier_costs()
+    if len(tier_costs) != len(CHIP_TYPES):
+        raise ValueError(f"Expected a module cost for each of the {len(CHIP_TYPES)} qualities.")
+    tier_costs = np.asarray(tier_costs, dtype=float)
+    module_costs = (layouts["number_of_productivity_modules"] *
+                    tier_costs[layouts["quality_of_production_modules"] - 1] +
+                    layouts["number_of_quality_modules"] *
+                    tier_costs[layouts["quality_of_quality_modules"] - 1])
+
+    candidates = [
+        LayoutCandidate(
+            machine_type=layouts["machine_type"][index],
+            quality_of_production_modules=CHIP_TYPES[
+                layouts["quality_of_production_modules"][index] - 1],
+            number_of_productivity_modules=layouts["number_of_productivity_modules"][index],
+            quality_of_quality_modules=CHIP_TYPES[layouts["quality_of_quality_modules"][index] - 1],
+            number_of_quality_modules=layouts["number_of_quality_modules"][index],
+            legendary_yield=legendary_yields[index],
+            module_cost=module_costs[index])
+        for index in get_pareto_front(legendary_yields, module_costs)
+    ]
+    return OptimizationResult(candidates=candidates,
+                              number_of_evaluated_layouts=number_of_layouts)
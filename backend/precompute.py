@@ -0,0 +1,238 @@
+"""
+Precomputed table of response kernels for infinitely many iterations.
+Every layout (machine type, production and quality modules) is evaluated for a grid of
+research boosts ahead of time and written to a single .npy file, which the API
+memory-maps read-only at startup. The operating system keeps one copy of the pages
+in its page cache, so every uvicorn worker shares the same table instead of
+computing (and caching) the kernels separately.
+
+Only the recycler from the command line is precomputed (by default 4 legendary quality
+modules), and research boosts have to be on the grid exactly. Any other request,
+and every request with a finite number of iterations, is computed live as before.
+We don't interpolate between grid points, so the kernels in the table agree with
+the live kernels to about 1e-12 (relative). They're batched solves instead of single ones,
+so the last bits can differ, and a count which is right on a rounding boundary
+can be rounded the other way.
+Layouts which never converge (see is_non_converging in backend.py) are stored as NaN,
+and are computed live, which raises the usual error.
+
+Usage: python -m backend.precompute --output precomputed_kernels.npy
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+import numpy as np
+from backend.backend import (CHIP_TYPES,
+                             build_transition_matrices,
+                             calculate_productivity_boost,
+                             calculate_quality_boost,
+                             chip_type_to_number,
+                             get_recycler_boosts,
+                             is_electromagnetic_plant,
+                             is_non_converging,
+                             read_only,
+                             split_transition_matrix)
+from frontend.computation_request import ComputationRequest
+
+#Largest number of productivity and quality modules in the table.
+MAX_MODULES = 8
+NUMBER_OF_CHIP_TYPES = len(CHIP_TYPES)
+#Shape of the layouts: machine type (electromagnetic plant or not), production module
+#quality, number of productivity modules, quality module quality, number of quality modules.
+LAYOUT_SHAPE = (2, NUMBER_OF_CHIP_TYPES, MAX_MODULES + 1, NUMBER_OF_CHIP_TYPES, MAX_MODULES + 1)
+
+def get_table_dtype(number_of_research_boosts: int) -> np.dtype:
+    """
+    Returns the structured type of the table. The table is a single record, so the grid
+    and the kernels are stored (and memory-mapped) together in one .npy file.
+    """
+    return np.dtype([("research_boosts", np.float64, (number_of_research_boosts,)),
+                     ("recycler_quality_boost", np.float64),
+                     ("kernels", np.float64,
+                      LAYOUT_SHAPE + (number_of_research_boosts, 4))])
+
+def get_research_grid(max_research: float, research_step: float) -> np.array:
+    """
+    Returns the research boosts from 0 to max_research in steps of research_step.
+    """
+    if research_step <= 0 or max_research < 0:
+        raise ValueError("The research step must be positive and the maximum can't be negative.")
+    number_of_steps = int(round(max_research / research_step))
+    #Rounding makes the grid points the same floats as typing e.g. 0.3 in a request.
+    return np.round(np.arange(number_of_steps + 1) * research_step, 10)
+
+def calculate_kernel_table(research_boosts: np.array,
+                           recycler_quality_boost: float) -> np.array:
+    """
+    Returns the expected number of legendary items per starting item of quality 1-4
+    after infinitely many iterations (column 4 of calculate_response_kernel)
+    for every layout and research boost, with shape LAYOUT_SHAPE + (len(research_boosts), 4).
+    Layouts which never converge are NaN.
+    """
+    machine_types, production_qualities, productivity_modules, \
+        quality_qualities, quality_modules = np.indices(LAYOUT_SHAPE, sparse=True)
+    kernels = np.zeros(LAYOUT_SHAPE + (len(research_boosts), 4))
+    quality_boosts = calculate_quality_boost(quality_modules, quality_qualities + 1)
+    #One research boost at a time, so only a few thousand matrices are held in memory.
+    for index, research_boost in enumerate(research_boosts):
+        productivity_boosts = calculate_productivity_boost(productivity_modules,
+                                                           production_qualities + 1,
+                                                           False,
+                                                           machine_types.astype(bool),
+                                                           research_boost)
+        productivity_boosts, quality_boosts_of_layouts = np.broadcast_arrays(
+            productivity_boosts, quality_boosts)
+        transition_matrices = build_transition_matrices(productivity_boosts,
+                                                        quality_boosts_of_layouts,
+                                                        recycler_quality_boost)
+        transient_to_transient, transient_to_absorbing = \
+            split_transition_matrix(transition_matrices)
+        identity_minus_q = np.eye(9) - transient_to_transient
+        #Singular layouts are solved with the identity instead, and set to NaN afterwards.
+        singular = is_non_converging(transient_to_transient)
+        identity_minus_q[singular] = np.eye(9)
+        absorbed = np.linalg.solve(identity_minus_q, transient_to_absorbing[..., np.newaxis])
+        absorbed[singular] = np.nan
+        kernels[..., index, :] = absorbed[..., :4, 0]
+    return kernels
+
+def write_kernel_table(path: str,
+                       research_boosts: np.array,
+                       number_of_recycler_quality_modules: int = 4,
+                       quality_of_recycler_quality_modules: str = "Legendary"):
+    """
+    Computes the table for the research boosts and the recycler, and writes it to path.
+    """
+    recycler_quality_boost = float(calculate_quality_boost(
+        number_of_recycler_quality_modules,
+        chip_type_to_number(quality_of_recycler_quality_modules)))
+    table = np.zeros((), dtype=get_table_dtype(len(research_boosts)))
+    table["research_boosts"] = research_boosts
+    table["recycler_quality_boost"] = recycler_quality_boost
+    table["kernels"] = calculate_kernel_table(research_boosts, recycler_quality_boost)
+    np.save(path, table)
+
+class PrecomputedKernels:
+    """
+    A memory-mapped table of response kernels for infinitely many iterations.
+    Lookups which aren't in the table are counted as misses, so the grid can be tuned.
+    The kernels agree with calculate_response_kernel to about 1e-12 (relative),
+    not bit for bit, see the top of this file.
+    """
+    def __init__(self, table: np.array):
+        names = table.dtype.names or ()
+        if table.shape != () or \
+                names != ("research_boosts", "recycler_quality_boost", "kernels") or \
+                table.dtype != get_table_dtype(len(table["research_boosts"])):
+            raise ValueError("The file isn't a table written by backend.precompute.")
+        self.research_boosts = table["research_boosts"]
+        self.recycler_quality_boost = float(table["recycler_quality_boost"])
+        self.kernels = table["kernels"]
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def load(cls, path: str) -> "PrecomputedKernels":
+        """
+        Memory-maps the table at path read-only.
+        """
+        return cls(np.load(path, mmap_mode="r", allow_pickle=False))
+
+    def get_index(self, request: ComputationRequest) -> tuple | None:
+        """
+        Returns the index of the layout and research boost of the request in the table,
+        or None if the request isn't in the table.
+        """
+        if request.number_of_iterations != "infinite":
+            return None
+        _, recycler_quality_boost = get_recycler_boosts(request)
+        if recycler_quality_boost != self.recycler_quality_boost:
+            return None
+        productivity_modules = request.number_of_productivity_modules
+        quality_modules = request.number_of_quality_modules
+        if not (0 <= productivity_modules <= MAX_MODULES and 0 <= quality_modules <= MAX_MODULES):
+            return None
+        research_index = int(np.searchsorted(self.research_boosts,
+                                             request.productivity_boost_from_research))
+        if research_index == len(self.research_boosts) or \
+                self.research_boosts[research_index] != request.productivity_boost_from_research:
+            return None
+        return (int(is_electromagnetic_plant(request.machine_type)),
+                chip_type_to_number(request.quality_of_production_modules) - 1,
+                productivity_modules,
+                chip_type_to_number(request.quality_of_quality_modules) - 1,
+                quality_modules,
+                research_index)
+
+    def get(self, request: ComputationRequest) -> np.ndarray | None:
+        """
+        Returns the 4x5 response kernel of the request (see calculate_response_kernel),
+        or None if it has to be computed live. Layouts which never converge are
+        computed live too, so they raise the same error as without the table.
+        """
+        index = self.get_index(request)
+        absorbed = None if index is None else self.kernels[index]
+        with self._lock:
+            if absorbed is None or np.any(np.isnan(absorbed)):
+                self.misses += 1
+                return None
+            self.hits += 1
+        kernel = np.zeros((4, 5))
+        kernel[:, 4] = absorbed
+        return read_only(kernel)
+
+    def stats(self) -> dict:
+        """
+        Returns the size of the table and the hit/miss counters, like LRUCache.stats.
+        """
+        with self._lock:
+            return {"size": self.kernels.size // 4,
+                    "maxsize": self.kernels.size // 4,
+                    "hits": self.hits,
+                    "misses": self.misses,
+                    "evictions": 0}
+
+def load_precomputed_kernels() -> PrecomputedKernels | None:
+    """
+    Returns the table at the path in the PRECOMPUTED_KERNELS_PATH environment variable,
+    or None if it isn't set.
+    """
+    path = os.environ.get("PRECOMPUTED_KERNELS_PATH")
+    if not path:
+        return None
+    return PrecomputedKernels.load(path)
+
+def main(arguments: list[str] | None = None) -> int:
+    """
+    Precomputes the table from the command line.
+    """
+    parser = argparse.ArgumentParser(
+        description="Precomputes the response kernels for infinitely many iterations.")
+    parser.add_argument("--output", default="precomputed_kernels.npy",
+                        help=".npy file to write the table to.")
+    parser.add_argument("--max-research", type=float, default=3.0,
+                        help="Largest productivity boost from research in the table.")
+    parser.add_argument("--research-step", type=float, default=0.1,
+                        help="Step between the productivity boosts from research.")
+    parser.add_argument("--recycler-modules", type=int, default=4,
+                        help="Number of quality modules in the recyclers.")
+    parser.add_argument("--recycler-quality", default="Legendary",
+                        help="Quality of the quality modules in the recyclers.")
+    arguments = parser.parse_args(arguments)
+
+    research_boosts = get_research_grid(arguments.max_research, arguments.research_step)
+    start = time.perf_counter()
+    write_kernel_table(arguments.output, research_boosts,
+                       arguments.recycler_modules, arguments.recycler_quality)
+    number_of_kernels = np.prod(LAYOUT_SHAPE) * len(research_boosts)
+    size_in_mib = os.path.getsize(arguments.output) / 2**20
+    print(f"Wrote {number_of_kernels} kernels ({size_in_mib:.1f} MiB) "
+          f"to {arguments.output} in {time.perf_counter() - start:.2f} s.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""
+Derivatives of the result with respect to the productivity and quality boost
+of the assembly machine, so the value of another research level or better modules
+can be read off directly instead of rerunning the simulation with perturbed settings.
+
+The derivatives are exact and computed in the same pass as the result (forward mode):
+every matrix carries its derivative along, and the product rule
+d(AB) = dA B + A dB is applied at every multiplication of the exponentiation by squaring.
+For infinitely many iterations we differentiate the fundamental matrix instead,
+using d(I - Q)^-1 = (I - Q)^-1 dQ (I - Q)^-1.
+"""
+
+import numpy as np
+from backend.backend import (build_transition_matrices,
+                             calculate_productivity_boost,
+                             calculate_quality_boost,
+                             check_convergence,
+                             chip_type_to_number,
+                             counts_to_result_request,
+                             get_base_matrices,
+                             get_matrix_boosts,
+                             get_starting_counts,
+                             is_electromagnetic_plant,
+                             split_transition_matrix)
+from backend.sensitivity_request import SensitivityGridRequest
+from backend.sensitivity_result import SensitivityGridResult, SensitivityResult
+from frontend.computation_request import ComputationRequest
+
+#Maximum productivity boost, see calculate_productivity_boost.
+MAX_PRODUCTIVITY_BOOST = 3
+
+def get_transition_matrix_derivatives(productivity_boost,
+                                      quality_boost,
+                                      recycler_quality_boost) -> tuple[np.array, np.array]:
+    """
+    Returns the transition matrices with shape (..., 10, 10), and their derivatives
+    with respect to the productivity and quality boost with shape (..., 2, 10, 10).
+    """
+    productivity_boost, quality_boost, recycler_quality_boost = np.broadcast_arrays(
+        productivity_boost, quality_boost, recycler_quality_boost)
+    transition_matrices = build_transition_matrices(productivity_boost, quality_boost,
+                                                    recycler_quality_boost)
+    derivatives = np.zeros(productivity_boost.shape + (2, 10, 10))
+    #Only the assembly machine (upper right) depends on the boosts. Its entries are
+    #(1 + productivity_boost) times an affine function of the quality boost,
+    #so both derivatives are differences of base matrices.
+    derivatives[..., 0, :5, 5:] = get_base_matrices(np.zeros(productivity_boost.shape),
+                                                    quality_boost)
+    derivatives[..., 1, :5, 5:] = get_base_matrices(productivity_boost,
+                                                    np.ones(quality_boost.shape)) - \
+        get_base_matrices(productivity_boost, np.zeros(quality_boost.shape))
+    return transition_matrices, derivatives
+
+def multiply(left: tuple[np.array, np.array],
+             right: tuple[np.array, np.array]) -> tuple[np.array, np.array]:
+    """
+    Multiplies two matrices along with their derivatives, using the product rule.
+    """
+    left_matrix, left_derivatives = left
+    right_matrix, right_derivatives = right
+    return (left_matrix @ right_matrix,
+            left_derivatives @ right_matrix[..., np.newaxis, :, :] +
+            left_matrix[..., np.newaxis, :, :] @ right_derivatives)
+
+def calculate_kernel_derivatives(transition_matrices: np.array,
+                                 derivatives: np.array,
+                                 number_of_iterations: int | str) -> tuple[np.array, np.array]:
+    """
+    Returns the response kernels with shape (..., 4, 5) (see calculate_response_kernel),
+    and their derivatives with shape (..., 2, 4, 5).
+    """
+    if number_of_iterations == "infinite":
+        #The legendary items are N * R, with N = (I - Q)^-1 the fundamental matrix,
+        #so their derivative is N * dQ * N * R + N * dR.
+        transient_to_transient, transient_to_absorbing = \
+            split_transition_matrix(transition_matrices)
+        transient_derivatives, absorbing_derivatives = split_transition_matrix(derivatives)
+        check_convergence(transient_to_transient)
+        identity_minus_q = np.eye(9) - transient_to_transient
+        absorbed = np.linalg.solve(identity_minus_q, transient_to_absorbing[..., np.newaxis])
+        absorbed_derivatives = np.linalg.solve(
+            identity_minus_q[..., np.newaxis, :, :],
+            transient_derivatives @ absorbed[..., np.newaxis, :, :] +
+            absorbing_derivatives[..., np.newaxis])
+        kernels = np.zeros(transition_matrices.shape[:-2] + (4, 5))
+        kernels[..., 4] = absorbed[..., :4, 0]
+        kernel_derivatives = np.zeros(derivatives.shape[:-2] + (4, 5))
+        kernel_derivatives[..., 4] = absorbed_derivatives[..., :4, 0]
+        return kernels, kernel_derivatives
+
+    #Exponentiation by squaring, with 2 steps per iteration (see calculate_iterations).
+    power = (np.broadcast_to(np.eye(10), transition_matrices.shape),
+             np.zeros(derivatives.shape))
+    binary_power = (transition_matrices, derivatives)
+    exponent = 2 * number_of_iterations
+    while exponent > 0:
+        if exponent & 1:
+            power = multiply(power, binary_power)
+        exponent >>= 1
+        if exponent > 0:
+            binary_power = multiply(binary_power, binary_power)
+    matrix, matrix_derivatives = power
+    return (matrix[..., :4, :5] + matrix[..., :4, 5:],
+            matrix_derivatives[..., :4, :5] + matrix_derivatives[..., :4, 5:])
+
+def run_sensitivity_analysis(computation_request: ComputationRequest) -> SensitivityResult:
+    """
+    Returns the result of the simulation along with the derivatives of every tier
+    with respect to the productivity and quality boost.
+    """
+    productivity_boost, quality_boost, recycler_quality_boost = \
+        get_matrix_boosts(computation_request)
+    kernel, kernel_derivatives = calculate_kernel_derivatives(
+        *get_transition_matrix_derivatives(productivity_boost, quality_boost,
+                                           recycler_quality_boost),
+        computation_request.number_of_iterations)
+    starting_counts = get_starting_counts(computation_request)
+    productivity_derivatives, quality_derivatives = starting_counts @ kernel_derivatives
+    is_capped = productivity_boost >= MAX_PRODUCTIVITY_BOOST
+    return SensitivityResult(
+        result=counts_to_result_request(starting_counts @ kernel),
+        productivity_boost_derivatives=productivity_derivatives.tolist(),
+        quality_boost_derivatives=quality_derivatives.tolist(),
+        research_derivatives=(0 * productivity_derivatives if is_capped
+                              else productivity_derivatives).tolist())
+
+def run_sensitivity_grid(grid_request: SensitivityGridRequest) -> SensitivityGridResult:
+    """
+    Returns the number of legendary items and its derivatives for every combination
+    of research level and module count, computed for the whole grid at once.
+    """
+    request = grid_request.computation_request
+    if not grid_request.productivity_boosts_from_research or not grid_request.module_counts:
+        raise ValueError("The grid needs at least one research level and one module count.")
+    if min(grid_request.module_counts) < 0:
+        raise ValueError("The module counts can't be negative.")
+    research = np.asarray(grid_request.productivity_boosts_from_research)[:, np.newaxis]
+    module_counts = np.asarray(grid_request.module_counts)[np.newaxis, :]
+    if grid_request.module_type == "productivity":
+        number_of_productivity_modules = module_counts
+        number_of_quality_modules = request.number_of_quality_modules
+    else:
+        number_of_productivity_modules = request.number_of_productivity_modules
+        number_of_quality_modules = module_counts
+    productivity_boosts = calculate_productivity_boost(
+        number_of_productivity_modules,
+        chip_type_to_number(request.quality_of_production_modules),
+        False,
+        is_electromagnetic_plant(request.machine_type),
+        research)
+    quality_boosts = calculate_quality_boost(
+        number_of_quality_modules, chip_type_to_number(request.quality_of_quality_modules))
+    _, _, recycler_quality_boost = get_matrix_boosts(request)
+    kernels, kernel_derivatives = calculate_kernel_derivatives(
+        *get_transition_matrix_derivatives(productivity_boosts, quality_boosts,
+                                           recycler_quality_boost),
+        request.number_of_iterations)
+    starting_counts = get_starting_counts(request)
+    #Only the legendary tier is returned for the grid.
+    legendary_counts = np.einsum("i,...i->...", starting_counts, kernels[..., 4])
+    legendary_derivatives = np.einsum("i,...ki->...k", starting_counts,
+                                      kernel_derivatives[..., 4])
+    research_derivatives = np.where(
+        np.broadcast_to(productivity_boosts, legendary_counts.shape) >= MAX_PRODUCTIVITY_BOOST,
+        0, legendary_derivatives[..., 0])
+    return SensitivityGridResult(
+        productivity_boosts_from_research=grid_request.productivity_boosts_from_research,
+        module_counts=grid_request.module_counts,
+        legendary_counts=np.round(legendary_counts, 2).tolist(),
+        productivity_boost_derivatives=legendary_derivatives[..., 0].tolist(),
+        quality_boost_derivatives=legendary_derivatives[..., 1].tolist(),
+        research_derivatives=research_derivatives.tolist())
@@ -0,0 +1,20 @@
+"""
+Data model for the grid mode of the sensitivity analysis.
+"""
+
+from typing import Literal
+from pydantic import BaseModel
+from frontend.computation_request import ComputationRequest
+
+class SensitivityGridRequest(BaseModel):
+    """
+    Data model for asking the backend for the legendary yield and its derivatives
+    for every combination of a research level and a module count.
+    All other settings are taken from the computation request.
+    """
+    computation_request: ComputationRequest
+    #Values of productivity_boost_from_research, e.g. 0.1 for 10%.
+    productivity_boosts_from_research: list[float]
+    module_counts: list[int]
+    #Whether the module counts are the number of quality or productivity modules.
+    module_type: Literal["quality", "productivity"] = "quality"
@@ -0,0 +1,35 @@
+"""
+Data models for returning the derivatives of the result
+with respect to the productivity and quality boost.
+"""
+
+from pydantic import BaseModel
+from backend.result_request import ResultRequest
+
+class SensitivityResult(BaseModel):
+    """
+    Data model for sending the result of a simulation together with its derivatives.
+    Entry i of each list is the derivative of the expected number of items of quality i + 1.
+    """
+    result: ResultRequest
+    #Derivatives with respect to the productivity and quality boost of the assembly machine,
+    #e.g. 0.01 times the productivity derivative is the gain from 1% more productivity.
+    productivity_boost_derivatives: list[float]
+    quality_boost_derivatives: list[float]
+    #Same as productivity_boost_derivatives, unless the productivity boost is at its cap
+    #of +300%, in which case more research doesn't help and the derivatives are 0.
+    research_derivatives: list[float]
+
+class SensitivityGridResult(BaseModel):
+    """
+    Data model for sending the legendary yield and its derivatives on a grid.
+    Entry (i, j) of each grid is for research level i and module count j.
+    """
+    productivity_boosts_from_research: list[float]
+    module_counts: list[int]
+    #Expected number of legendary items.
+    legendary_counts: list[list[float]]
+    #Derivatives of the number of legendary items.
+    productivity_boost_derivatives: list[list[float]]
+    quality_boost_derivatives: list[list[float]]
+    research_derivatives: list[list[float]]
@@ -0,0 +1,17 @@
+"""
+Data model for returning the result after infinitely many iterations.
+"""
+
+from pydantic import BaseModel
+from backend.result_request import ResultRequest
+
+class SteadyStateResult(BaseModel):
+    """
+    Data model for sending the limit of a simulation from backend to frontend,
+    together with the number of iterations it takes to get (almost) there.
+    """
+    result: ResultRequest
+    #Number of iterations until the expected number of items
+    #that aren't legendary yet drops below the threshold.
+    iterations_until_converged: int
+    threshold: float
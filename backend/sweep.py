@@ -0,0 +1,246 @@
+"""
+Command-line sweep over millions of scenarios, without going through the API.
+Scenarios are read from a CSV (or Parquet) file with one column per field of
+ComputationRequest, in chunks of a fixed number of rows. Every chunk is simulated with
+the columnar batch math (see columnar.py) in a process pool, and the quality_N_count
+columns of ResultRequest are appended to a CSV file in the same order as the input.
+Only a few chunks are held in memory at a time, no matter how big the input is.
+
+After every written chunk, the number of finished scenarios and the size of the output
+are saved to <output>.progress. An interrupted sweep is continued with --resume,
+which cuts the output back to the last finished chunk and skips the scenarios before it.
+
+Usage: python -m backend.sweep scenarios.csv results.csv --chunk-size 10000 --workers 8
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator
+import numpy as np
+from backend.columnar import (INTEGER_COLUMNS,
+                              RESULT_COLUMNS,
+                              arrays_to_columns,
+                              run_simulation_columns)
+
+#Number of chunks per worker which are read ahead, so the workers never wait for input.
+CHUNKS_IN_FLIGHT_PER_WORKER = 2
+
+def parse_chunk(arrays: dict) -> dict:
+    """
+    Converts the columns of a chunk which were read as text (numbers, and "infinite"
+    iterations) into numbers, so they can be passed to arrays_to_columns.
+    Raises a ValueError if a number can't be parsed.
+    """
+    arrays = {name: values.astype(str) if values.dtype.kind == "O" else values
+              for name, values in arrays.items()}
+    for name in INTEGER_COLUMNS + ["productivity_boost_from_research"]:
+        values = arrays.get(name)
+        if values is None or values.dtype.kind not in "US":
+            continue
+        if name == "number_of_iterations":
+            values = np.where(values == "infinite", "-1", values)
+        try:
+            arrays[name] = values.astype(float if name == "productivity_boost_from_research"
+                                         else int)
+        except ValueError as e:
+            raise ValueError(f"{name} contains a value which isn't a number: {e}") from e
+    return arrays
+
+def run_chunk(arrays: dict) -> str:
+    """
+    Simulates every scenario in the chunk, and returns the results as CSV rows.
+    Runs in the worker processes.
+    """
+    results = run_simulation_columns(arrays_to_columns(parse_chunk(arrays)))
+    values = np.column_stack([results[column] for column in RESULT_COLUMNS])
+    #One format string for the whole chunk is ~3x faster than np.savetxt, which formats
+    #every row separately.
+    row_format = ",".join(["%.2f"] * len(RESULT_COLUMNS)) + "\n"
+    return (row_format * len(values)) % tuple(values.ravel().tolist())
+
+def read_csv_chunks(path: str, chunk_size: int, skip_rows: int = 0) -> Iterator[dict]:
+    """
+    Yields the scenarios in the CSV file as chunks of one string array per column,
+    starting after the first skip_rows scenarios.
+    """
+    with open(path, newline="", encoding="utf-8") as file:
+        reader = csv.reader(file)
+        #next would raise StopIteration, which isn't allowed to leave a generator.
+        header = next(reader, None)
+        if header is None:
+            raise ValueError(f"{path} is empty, it needs at least a header row.")
+        #Skipped rows are only split into fields, not parsed.
+        rows = itertools.islice(reader, skip_rows, None)
+        while chunk := list(itertools.islice(rows, chunk_size)):
+            if any(len(row) != len(header) for row in chunk):
+                raise ValueError(f"Every row of {path} needs {len(header)} fields.")
+            values = np.array(chunk, dtype=str)
+            yield {name: values[:, index] for index, name in enumerate(header)}
+
+def read_parquet_chunks(path: str, chunk_size: int, skip_rows: int = 0) -> Iterator[dict]:
+    """
+    Yields the scenarios in the Parquet file as chunks of one array per column,
+    starting after the first skip_rows scenarios. Needs pyarrow, which is optional
+    (it's in requirements.txt, but only used here).
+    """
+    try:
+        import pyarrow.parquet # pylint: disable=import-outside-toplevel
+    except ImportError as e:
+        raise ValueError("Reading Parquet files needs pyarrow (pip install pyarrow).") from e
+    parquet_file = pyarrow.parquet.ParquetFile(path)
+    #Batches have chunk_size rows (except the last), so whole batches can be skipped.
+    skipped = 0
+    for batch in parquet_file.iter_batches(batch_size=chunk_size):
+        if skipped + batch.num_rows <= skip_rows:
+            skipped += batch.num_rows
+            continue
+        batch = batch.slice(skip_rows - skipped)
+        skipped = skip_rows
+        yield {name: column.to_numpy(zero_copy_only=False)
+               for name, column in zip(batch.schema.names, batch.columns)}
+
+def read_chunks(path: str, chunk_size: int, skip_rows: int = 0) -> Iterator[dict]:
+    """
+    Yields the scenarios in the CSV or Parquet (if the file ends with .parquet) file in chunks.
+    """
+    if path.endswith(".parquet"):
+        return read_parquet_chunks(path, chunk_size, skip_rows)
+    return read_csv_chunks(path, chunk_size, skip_rows)
+
+def get_progress_path(output_path: str) -> str:
+    """
+    Returns the path of the file in which the progress of the sweep is saved.
+    """
+    return output_path + ".progress"
+
+def save_progress(output_path: str, input_path: str, scenarios_done: int, output_bytes: int):
+    """
+    Saves the number of finished scenarios and the size of the output.
+    The file is replaced in one step, so it's never half written.
+    """
+    progress_path = get_progress_path(output_path)
+    with open(progress_path + ".tmp", "w", encoding="utf-8") as file:
+        json.dump({"input": os.path.abspath(input_path),
+                   "scenarios_done": scenarios_done,
+                   "output_bytes": output_bytes}, file)
+    os.replace(progress_path + ".tmp", progress_path)
+
+def load_progress(output_path: str, input_path: str) -> tuple[int, int]:
+    """
+    Returns the number of finished scenarios and the size of the output of an interrupted sweep,
+    or (0, 0) if there's nothing to resume.
+    Raises a ValueError if the sweep was run on another input.
+    """
+    progress_path = get_progress_path(output_path)
+    if not os.path.exists(progress_path) or not os.path.exists(output_path):
+        return 0, 0
+    with open(progress_path, encoding="utf-8") as file:
+        progress = json.load(file)
+    if progress["input"] != os.path.abspath(input_path):
+        raise ValueError(f"{output_path} belongs to a sweep of {progress['input']}.")
+    return progress["scenarios_done"], progress["output_bytes"]
+
+def run_sweep(input_path: str,
+              output_path: str,
+              chunk_size: int = 10000,
+              workers: int | None = None,
+              resume: bool = False,
+              report=print) -> dict:
+    """
+    Simulates every scenario in the input and writes the results to the output.
+    Calls report with a line of progress after every chunk, and returns the number
+    of scenarios simulated (in this run), the time it took and the scenarios per second.
+    """
+    if chunk_size < 1:
+        raise ValueError("The chunk size must be at least 1.")
+    workers = workers or os.cpu_count()
+    scenarios_done, output_bytes = load_progress(output_path, input_path) if resume else (0, 0)
+    if scenarios_done:
+        report(f"Resuming after {scenarios_done} scenarios.")
+    chunks = read_chunks(input_path, chunk_size, scenarios_done)
+    start = time.perf_counter()
+    scenarios_at_start = scenarios_done
+
+    with open(output_path, "r+b" if output_bytes else "wb") as output:
+        if output_bytes:
+            #Anything after the last saved chunk is from an interrupted write.
+            output.truncate(output_bytes)
+            output.seek(output_bytes)
+        else:
+            output.write((",".join(RESULT_COLUMNS) + "\n").encode())
+
+        def write(chunk_rows: int, text: str):
+            nonlocal scenarios_done
+            output.write(text.encode())
+            output.flush()
+            scenarios_done += chunk_rows
+            save_progress(output_path, input_path, scenarios_done, output.tell())
+            elapsed = time.perf_counter() - start
+            report(f"{scenarios_done} scenarios done, "
+                   f"{(scenarios_done - scenarios_at_start) / elapsed:.0f} scenarios/s.")
+
+        if workers == 1:
+            for chunk in chunks:
+                write(len(next(iter(chunk.values()))), run_chunk(chunk))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                #Chunks are written in input order, and only a few are in flight at a time,
+                #so the memory use doesn't grow with the size of the input.
+                pending = deque()
+                for chunk in chunks:
+                    pending.append((len(next(iter(chunk.values()))),
+                                    executor.submit(run_chunk, chunk)))
+                    if len(pending) >= workers * CHUNKS_IN_FLIGHT_PER_WORKER:
+                        chunk_rows, future = pending.popleft()
+                        write(chunk_rows, future.result())
+                while pending:
+                    chunk_rows, future = pending.popleft()
+                    write(chunk_rows, future.result())
+
+    #The sweep is done, so there's nothing left to resume.
+    if os.path.exists(get_progress_path(output_path)):
+        os.remove(get_progress_path(output_path))
+    elapsed = time.perf_counter() - start
+    scenarios = scenarios_done - scenarios_at_start
+    return {"scenarios": scenarios,
+            "seconds": elapsed,
+            "scenarios_per_second": scenarios / elapsed if elapsed > 0 else 0}
+
+def main(arguments: list[str] | None = None) -> int:
+    """
+    Runs a sweep from the command line.
+    """
+    parser = argparse.ArgumentParser(
+        description="Simulates every scenario in a CSV or Parquet file.")
+    parser.add_argument("input", help="CSV or .parquet file with one column per field "
+                                      "of ComputationRequest.")
+    parser.add_argument("output", help="CSV file to write the results to.")
+    parser.add_argument("--chunk-size", type=int, default=10000,
+                        help="Number of scenarios simulated at once by a worker.")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Number of worker processes (default: one per CPU).")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted sweep instead of starting over.")
+    arguments = parser.parse_args(arguments)
+
+    def report(line):
+        print(line, file=sys.stderr)
+    try:
+        summary = run_sweep(arguments.input, arguments.output, arguments.chunk_size,
+                            arguments.workers, arguments.resume, report)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(f"Simulated {summary['scenarios']} scenarios in {summary['seconds']:.2f} s "
+          f"({summary['scenarios_per_second']:.0f} scenarios/s).")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""
+Plans production lines by rate instead of by batch.
+A line is fed a constant stream of raw ingredients, so in steady state the flow through
+every state is the expected number of visits to that state per raw ingredient, times
+the input rate. The expected number of visits comes from the fundamental matrix
+N = (I - Q)^-1 of the absorbing Markov chain (see calculate_steady_state in backend.py),
+which we get from one linear solve per line. All lines are solved in one batched call.
+"""
+
+import numpy as np
+from backend.backend import chip_type_to_number, is_non_converging, split_transition_matrix
+from backend.batch import generate_transition_matrices
+from backend.throughput_request import ProductLine, ThroughputRequest
+from backend.throughput_result import LineThroughput, ThroughputResult
+
+#Base crafting speeds of the machines.
+ELECTROMAGNETIC_PLANT_CRAFTING_SPEED = 2
+ASSEMBLING_MACHINE_3_CRAFTING_SPEED = 1.25
+RECYCLER_CRAFTING_SPEED = 0.5
+#Recycling an item takes 1/16 of the crafting time of its recipe.
+RECYCLING_TIME_FRACTION = 1 / 16
+
+def get_assembler_crafting_speed(line: ProductLine) -> float:
+    """
+    Returns the crafting speed of the assemblers of the line.
+    """
+    if line.assembler_crafting_speed is not None:
+        return line.assembler_crafting_speed
+    if line.machine_type == "Electromagnetic plant":
+        return ELECTROMAGNETIC_PLANT_CRAFTING_SPEED
+    return ASSEMBLING_MACHINE_3_CRAFTING_SPEED #Foundries have the same crafting speed.
+
+def lines_to_columns(lines: list[ProductLine]) -> dict:
+    """
+    Converts the production lines into one NumPy array per setting,
+    in the same format as requests_to_columns in batch.py.
+    """
+    columns = {}
+    for field in ["productivity_boost_from_research",
+                  "number_of_productivity_modules",
+                  "number_of_quality_modules",
+                  "number_of_recycler_quality_modules",
+                  "crafting_time",
+                  "target_legendary_per_minute"]:
+        columns[field] = np.asarray([getattr(line, field) for line in lines])
+    for field in ["quality_of_production_modules",
+                  "quality_of_quality_modules",
+                  "quality_of_recycler_quality_modules",
+                  "input_quality"]:
+        columns[field] = np.asarray([chip_type_to_number(getattr(line, field)) for line in lines])
+    columns["machine_type"] = np.asarray([line.machine_type == "Electromagnetic plant"
+                                          for line in lines])
+    columns["assembler_crafting_speed"] = np.asarray(
+        [get_assembler_crafting_speed(line) for line in lines], dtype=float)
+    columns["recycler_crafting_speed"] = np.asarray(
+        [RECYCLER_CRAFTING_SPEED if line.recycler_crafting_speed is None
+         else line.recycler_crafting_speed for line in lines], dtype=float)
+    return columns
+
+def validate_columns(columns: dict):
+    """
+    Raises a ValueError if any of the production lines is invalid.
+    """
+    for field, description in [("crafting_time", "crafting time"),
+                               ("assembler_crafting_speed", "assembler crafting speed"),
+                               ("recycler_crafting_speed", "recycler crafting speed")]:
+        invalid = np.flatnonzero(columns[field] <= 0)
+        if len(invalid):
+            raise ValueError(f"Line {invalid[0]} needs a positive {description}.")
+    invalid = np.flatnonzero(columns["target_legendary_per_minute"] < 0)
+    if len(invalid):
+        raise ValueError(f"Line {invalid[0]} has a negative target.")
+
+def calculate_flows_per_input(transition_matrices: np.array,
+                              input_qualities: np.array) -> np.array:
+    """
+    Returns a (N, 10) array with the flow through every state per raw ingredient.
+    Entries 0-8 are the expected number of visits to the transient states,
+    and entry 9 is the expected number of legendary items.
+    """
+    number_of_lines = len(transition_matrices)
+    transient_to_transient, transient_to_absorbing = \
+        split_transition_matrix(transition_matrices)
+    inputs = np.zeros((number_of_lines, 9))
+    inputs[np.arange(number_of_lines), input_qualities - 1] = 1
+    identity_minus_q = np.swapaxes(np.eye(9) - transient_to_transient, 1, 2)
+    #Lines whose items never leave the loop (no quality boost and a productivity boost
+    #which makes up for the recycler) have a singular I - Q, see plan_throughput.
+    singular = is_non_converging(transient_to_transient)
+    identity_minus_q[singular] = np.eye(9)
+    flows = np.zeros((number_of_lines, 10))
+    flows[:, :9] = np.linalg.solve(identity_minus_q, inputs[:, :, np.newaxis])[:, :, 0]
+    flows[:, 9] = np.einsum("ni,ni->n", flows[:, :9], transient_to_absorbing)
+    flows[singular] = np.nan
+    return flows
+
+def plan_throughput(throughput_request: ThroughputRequest) -> ThroughputResult:
+    """
+    Returns the input rate, the flow through every state and the number of machines
+    needed for every production line to make its target number of legendary items.
+    Raises a ValueError if a line is invalid or never makes any legendary items.
+    """
+    if not throughput_request.lines:
+        return ThroughputResult(lines=[])
+    columns = lines_to_columns(throughput_request.lines)
+    validate_columns(columns)
+    transition_matrices = generate_transition_matrices(columns)
+    flows_per_input = calculate_flows_per_input(transition_matrices, columns["input_quality"])
+    legendary_per_input = flows_per_input[:, 9]
+    invalid = np.flatnonzero(~(legendary_per_input > 0))
+    if len(invalid):
+        raise ValueError(f"Line {invalid[0]} never makes any legendary items.")
+
+    input_per_minute = columns["target_legendary_per_minute"] / legendary_per_input
+    flows = flows_per_input * input_per_minute[:, np.newaxis]
+    #Every ingredient entering an assembler is one craft, and every item
+    #leaving it which isn't legendary is recycled.
+    crafts_per_minute = flows[:, :5].sum(axis=1)
+    recycled_per_minute = flows[:, 5:9].sum(axis=1)
+    assemblers = crafts_per_minute / 60 * columns["crafting_time"] / \
+        columns["assembler_crafting_speed"]
+    recyclers = recycled_per_minute / 60 * columns["crafting_time"] * \
+        RECYCLING_TIME_FRACTION / columns["recycler_crafting_speed"]
+    #Rounding errors shouldn't make us build an extra machine.
+    assemblers_rounded_up = np.ceil(np.round(assemblers, 9)).astype(int)
+    recyclers_rounded_up = np.ceil(np.round(recyclers, 9)).astype(int)
+
+    return ThroughputResult(lines=[
+        LineThroughput(input_per_minute=input_per_minute[line],
+                       legendary_per_minute=flows[line, 9],
+                       state_flows_per_minute=flows[line].tolist(),
+                       assembler_crafts_per_minute=crafts_per_minute[line],
+                       recycled_items_per_minute=recycled_per_minute[line],
+                       assemblers=assemblers[line],
+                       recyclers=recyclers[line],
+                       assemblers_rounded_up=assemblers_rounded_up[line],
+                       recyclers_rounded_up=recyclers_rounded_up[line])
+        for line in range(len(throughput_request.lines))])
@@ -0,0 +1,34 @@
+"""
+Data models for planning factories by rate instead of by batch.
+"""
+
+from pydantic import BaseModel
+
+class ProductLine(BaseModel):
+    """
+    A production line which is continuously fed with raw ingredients of a single quality,
+    and whose assemblers and recyclers run in a loop until the items are legendary.
+    """
+    productivity_boost_from_research: float
+    machine_type: str
+    quality_of_production_modules: str
+    number_of_productivity_modules: int
+    quality_of_quality_modules: str
+    number_of_quality_modules: int
+    number_of_recycler_quality_modules: int = 4
+    quality_of_recycler_quality_modules: str = "Legendary"
+    #Crafting time of the recipe in seconds. Recycling takes 1/16 of the crafting time.
+    crafting_time: float
+    target_legendary_per_minute: float
+    #Quality of the raw ingredients fed into the line.
+    input_quality: str = "Normal"
+    #Crafting speeds including the speed penalty of the modules.
+    #None uses the base crafting speed of the machine type, and 0.5 for the recycler.
+    assembler_crafting_speed: float | None = None
+    recycler_crafting_speed: float | None = None
+
+class ThroughputRequest(BaseModel):
+    """
+    Data model for planning many production lines at once.
+    """
+    lines: list[ProductLine]
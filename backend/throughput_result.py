@@ -0,0 +1,29 @@
+"""
+Data models for returning the rates and machine counts of production lines.
+"""
+
+from pydantic import BaseModel
+
+class LineThroughput(BaseModel):
+    """
+    Rates and machine counts of a single production line. All rates are per minute.
+    """
+    #Rate of raw ingredients fed into the line.
+    input_per_minute: float
+    legendary_per_minute: float
+    #Flow through each of the 10 states of the transition matrix: ingredients of each
+    #quality entering the assemblers, then items of each quality leaving them.
+    state_flows_per_minute: list[float]
+    assembler_crafts_per_minute: float
+    recycled_items_per_minute: float
+    #Exact number of machines needed, and the number rounded up to whole machines.
+    assemblers: float
+    recyclers: float
+    assemblers_rounded_up: int
+    recyclers_rounded_up: int
+
+class ThroughputResult(BaseModel):
+    """
+    Data model for sending the rates of every production line, in request order.
+    """
+    lines: list[LineThroughput]
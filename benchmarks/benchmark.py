@@ -0,0 +1,232 @@
+"""
+Benchmarks for the path every /simulate request goes through.
+Each stage is timed separately, so a slowdown can be traced to the stage which caused it:
+building the transition matrix, lifting it to a power, the whole simulation,
+the pydantic models, and the /simulate endpoint under concurrent load.
+
+Run from the root of the repository:
+    python -m benchmarks.benchmark --output benchmark.json
+    python -m benchmarks.benchmark --output new.json --compare benchmark.json --threshold 0.25
+The second command exits with status 1 if any benchmark got more than 25% slower.
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable
+import numpy as np
+from fastapi.testclient import TestClient
+from backend.api import app, response_cache
+from backend.backend import (CHIP_TYPES,
+                             calculate_iterations,
+                             generate_transition_matrix,
+                             get_starting_distribution,
+                             response_kernel_cache,
+                             run_simulation,
+                             transition_matrix_cache)
+from backend.result_request import ResultRequest
+from frontend.computation_request import ComputationRequest
+
+ITERATION_COUNTS = [1, 10, 100, 1000, 10**4, 10**5, 10**6]
+
+def get_computation_requests(number_of_requests: int, seed: int = 0) -> list[ComputationRequest]:
+    """
+    Returns realistic random requests, the same ones every time for the same seed.
+    """
+    rng = np.random.default_rng(seed)
+    requests = []
+    for _ in range(number_of_requests):
+        number_of_productivity_modules = int(rng.integers(0, 5))
+        requests.append(ComputationRequest(
+            productivity_boost_from_research=float(rng.integers(0, 31)) / 10,
+            machine_type=str(rng.choice(["Electromagnetic plant",
+                                         "Other (e.g. Assembling machine 3)"])),
+            quality_of_production_modules=str(rng.choice(CHIP_TYPES)),
+            number_of_productivity_modules=number_of_productivity_modules,
+            quality_of_quality_modules=str(rng.choice(CHIP_TYPES)),
+            number_of_quality_modules=int(rng.integers(0, 5 - number_of_productivity_modules)),
+            number_of_iterations=int(rng.integers(1, 1001)),
+            quality_1_count=int(rng.integers(0, 10000)),
+            quality_2_count=int(rng.integers(0, 100)),
+            quality_3_count=int(rng.integers(0, 10)),
+            quality_4_count=int(rng.integers(0, 2))))
+    return requests
+
+def summarize_timings(timings: list[float]) -> dict:
+    """
+    Returns the median, 99th percentile, mean and minimum of the timings in seconds.
+    """
+    timings = np.asarray(timings)
+    return {"p50": float(np.percentile(timings, 50)),
+            "p99": float(np.percentile(timings, 99)),
+            "mean": float(timings.mean()),
+            "min": float(timings.min()),
+            "runs": len(timings)}
+
+def time_calls(function: Callable,
+               arguments: list,
+               setup: Callable | None = None,
+               number: int = 1) -> dict:
+    """
+    Calls the function number times for every argument and returns a summary
+    of the time per call. Cheap functions should use a larger number,
+    so the timings aren't dominated by the clock.
+    setup is called before every argument, outside of the timed section.
+    """
+    timings = []
+    for argument in arguments:
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        for _ in range(number):
+            function(argument)
+        timings.append((time.perf_counter() - start) / number)
+    return summarize_timings(timings)
+
+def clear_caches():
+    """
+    Empties the backend caches, so the next request has to compute everything again.
+    """
+    transition_matrix_cache.clear()
+    response_kernel_cache.clear()
+    response_cache.clear()
+
+def benchmark_stages(requests: list[ComputationRequest]) -> dict:
+    """
+    Times every stage of a simulation separately.
+    """
+    results = {}
+    results["generate_transition_matrix/cold"] = time_calls(
+        generate_transition_matrix, requests, setup=clear_caches)
+    results["generate_transition_matrix/cached"] = time_calls(
+        generate_transition_matrix, requests, number=20)
+
+    transition_matrix = generate_transition_matrix(requests[0])
+    starting_distribution = get_starting_distribution(requests[0])
+    for iterations in ITERATION_COUNTS:
+        results[f"calculate_iterations/{iterations}"] = time_calls(
+            lambda iterations: calculate_iterations(iterations, transition_matrix,
+                                                    starting_distribution),
+            [iterations] * len(requests), number=5)
+
+    results["run_simulation/cold"] = time_calls(run_simulation, requests, setup=clear_caches)
+    results["run_simulation/cached"] = time_calls(run_simulation, requests, number=20)
+
+    payloads = [request.model_dump() for request in requests]
+    json_payloads = [request.model_dump_json() for request in requests]
+    results["ComputationRequest/validate"] = time_calls(ComputationRequest.model_validate,
+                                                        payloads, number=100)
+    results["ComputationRequest/validate_json"] = time_calls(
+        ComputationRequest.model_validate_json, json_payloads, number=100)
+    simulation_results = [run_simulation(request) for request in requests]
+    results["ResultRequest/dump_json"] = time_calls(ResultRequest.model_dump_json,
+                                                    simulation_results, number=100)
+    return results
+
+def benchmark_http(requests: list[ComputationRequest], concurrency: int) -> dict:
+    """
+    Sends the requests to /simulate from concurrency threads at a time,
+    and returns the latency percentiles along with the throughput in requests per second.
+    """
+    payloads = [request.model_dump() for request in requests]
+    with TestClient(app) as client:
+        def send(payload):
+            start = time.perf_counter()
+            response = client.post("/simulate", json=payload)
+            response.raise_for_status()
+            return time.perf_counter() - start
+        #Warm up the client and the event loop before measuring.
+        send(payloads[0])
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            timings = list(executor.map(send, payloads))
+        elapsed = time.perf_counter() - start
+    result = summarize_timings(timings)
+    result["throughput"] = len(payloads) / elapsed
+    result["concurrency"] = concurrency
+    return result
+
+def run_benchmarks(number_of_requests: int = 200, concurrency: int = 8) -> dict:
+    """
+    Runs every benchmark and returns the results together with information about the machine.
+    """
+    requests = get_computation_requests(number_of_requests)
+    benchmarks = benchmark_stages(requests)
+    clear_caches()
+    benchmarks["http/simulate"] = benchmark_http(requests, concurrency)
+    return {"metadata": {"timestamp": datetime.now(timezone.utc).isoformat(),
+                         "python": platform.python_version(),
+                         "numpy": np.__version__,
+                         "machine": platform.machine(),
+                         "number_of_requests": number_of_requests},
+            "benchmarks": benchmarks}
+
+def compare_results(baseline: dict, current: dict, threshold: float) -> list[str]:
+    """
+    Returns a description of every benchmark which got more than threshold slower
+    (e.g. 0.25 for 25%) than the baseline. The median is compared, and the throughput
+    as well for the HTTP benchmark. Benchmarks which are missing from either file are skipped.
+    """
+    regressions = []
+    for name, result in current["benchmarks"].items():
+        if name not in baseline["benchmarks"]:
+            continue
+        baseline_result = baseline["benchmarks"][name]
+        if result["p50"] > baseline_result["p50"] * (1 + threshold):
+            regressions.append(f"{name}: median went from {baseline_result['p50'] * 1e6:.1f} us "
+                               f"to {result['p50'] * 1e6:.1f} us")
+        if "throughput" in result and "throughput" in baseline_result and \
+                result["throughput"] * (1 + threshold) < baseline_result["throughput"]:
+            regressions.append(f"{name}: throughput went from "
+                               f"{baseline_result['throughput']:.0f} to "
+                               f"{result['throughput']:.0f} requests per second")
+    return regressions
+
+def print_results(results: dict):
+    """
+    Prints a table with the median and 99th percentile of every benchmark.
+    """
+    for name, result in results["benchmarks"].items():
+        line = f"{name:40} p50 {result['p50'] * 1e6:10.1f} us   p99 {result['p99'] * 1e6:10.1f} us"
+        if "throughput" in result:
+            line += f"   {result['throughput']:.0f} requests/s"
+        print(line)
+
+def main(arguments: list[str] | None = None) -> int:
+    """
+    Runs the benchmarks from the command line. Returns 1 if there are regressions.
+    """
+    parser = argparse.ArgumentParser(description="Benchmarks for the simulation backend.")
+    parser.add_argument("--output", default="benchmark.json",
+                        help="JSON file to write the results to.")
+    parser.add_argument("--compare", help="JSON file with baseline results to compare against.")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Allowed slowdown before a benchmark counts as a regression.")
+    parser.add_argument("--requests", type=int, default=200,
+                        help="Number of requests per benchmark.")
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="Number of threads sending requests to /simulate at the same time.")
+    arguments = parser.parse_args(arguments)
+
+    results = run_benchmarks(arguments.requests, arguments.concurrency)
+    print_results(results)
+    with open(arguments.output, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+
+    if arguments.compare:
+        with open(arguments.compare, encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = compare_results(baseline, results, arguments.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {arguments.threshold:.0%}.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,10 +9,16 @@ I made the unusual choice to organize the code into a few big functions for a co
    So I didn't want to spend too much time on building the Streamlit frontend.
 """
 
-import requests
+import json
+import os
 import streamlit as st
+from client import BackendError, simulate
 from computation_request import ComputationRequest
 
+#How long results are cached, and how many results are cached at most.
+CACHE_TTL_SECONDS = int(os.environ.get("FRONTEND_CACHE_TTL_SECONDS", 3600))
+CACHE_MAX_ENTRIES = int(os.environ.get("FRONTEND_CACHE_MAX_ENTRIES", 1000))
+
 
 def create_computation_request():
     """
@@ -44,12 +50,24 @@ def create_computation_request():
         value=0, 
         min_value=0, 
         max_value=8) #Max value is 8, because that's the maximum number of module slots.
+
+    quality_of_recycler_quality_modules = st.selectbox(
+        "Choose a quality of quality modules in the recyclers:", 
+        ["Normal", "Uncommon", "Rare", "Epic", "Legendary"],
+        index=4)
+    number_of_recycler_quality_modules = st.number_input(
+        "Enter the number of quality modules in the recyclers:",
+        value=4, 
+        min_value=0, 
+        max_value=4) #Recyclers have 4 module slots.
     st.header("Simulation Settings")
 
     number_of_iterations = st.number_input("Enter the number of iterations:", 
                                         value=1,
                                         min_value=1,
                                         max_value=1000)
+    if st.checkbox("Run infinitely many iterations instead"):
+        number_of_iterations = "infinite"
 
     quality_1_count = st.number_input("Enter the count of normal quality items you start out with:", 
                                     value=1,
@@ -75,6 +93,8 @@ def create_computation_request():
         number_of_productivity_modules=number_of_productivity_modules,
         quality_of_quality_modules=quality_of_quality_modules,
         number_of_quality_modules=number_of_quality_modules,
+        number_of_recycler_quality_modules=number_of_recycler_quality_modules,
+        quality_of_recycler_quality_modules=quality_of_recycler_quality_modules,
         number_of_iterations=number_of_iterations,
         quality_1_count=quality_1_count,
         quality_2_count=quality_2_count,
@@ -87,7 +107,9 @@ def display_results(result, number_of_iterations):
     Displays the results of the simulation.
     """
     st.success("Simulation completed.")
-    if number_of_iterations == 1:
+    if number_of_iterations == "infinite":
+        st.success("After infinitely many iterations you can expect:")
+    elif number_of_iterations == 1:
         st.success("After 1 iteration you can expect:")
     else:
         st.success(f"After {number_of_iterations} iterations you can expect:")
@@ -97,23 +119,26 @@ def display_results(result, number_of_iterations):
     st.success(f"{result['quality_4_count']} epic quality items.")
     st.success(f"{result['quality_5_count']} legendary quality items.")
     
+@st.cache_data(ttl=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def get_simulation_result(request_json: str) -> dict:
+    """
+    Returns the result of the simulation. Results are cached on the contents of the request,
+    so pressing the button again with the same settings returns instantly.
+    Errors aren't cached, since Streamlit doesn't cache functions which raise.
+    """
+    return simulate(json.loads(request_json))
+
 def run_simulation():
     """
-    Creates the simulation form, sends the simulation API request when the
+    Creates the simulation form, runs the simulation when the
     user presses the "Run Simulation" button.
     """
     computation_request = create_computation_request()
     if st.button("Run Simulation"):
         try:
-            response = requests.post("http://backend:8000/simulate", 
-                                     json=computation_request.model_dump(), 
-                                     timeout=10)
-            if response.status_code == 200:
-                result = response.json()
-                display_results(result, computation_request.number_of_iterations)
-            else:
-                st.write("Error: ", response.status_code)
-        except requests.exceptions.RequestException as e:
+            result = get_simulation_result(computation_request.model_dump_json())
+            display_results(result, computation_request.number_of_iterations)
+        except BackendError as e:
             st.write("An error occurred: ", e)
 
 def main():
@@ -132,8 +157,8 @@ def main():
                         "level after a certain number of iterations in Factorio.")
     st.sidebar.markdown("One iteration is the act of producing an item, " +
                         "and then recycling it if it's not legendary quality.")
-    st.sidebar.markdown("The simulation assumes you're using legendary quality modules 3 " +
-                        "in your recycling machines.")
+    st.sidebar.markdown("By default the simulation assumes you're using 4 legendary " +
+                        "quality modules 3 in your recycling machines.")
     st.sidebar.markdown("[Source code on Github 😊](https://github.com/wasabi39/factorio_quality)")
         
 if __name__ == "__main__":
@@ -0,0 +1,102 @@
+"""
+Client for running simulations from the frontend, either through the backend API
+or by calling the backend directly in the same process.
+
+The mode is chosen with the BACKEND_MODE environment variable:
+- "http" (default) sends the request to the API at BACKEND_URL,
+- "in_process" calls backend.backend.run_simulation directly, which skips HTTP
+  and doesn't need the backend container at all,
+- "auto" uses the API, but falls back to running in-process if the API can't be reached.
+HTTP requests share one pooled requests.Session, so the connection to the backend
+is reused between button presses instead of being opened again every time.
+"""
+
+import os
+import sys
+import threading
+from pathlib import Path
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+BACKEND_URL = os.environ.get("BACKEND_URL", "http://backend:8000")
+BACKEND_MODE = os.environ.get("BACKEND_MODE", "http")
+BACKEND_MODES = ["http", "in_process", "auto"]
+#Seconds to wait for the backend, and number of retries if it can't be reached.
+TIMEOUT = float(os.environ.get("BACKEND_TIMEOUT_SECONDS", 10))
+RETRIES = 2
+
+class BackendError(Exception):
+    """
+    Raised when the backend can't run the simulation.
+    """
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session() -> requests.Session:
+    """
+    Returns the session shared by every request to the backend, creating it the first time.
+    Failed connections are retried a few times, since the backend might still be starting.
+    """
+    global _session # pylint: disable=global-statement
+    with _session_lock:
+        if _session is None:
+            retry = Retry(total=RETRIES, backoff_factor=0.2, allowed_methods=["POST"],
+                          status_forcelist=[502, 503, 504])
+            _session = requests.Session()
+            _session.mount("http://", HTTPAdapter(max_retries=retry, pool_maxsize=10))
+            _session.mount("https://", HTTPAdapter(max_retries=retry, pool_maxsize=10))
+        return _session
+
+def simulate_over_http(request_data: dict, backend_url: str = BACKEND_URL) -> dict:
+    """
+    Sends the simulation request to the backend API and returns the result.
+    Raises a BackendError if the backend returns an error,
+    and a requests.RequestException if it can't be reached.
+    """
+    response = get_session().post(f"{backend_url}/simulate", json=request_data, timeout=TIMEOUT)
+    if response.status_code != 200:
+        raise BackendError(f"The backend returned status code {response.status_code}.")
+    return response.json()
+
+def simulate_in_process(request_data: dict) -> dict:
+    """
+    Runs the simulation in this process and returns the result.
+    """
+    #Streamlit only puts the frontend folder on the path,
+    #but the backend is imported from the root of the repository.
+    root = str(Path(__file__).resolve().parent.parent)
+    if root not in sys.path:
+        sys.path.append(root)
+    #The backend is only imported when it's needed,
+    #so the frontend doesn't load NumPy etc. when it talks to the API.
+    from backend.backend import run_simulation # pylint: disable=import-outside-toplevel
+    from frontend.computation_request import ( # pylint: disable=import-outside-toplevel
+        ComputationRequest)
+    try:
+        result = run_simulation(ComputationRequest.model_validate(request_data))
+    except ValueError as e:
+        raise BackendError(str(e)) from e
+    return result.model_dump()
+
+def simulate(request_data: dict,
+             mode: str = BACKEND_MODE,
+             backend_url: str = BACKEND_URL) -> dict:
+    """
+    Runs the simulation for a ComputationRequest (as a dict) with the given mode,
+    and returns the ResultRequest as a dict.
+    Raises a BackendError if the simulation fails.
+    """
+    if mode not in BACKEND_MODES:
+        raise BackendError(f"Unknown backend mode {mode}, expected one of {BACKEND_MODES}.")
+    if mode == "in_process":
+        return simulate_in_process(request_data)
+    try:
+        return simulate_over_http(request_data, backend_url)
+    except (requests.ConnectionError, requests.Timeout) as e:
+        if mode == "auto":
+            return simulate_in_process(request_data)
+        raise BackendError(f"The backend at {backend_url} can't be reached: {e}") from e
+    except requests.RequestException as e:
+        raise BackendError(f"The request to the backend failed: {e}") from e
@@ -2,7 +2,8 @@
 Data model for calculations. 
 """
 
-from pydantic import BaseModel
+from typing import Annotated, Literal
+from pydantic import BaseModel, Field
 
 class ComputationRequest(BaseModel):
     """
@@ -14,8 +15,12 @@ class ComputationRequest(BaseModel):
     number_of_productivity_modules: int
     quality_of_quality_modules: str
     number_of_quality_modules: int
-    number_of_iterations: int
+    #"infinite" returns the limit after infinitely many iterations.
+    number_of_iterations: Annotated[int, Field(ge=0)] | Literal["infinite"]
     quality_1_count: int
     quality_2_count: int
     quality_3_count: int
     quality_4_count: int
+    #Quality modules in the recyclers.
+    number_of_recycler_quality_modules: int = 4
+    quality_of_recycler_quality_modules: str = "Legendary"
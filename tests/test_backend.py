@@ -9,8 +9,21 @@ the Markov chain calculations do not break during refactoring.
 
 import unittest
 import numpy as np
+from fastapi.testclient import TestClient
 
-from backend.backend import generate_transition_matrix, run_simulation
+from backend.api import app
+from backend.backend import (NonConvergingChainError,
+                             build_transition_matrices,
+                             calculate_iterations, 
+                             generate_transition_matrix, 
+                             get_response_kernel,
+                             get_starting_distribution,
+                             is_non_converging,
+                             run_simulation,
+                             run_simulation_trajectory,
+                             run_steady_state_simulation)
+from backend.batch import run_simulation_batch
+from backend.sensitivity import run_sensitivity_analysis
 from frontend.computation_request import ComputationRequest
 
 class TestBackend(unittest.TestCase):
@@ -70,6 +83,212 @@ class TestBackend(unittest.TestCase):
         self.assertAlmostEqual(result.quality_4_count, 24.11, places=2)
         self.assertAlmostEqual(result.quality_5_count, 6182.18, places=2)
 
+    def test_infinite_iterations(self):
+        """
+        Test that the closed-form limit matches a very large number of iterations,
+        and that the reported number of iterations is the smallest one within the threshold.
+        """
+        computation_request = ComputationRequest(
+            productivity_boost_from_research=1.50,
+            machine_type="Electromagnetic plant",
+            quality_of_production_modules="Legendary",
+            number_of_productivity_modules=1,
+            quality_of_quality_modules="Legendary",
+            number_of_quality_modules=4,
+            number_of_iterations="infinite",
+            quality_1_count=1000,
+            quality_2_count=1000,
+            quality_3_count=1000,
+            quality_4_count=1000)
+
+        result = run_simulation(computation_request)
+        transition_matrix = generate_transition_matrix(computation_request)
+        starting_distribution = get_starting_distribution(computation_request)
+        self.assertEqual(result, calculate_iterations(100000, 
+                                                      transition_matrix, 
+                                                      starting_distribution))
+        self.assertAlmostEqual(result.quality_5_count, 6278.12, places=2)
+
+        steady_state = run_steady_state_simulation(computation_request, threshold=0.01)
+        self.assertEqual(steady_state.result, result)
+        iterations = steady_state.iterations_until_converged
+        distribution = starting_distribution @ \
+            np.linalg.matrix_power(transition_matrix, 2 * iterations)
+        self.assertLess(np.sum(distribution[:9]), 0.01)
+        distribution = starting_distribution @ \
+            np.linalg.matrix_power(transition_matrix, 2 * (iterations - 1))
+        self.assertGreaterEqual(np.sum(distribution[:9]), 0.01)
+
+    def test_trajectory(self):
+        """
+        Test that the trajectory yields the same result as run_simulation after every iteration.
+        """
+        computation_request = ComputationRequest(
+            productivity_boost_from_research=0.3,
+            machine_type="Other (e.g. Assembling machine 3)",
+            quality_of_production_modules="Rare",
+            number_of_productivity_modules=2,
+            quality_of_quality_modules="Epic",
+            number_of_quality_modules=2,
+            number_of_iterations=12,
+            quality_1_count=1000,
+            quality_2_count=0,
+            quality_3_count=50,
+            quality_4_count=0)
+
+        trajectory = list(run_simulation_trajectory(computation_request))
+        self.assertEqual(len(trajectory), 12)
+        for iterations, result in enumerate(trajectory, start=1):
+            request = computation_request.model_copy(update={"number_of_iterations": iterations})
+            self.assertEqual(result, run_simulation(request))
+
+    def test_response_kernel(self):
+        """
+        Test that multiplying the starting counts with the kernel gives the same result
+        as lifting the transition matrix to a power.
+        """
+        for number_of_iterations in [1, 7, "infinite"]:
+            computation_request = ComputationRequest(
+                productivity_boost_from_research=0.8,
+                machine_type="Electromagnetic plant",
+                quality_of_production_modules="Uncommon",
+                number_of_productivity_modules=2,
+                quality_of_quality_modules="Legendary",
+                number_of_quality_modules=3,
+                number_of_iterations=number_of_iterations,
+                quality_1_count=700,
+                quality_2_count=30,
+                quality_3_count=2,
+                quality_4_count=1)
+            kernel = get_response_kernel(computation_request)
+            self.assertEqual(kernel.shape, (4, 5))
+            transition_matrix = generate_transition_matrix(computation_request)
+            starting_distribution = get_starting_distribution(computation_request)
+            iterations = 100000 if number_of_iterations == "infinite" else number_of_iterations
+            expected = calculate_iterations(iterations, transition_matrix, starting_distribution)
+            self.assertEqual(run_simulation(computation_request), expected)
+
+    def test_transition_matrices_for_any_number_of_tiers(self):
+        """
+        Test that the builder gives valid transition matrices for other tier counts
+        and for a whole batch of boosts at once.
+        """
+        productivity_boosts = np.linspace(0, 2, 1000)
+        quality_boosts = np.linspace(0, 0.3, 1000)
+        for number_of_tiers in [2, 5, 40]:
+            result = build_transition_matrices(productivity_boosts, quality_boosts, 0.248,
+                                               number_of_tiers)
+            self.assertEqual(result.shape, (1000, 2 * number_of_tiers, 2 * number_of_tiers))
+            row_sums = result.sum(axis=-1)
+            np.testing.assert_allclose(row_sums[:, :number_of_tiers],
+                                       np.repeat(1 + productivity_boosts[:, np.newaxis],
+                                                 number_of_tiers, axis=1))
+            np.testing.assert_allclose(row_sums[:, number_of_tiers:-1], 0.25)
+            np.testing.assert_array_equal(row_sums[:, -1], 1)
+        #The 5 tier matrix matches the one used by the API.
+        computation_request = ComputationRequest(
+            productivity_boost_from_research=0,
+            machine_type="Electromagnetic plant",
+            quality_of_production_modules="Legendary",
+            number_of_productivity_modules=0,
+            quality_of_quality_modules="Legendary",
+            number_of_quality_modules=5,
+            number_of_iterations=1,
+            quality_1_count=1,
+            quality_2_count=0,
+            quality_3_count=0,
+            quality_4_count=0)
+        np.testing.assert_allclose(build_transition_matrices(0.5, 0.31, 0.248),
+                                   generate_transition_matrix(computation_request))
+
+    def test_recycler_modules(self):
+        """
+        Test that the default recycler is 4 legendary quality modules,
+        and that worse recyclers give fewer legendary items.
+        """
+        computation_request = ComputationRequest(
+            productivity_boost_from_research=0.5,
+            machine_type="Electromagnetic plant",
+            quality_of_production_modules="Legendary",
+            number_of_productivity_modules=2,
+            quality_of_quality_modules="Legendary",
+            number_of_quality_modules=3,
+            number_of_iterations="infinite",
+            quality_1_count=1000,
+            quality_2_count=0,
+            quality_3_count=0,
+            quality_4_count=0)
+        default = run_simulation(computation_request)
+        explicit = run_simulation(computation_request.model_copy(update={
+            "number_of_recycler_quality_modules": 4,
+            "quality_of_recycler_quality_modules": "Legendary"}))
+        self.assertEqual(default, explicit)
+        worse = run_simulation(computation_request.model_copy(update={
+            "number_of_recycler_quality_modules": 2,
+            "quality_of_recycler_quality_modules": "Rare"}))
+        no_modules = run_simulation(computation_request.model_copy(update={
+            "number_of_recycler_quality_modules": 0}))
+        self.assertLess(worse.quality_5_count, default.quality_5_count)
+        self.assertLess(no_modules.quality_5_count, worse.quality_5_count)
+
+    def test_non_converging_chain(self):
+        """
+        Test that a layout whose items never leave the loop raises a NonConvergingChainError
+        for infinitely many iterations, which the API returns as 422.
+        """
+        computation_request = ComputationRequest(
+            productivity_boost_from_research=3,
+            machine_type="Electromagnetic plant",
+            quality_of_production_modules="Legendary",
+            number_of_productivity_modules=5,
+            quality_of_quality_modules="Normal",
+            number_of_quality_modules=0,
+            number_of_iterations="infinite",
+            quality_1_count=10,
+            quality_2_count=0,
+            quality_3_count=0,
+            quality_4_count=0,
+            number_of_recycler_quality_modules=0)
+        for simulation in [run_simulation, run_steady_state_simulation, run_sensitivity_analysis,
+                           lambda request: run_simulation_batch([request])]:
+            with self.assertRaises(NonConvergingChainError):
+                simulation(computation_request)
+        with TestClient(app) as client:
+            for endpoint in ["/simulate", "/steady_state", "/kernel", "/sensitivity"]:
+                response = client.post(endpoint, json=computation_request.model_dump())
+                self.assertEqual(response.status_code, 422)
+        #A finite number of iterations still works.
+        finite_request = computation_request.model_copy(update={"number_of_iterations": 5})
+        self.assertEqual(run_simulation(finite_request).quality_1_count, 10)
+
+    def test_near_critical_chain_converges(self):
+        """
+        Test that a layout just below the productivity which makes up for the recycler
+        still converges. Its determinant of I - Q is ~4e-15, but it isn't singular.
+        """
+        computation_request = ComputationRequest(
+            productivity_boost_from_research=2.999,
+            machine_type="Other (e.g. Assembling machine 3)",
+            quality_of_production_modules="Normal",
+            number_of_productivity_modules=0,
+            quality_of_quality_modules="Normal",
+            number_of_quality_modules=0,
+            number_of_iterations="infinite",
+            quality_1_count=1000,
+            quality_2_count=0,
+            quality_3_count=0,
+            quality_4_count=0,
+            number_of_recycler_quality_modules=0)
+        #Without any quality boost, every item is eventually lost in the recycler.
+        self.assertEqual(run_simulation(computation_request).quality_1_count, 0)
+        steady_state = run_steady_state_simulation(computation_request)
+        self.assertGreater(steady_state.iterations_until_converged, 10000)
+        transition_matrix = generate_transition_matrix(computation_request)
+        self.assertFalse(is_non_converging(transition_matrix[:9, :9]))
+        self.assertTrue(is_non_converging(generate_transition_matrix(
+            computation_request.model_copy(
+                update={"productivity_boost_from_research": 3.0}))[:9, :9]))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,83 @@
+"""
+Tests for the vectorized simulation in batch.py.
+The batched path must give exactly the same results as running
+the simulation once per request.
+"""
+
+import unittest
+import numpy as np
+
+from backend.backend import run_simulation
+from backend.batch import batched_matrix_power, run_simulation_batch
+from frontend.computation_request import ComputationRequest
+
+def get_computation_requests():
+    """
+    Returns a handful of different simulation requests.
+    """
+    return [
+        ComputationRequest(
+            productivity_boost_from_research=1.50,
+            machine_type="Electromagnetic plant",
+            quality_of_production_modules="Legendary",
+            number_of_productivity_modules=1,
+            quality_of_quality_modules="Legendary",
+            number_of_quality_modules=4,
+            number_of_iterations=10,
+            quality_1_count=1000,
+            quality_2_count=1000,
+            quality_3_count=1000,
+            quality_4_count=1000),
+        ComputationRequest(
+            productivity_boost_from_research=0,
+            machine_type="Other (e.g. Assembling machine 3)",
+            quality_of_production_modules="Normal",
+            number_of_productivity_modules=0,
+            quality_of_quality_modules="Rare",
+            number_of_quality_modules=4,
+            number_of_iterations=1,
+            quality_1_count=1,
+            quality_2_count=0,
+            quality_3_count=0,
+            quality_4_count=0),
+        ComputationRequest(
+            productivity_boost_from_research=3,
+            machine_type="Electromagnetic plant",
+            quality_of_production_modules="Epic",
+            number_of_productivity_modules=5,
+            quality_of_quality_modules="Uncommon",
+            number_of_quality_modules=0,
+            number_of_iterations=1000,
+            quality_1_count=500,
+            quality_2_count=20,
+            quality_3_count=0,
+            quality_4_count=7)
+    ]
+
+class TestBatch(unittest.TestCase):
+    """
+    Tests for batch.py.
+    """
+    def test_batched_matrix_power(self):
+        """
+        Test that every matrix in the stack is raised to its own power.
+        """
+        rng = np.random.default_rng(0)
+        matrices = rng.random((4, 10, 10)) / 5
+        exponents = [0, 1, 7, 64]
+        result = batched_matrix_power(matrices, exponents)
+        for matrix, exponent, power in zip(matrices, exponents, result):
+            np.testing.assert_allclose(power, np.linalg.matrix_power(matrix, exponent))
+
+    def test_batch_matches_single_simulations(self):
+        """
+        Test that the batched simulation returns the same results in the same order.
+        """
+        computation_requests = get_computation_requests()
+        expected = [run_simulation(request) for request in computation_requests]
+        self.assertEqual(run_simulation_batch(computation_requests), expected)
+        self.assertEqual(run_simulation_batch([]), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
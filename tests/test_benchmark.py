@@ -0,0 +1,50 @@
+"""
+Tests for the benchmark suite in benchmarks/benchmark.py.
+"""
+
+import unittest
+
+from benchmarks.benchmark import (benchmark_stages,
+                                  compare_results,
+                                  get_computation_requests,
+                                  summarize_timings)
+
+def get_results(p50: float, throughput: float) -> dict:
+    """
+    Returns benchmark results with a single stage and the HTTP benchmark.
+    """
+    return {"benchmarks": {"run_simulation/cached": summarize_timings([p50]),
+                           "http/simulate": {**summarize_timings([p50]),
+                                             "throughput": throughput}}}
+
+class TestBenchmark(unittest.TestCase):
+    def test_compare_results(self):
+        """
+        Test that only slowdowns beyond the threshold count as regressions.
+        """
+        baseline = get_results(1e-4, 500)
+        self.assertEqual(compare_results(baseline, get_results(1.2e-4, 450), 0.25), [])
+        self.assertEqual(compare_results(baseline, get_results(0.5e-4, 1000), 0.25), [])
+        regressions = compare_results(baseline, get_results(1.5e-4, 300), 0.25)
+        self.assertEqual(len(regressions), 3)
+        self.assertTrue(regressions[0].startswith("run_simulation/cached"))
+        #Benchmarks missing from the baseline are skipped.
+        self.assertEqual(compare_results({"benchmarks": {}}, get_results(1, 1), 0.25), [])
+
+    def test_benchmark_stages(self):
+        """
+        Test that every stage is timed.
+        """
+        results = benchmark_stages(get_computation_requests(3))
+        self.assertIn("generate_transition_matrix/cold", results)
+        self.assertIn("calculate_iterations/1000000", results)
+        self.assertIn("run_simulation/cached", results)
+        self.assertIn("ResultRequest/dump_json", results)
+        for result in results.values():
+            self.assertEqual(result["runs"], 3)
+            self.assertLessEqual(result["min"], result["p50"])
+            self.assertLessEqual(result["p50"], result["p99"])
+
+
+if __name__ == '__main__':
+    unittest.main()
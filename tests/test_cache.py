@@ -0,0 +1,77 @@
+"""
+Tests for the caches in cache.py.
+"""
+
+import threading
+import time
+import unittest
+import numpy as np
+
+from backend.cache import LRUCache, MatrixPowers, SingleFlight
+
+class TestCache(unittest.TestCase):
+    """
+    Tests for cache.py.
+    """
+    def test_lru_eviction_and_stats(self):
+        """
+        Test that the least recently used entry is evicted and that the counters add up.
+        """
+        cache = LRUCache(maxsize=2)
+        cache.get_or_create("a", lambda: 1)
+        cache.get_or_create("b", lambda: 2)
+        self.assertEqual(cache.get_or_create("a", lambda: None), 1)
+        cache.get_or_create("c", lambda: 3) #Evicts "b", since "a" was used more recently.
+        self.assertEqual(cache.get_or_create("b", lambda: 4), 4)
+        self.assertEqual(cache.stats(), {"size": 2, "maxsize": 2, "hits": 1,
+                                         "misses": 4, "evictions": 2})
+
+    def test_matrix_powers(self):
+        """
+        Test that powers built from the cached binary powers match matrix_power.
+        """
+        matrix = np.random.default_rng(0).random((10, 10)) / 5
+        matrix_powers = MatrixPowers(matrix.copy())
+        for exponent in [0, 1, 2, 20, 1001]:
+            np.testing.assert_allclose(matrix_powers.power(exponent), 
+                                       np.linalg.matrix_power(matrix, exponent))
+        with self.assertRaises(ValueError):
+            matrix_powers.matrix[0, 0] = 1
+
+    def test_single_flight(self):
+        """
+        Test that callers which arrive while a computation is running share its result,
+        and that a new computation is started once it's done.
+        """
+        single_flight = SingleFlight()
+        release = threading.Event()
+        calls = []
+        def create():
+            calls.append(None)
+            release.wait(5)
+            return object()
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(single_flight.run("a", create)))
+                   for _ in range(4)]
+        threads[0].start()
+        while single_flight.stats()["in_flight"] == 0:
+            time.sleep(0.001)
+        for thread in threads[1:]:
+            thread.start()
+        while single_flight.stats()["coalesced"] < 3:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(results), 4)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertIsNot(single_flight.run("a", create), results[0])
+        self.assertEqual(single_flight.stats(), {"calls": 2, "coalesced": 3, "in_flight": 0})
+        with self.assertRaises(ZeroDivisionError):
+            single_flight.run("b", lambda: 1 / 0)
+        self.assertEqual(single_flight.stats()["in_flight"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
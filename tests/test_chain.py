@@ -0,0 +1,74 @@
+"""
+Tests for the simulation of production chains in chain.py.
+"""
+
+import unittest
+import numpy as np
+
+from backend.backend import NonConvergingChainError, run_simulation
+from backend.chain import (calculate_chain_iterations,
+                           chain_request_from_computation_request,
+                           generate_chain_transition_matrix,
+                           get_chain_starting_distribution,
+                           run_chain_simulation)
+from backend.chain_request import StageRequest
+from tests.test_batch import get_computation_requests
+
+class TestChain(unittest.TestCase):
+    """
+    Tests for chain.py.
+    """
+    def test_single_stage_matches_backend(self):
+        """
+        Test that a chain with a single stage gives the same result as run_simulation.
+        """
+        for computation_request in get_computation_requests():
+            for number_of_iterations in [computation_request.number_of_iterations, "infinite"]:
+                request = computation_request.model_copy(
+                    update={"number_of_iterations": number_of_iterations})
+                chain_request = chain_request_from_computation_request(request)
+                self.assertEqual(run_chain_simulation(chain_request).stages, 
+                                 [run_simulation(request)])
+
+    def test_non_converging_stage(self):
+        """
+        Test that a stage whose items never leave the loop raises an error
+        instead of returning NaN.
+        """
+        computation_request = get_computation_requests()[2].model_copy(update={
+            "number_of_iterations": "infinite", "number_of_recycler_quality_modules": 0})
+        with self.assertRaises(NonConvergingChainError):
+            run_chain_simulation(chain_request_from_computation_request(computation_request))
+
+    def test_multiple_stages(self):
+        """
+        Test a chain with a stage that passes everything on, followed by a recycling stage.
+        The sparse powers must match dense matrix powers, and the limit must match 
+        a large number of iterations.
+        """
+        chain_request = chain_request_from_computation_request(get_computation_requests()[0])
+        upstream = StageRequest(machine_type="Other (e.g. Assembling machine 3)",
+                                quality_of_production_modules="Normal",
+                                number_of_productivity_modules=0,
+                                quality_of_quality_modules="Legendary",
+                                number_of_quality_modules=4,
+                                recycle=False)
+        downstream = chain_request.stages[0].model_copy(update={"ingredients_per_item": 2})
+        chain_request = chain_request.model_copy(update={"stages": [upstream, downstream]})
+
+        transition_matrix = generate_chain_transition_matrix(chain_request)
+        self.assertEqual(transition_matrix.shape, (20, 20))
+        starting_distribution = get_chain_starting_distribution(chain_request)
+        np.testing.assert_allclose(
+            calculate_chain_iterations(5, transition_matrix, starting_distribution),
+            starting_distribution @ np.linalg.matrix_power(transition_matrix.toarray(), 10))
+
+        finite = chain_request.model_copy(update={"number_of_iterations": 1000})
+        infinite = chain_request.model_copy(update={"number_of_iterations": "infinite"})
+        self.assertEqual(run_chain_simulation(finite), run_chain_simulation(infinite))
+        #Nothing is left in the first stage, since it passes every item on.
+        self.assertEqual(run_chain_simulation(infinite).stages[0].quality_1_count, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
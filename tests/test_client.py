@@ -0,0 +1,61 @@
+"""
+Tests for the frontend client in client.py.
+"""
+
+import unittest
+
+from backend.backend import run_simulation
+from frontend.client import BackendError, get_session, simulate
+from frontend.computation_request import ComputationRequest
+
+#Nothing listens on port 1, so connections are refused right away.
+UNREACHABLE_URL = "http://127.0.0.1:1"
+
+def get_computation_request() -> ComputationRequest:
+    """
+    Returns a realistic simulation request.
+    """
+    return ComputationRequest(
+        productivity_boost_from_research=0.5,
+        machine_type="Electromagnetic plant",
+        quality_of_production_modules="Legendary",
+        number_of_productivity_modules=2,
+        quality_of_quality_modules="Epic",
+        number_of_quality_modules=3,
+        number_of_iterations=15,
+        quality_1_count=1000,
+        quality_2_count=10,
+        quality_3_count=0,
+        quality_4_count=0)
+
+class TestClient(unittest.TestCase):
+    def test_in_process(self):
+        """
+        Test that the in-process mode gives the same result as the backend.
+        """
+        computation_request = get_computation_request()
+        result = simulate(computation_request.model_dump(), mode="in_process")
+        self.assertEqual(result, run_simulation(computation_request).model_dump())
+
+    def test_unreachable_backend(self):
+        """
+        Test that an unreachable backend raises a BackendError,
+        unless the client is allowed to fall back to running in-process.
+        """
+        request_data = get_computation_request().model_dump()
+        with self.assertRaises(BackendError):
+            simulate(request_data, mode="http", backend_url=UNREACHABLE_URL)
+        self.assertEqual(simulate(request_data, mode="auto", backend_url=UNREACHABLE_URL),
+                         simulate(request_data, mode="in_process"))
+        with self.assertRaises(BackendError):
+            simulate(request_data, mode="carrier pigeon")
+
+    def test_session_is_shared(self):
+        """
+        Test that every request uses the same pooled session.
+        """
+        self.assertIs(get_session(), get_session())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+"""
+Tests for the columnar wire format in columnar.py.
+"""
+
+import io
+import unittest
+import numpy as np
+from fastapi.testclient import TestClient
+
+from backend.api import app
+from backend.batch import run_simulation_batch
+from backend.columnar import (NPZ_MEDIA_TYPE,
+                              RESULT_COLUMNS,
+                              decode_columns,
+                              encode_columns,
+                              run_simulation_columns)
+from frontend.computation_request import ComputationRequest
+from tests.test_batch import get_computation_requests
+
+def get_columns(computation_requests) -> dict:
+    """
+    Returns one array per field of the requests, with -1 for infinite iterations.
+    """
+    columns = {field: np.asarray([getattr(request, field) for request in computation_requests])
+               for field in list(ComputationRequest.model_fields)}
+    columns["number_of_iterations"] = np.asarray(
+        [-1 if request.number_of_iterations == "infinite" else request.number_of_iterations
+         for request in computation_requests])
+    return columns
+
+class TestColumnar(unittest.TestCase):
+    def test_same_results_as_batch(self):
+        """
+        Test that the columnar format gives the same results as the list of requests,
+        with the chip qualities sent either as strings or as chip numbers.
+        """
+        computation_requests = get_computation_requests()
+        computation_requests.append(computation_requests[0].model_copy(update={
+            "number_of_iterations": "infinite", "number_of_recycler_quality_modules": 2}))
+        expected = run_simulation_batch(computation_requests)
+        columns = get_columns(computation_requests)
+        numbered_columns = dict(columns)
+        numbered_columns["quality_of_production_modules"] = np.array([5, 1, 4, 5])
+        numbered_columns["quality_of_quality_modules"] = np.array([5, 3, 2, 5])
+        numbered_columns["quality_of_recycler_quality_modules"] = np.array([5, 5, 5, 5])
+        numbered_columns["machine_type"] = np.array([True, False, True, True])
+        for sent_columns in [columns, numbered_columns]:
+            results = run_simulation_columns(decode_columns(encode_columns(sent_columns)))
+            for index, result in enumerate(expected):
+                for column in RESULT_COLUMNS:
+                    self.assertEqual(results[column][index], getattr(result, column))
+
+    def test_invalid_columns(self):
+        """
+        Test that invalid archives and columns raise a ValueError.
+        """
+        columns = get_columns(get_computation_requests())
+        with self.assertRaises(ValueError):
+            decode_columns(b"not an archive")
+        for column, values in [("quality_1_count", None),
+                               ("quality_of_quality_modules", np.array(["Epic", "Shiny", "Rare"])),
+                               ("quality_of_quality_modules", np.array([0, 1, 2])),
+                               ("number_of_iterations", np.array([1.5, 1, 1])),
+                               ("quality_2_count", np.array([1, 2]))]:
+            invalid_columns = dict(columns)
+            if values is None:
+                del invalid_columns[column]
+            else:
+                invalid_columns[column] = values
+            with self.assertRaises(ValueError):
+                decode_columns(encode_columns(invalid_columns))
+
+    def test_simulate_batch_endpoint(self):
+        """
+        Test that /simulate_batch answers .npz requests with .npz results,
+        and still accepts JSON by default.
+        """
+        computation_requests = get_computation_requests()
+        with TestClient(app) as client:
+            json_response = client.post("/simulate_batch", json=[
+                request.model_dump() for request in computation_requests])
+            npz_response = client.post(
+                "/simulate_batch", content=encode_columns(get_columns(computation_requests)),
+                headers={"Content-Type": NPZ_MEDIA_TYPE})
+            invalid_response = client.post("/simulate_batch", content=b"not an archive",
+                                           headers={"Content-Type": NPZ_MEDIA_TYPE})
+            #Negative iterations are rejected, not treated as infinitely many iterations.
+            negative_request = computation_requests[0].model_copy(
+                update={"number_of_iterations": -3}).model_dump()
+            negative_responses = [client.post("/simulate_batch", json=[negative_request]),
+                                  client.post("/simulate", json=negative_request)]
+        self.assertEqual(json_response.status_code, 200)
+        self.assertEqual(npz_response.status_code, 200)
+        self.assertEqual(npz_response.headers["content-type"], NPZ_MEDIA_TYPE)
+        self.assertEqual(invalid_response.status_code, 422)
+        self.assertEqual([response.status_code for response in negative_responses], [422, 422])
+        with np.load(io.BytesIO(npz_response.content), allow_pickle=False) as results:
+            for index, result in enumerate(json_response.json()):
+                for column in RESULT_COLUMNS:
+                    self.assertEqual(results[column][index], result[column])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+"""
+Tests for the response cache, request coalescing and ETags of /simulate in api.py.
+"""
+
+import json
+import unittest
+from fastapi.testclient import TestClient
+
+from backend.api import app, response_cache, simulate_flight
+from tests.test_sensitivity import get_computation_request
+
+class TestHttpCache(unittest.TestCase):
+    def setUp(self):
+        response_cache.clear()
+        simulate_flight.clear()
+
+    def test_etag_and_response_cache(self):
+        """
+        Test that equivalent payloads share a cached result and an ETag,
+        and that sending the ETag back skips the simulation with 304 Not Modified.
+        """
+        payload = get_computation_request(20).model_dump()
+        #Same request with the fields in another order and a default left out.
+        reordered_payload = dict(reversed(list(payload.items())))
+        del reordered_payload["number_of_recycler_quality_modules"]
+        with TestClient(app) as client:
+            response = client.post("/simulate", json=payload)
+            reordered_response = client.post(
+                "/simulate", content=json.dumps(reordered_payload, indent=2),
+                headers={"Content-Type": "application/json"})
+            etag = response.headers["ETag"]
+            not_modified = client.post("/simulate", json=payload,
+                                       headers={"If-None-Match": f'"other", W/{etag}'})
+            other_response = client.post("/simulate", json={**payload, "quality_1_count": 1},
+                                         headers={"If-None-Match": etag})
+            stats = client.get("/cache_stats").json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(reordered_response.json(), response.json())
+        self.assertEqual(reordered_response.headers["ETag"], etag)
+        self.assertIn("max-age=", response.headers["Cache-Control"])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.headers["ETag"], etag)
+        self.assertEqual(other_response.status_code, 200)
+        self.assertNotEqual(other_response.headers["ETag"], etag)
+        self.assertEqual(stats["responses"]["hits"], 1)
+        self.assertEqual(stats["responses"]["misses"], 2)
+        self.assertEqual(stats["coalescing"], {"calls": 2, "coalesced": 0, "in_flight": 0})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+"""
+Tests for the inverse solver in inverse.py.
+"""
+
+import unittest
+
+from backend.backend import run_simulation
+from backend.inverse import solve_required_inputs
+from backend.inverse_request import InverseRequest
+from tests.test_sensitivity import get_computation_request
+
+class TestInverse(unittest.TestCase):
+    def test_round_trip(self):
+        """
+        Test that simulating the returned starting items gives the target number
+        of legendary items, for finite and infinite iterations.
+        """
+        for number_of_iterations in [10, "infinite"]:
+            computation_request = get_computation_request(number_of_iterations)
+            inverse_result = solve_required_inputs(InverseRequest(
+                computation_request=computation_request,
+                target_counts=[0, 0, 0, 0, 500]))
+            self.assertEqual(inverse_result.starting_counts[1:], [0, 0, 0])
+            self.assertEqual(inverse_result.max_deviation, 0)
+            #The result is linear in the starting counts, so 100 times the starting items
+            #give 100 times the target, which avoids rounding the starting counts.
+            result = run_simulation(computation_request.model_copy(update={
+                "quality_1_count": round(100 * inverse_result.starting_counts[0]),
+                "quality_2_count": 0, "quality_3_count": 0, "quality_4_count": 0}))
+            self.assertAlmostEqual(result.quality_5_count / 100, 500, places=1)
+
+    def test_cheapest_inputs(self):
+        """
+        Test that the cheapest input quality is used, and that the exact method
+        hits the target when it's reachable.
+        """
+        computation_request = get_computation_request("infinite")
+        for costs, expected_input in [([1, 10], 0), ([10, 1], 1)]:
+            inverse_result = solve_required_inputs(InverseRequest(
+                computation_request=computation_request, target_counts=[0, 0, 0, 0, 100],
+                input_qualities=["Normal", "Uncommon"], input_costs=costs))
+            self.assertGreater(inverse_result.starting_counts[expected_input], 0)
+            self.assertEqual(inverse_result.starting_counts[1 - expected_input], 0)
+        inverse_result = solve_required_inputs(InverseRequest(
+            computation_request=computation_request, target_counts=[0, 0, 0, 0, 100],
+            method="exact"))
+        self.assertAlmostEqual(inverse_result.expected_result.quality_5_count, 100)
+        self.assertLess(inverse_result.max_deviation, 1e-6)
+
+    def test_invalid_requests(self):
+        """
+        Test that invalid and unreachable targets raise a ValueError.
+        """
+        computation_request = get_computation_request("infinite")
+        for update in [{"target_counts": [0, 0, 0, 500]},
+                       {"target_counts": [0, 0, 0, 0, -1]},
+                       {"input_qualities": ["Legendary"]},
+                       {"input_costs": [1, 2]},
+                       #Every item ends up legendary, so rare items can't be the result.
+                       {"target_counts": [0, 0, 5, 0, 500]}]:
+            arguments = {"computation_request": computation_request,
+                         "target_counts": [0, 0, 0, 0, 500], **update}
+            with self.assertRaises(ValueError):
+                solve_required_inputs(InverseRequest(**arguments))
+
+
+if __name__ == '__main__':
+    unittest.main()
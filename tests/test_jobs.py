@@ -0,0 +1,82 @@
+"""
+Tests for the job manager in jobs.py.
+"""
+
+import time
+import unittest
+
+from backend.backend import NonConvergingChainError
+from backend.batch import run_simulation_batch
+from backend.job_request import BatchJobRequest, MonteCarloJobRequest
+from backend.jobs import JobManager, JobQueueFullError
+from backend.monte_carlo_request import MonteCarloRequest
+from tests.test_batch import get_computation_requests
+
+def wait_for_job(job_manager, job_id):
+    """
+    Polls the job until it's no longer queued or running, and returns its status.
+    """
+    for _ in range(600):
+        job_status = job_manager.get(job_id)
+        if job_status.status not in ("queued", "running"):
+            return job_status
+        time.sleep(0.05)
+    raise TimeoutError("The job didn't finish in time.")
+
+class TestJobs(unittest.TestCase):
+    """
+    Tests for jobs.py.
+    """
+    def setUp(self):
+        self.job_manager = JobManager(workers=1, max_active_jobs=1)
+
+    def tearDown(self):
+        self.job_manager.shutdown()
+
+    def test_batch_job(self):
+        """
+        Test that a batch job gives the same results as the batched simulation.
+        """
+        computation_requests = get_computation_requests()
+        job_status = self.job_manager.submit(
+            BatchJobRequest(computation_requests=computation_requests))
+        job_status = wait_for_job(self.job_manager, job_status.id)
+        self.assertEqual(job_status.status, "done")
+        self.assertEqual(job_status.progress, 1)
+        self.assertEqual(job_status.result, run_simulation_batch(computation_requests))
+        self.assertIsNone(self.job_manager.get("no such job"))
+
+    def test_non_converging_monte_carlo_job(self):
+        """
+        Test that a Monte Carlo job for a layout which never converges is rejected
+        when it's submitted, instead of keeping a worker busy.
+        """
+        computation_request = get_computation_requests()[2].model_copy(update={
+            "number_of_iterations": "infinite", "number_of_recycler_quality_modules": 0})
+        with self.assertRaises(NonConvergingChainError):
+            self.job_manager.submit(MonteCarloJobRequest(monte_carlo_request=MonteCarloRequest(
+                computation_request=computation_request, number_of_trials=1000)))
+
+    def test_queue_depth_and_cancellation(self):
+        """
+        Test that jobs are rejected while the queue is full, and accepted after cancelling.
+        """
+        job_request = BatchJobRequest(computation_requests=get_computation_requests() * 2000)
+        job_status = self.job_manager.submit(job_request)
+        with self.assertRaises(JobQueueFullError):
+            self.job_manager.submit(job_request)
+        self.assertEqual(self.job_manager.cancel(job_status.id).status, "cancelled")
+        self.assertEqual(self.job_manager.get(job_status.id).status, "cancelled")
+        self.job_manager.submit(BatchJobRequest(computation_requests=[]))
+
+    def test_result_expiry(self):
+        """
+        Test that finished jobs are forgotten once they expire.
+        """
+        self.job_manager.result_ttl = 0
+        job_status = self.job_manager.submit(BatchJobRequest(computation_requests=[]))
+        self.assertIsNone(self.job_manager.get(job_status.id))
+
+
+if __name__ == '__main__':
+    unittest.main()
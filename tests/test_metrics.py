@@ -0,0 +1,86 @@
+"""
+Tests for the metrics in metrics.py and the /metrics endpoint.
+"""
+
+import unittest
+from fastapi.testclient import TestClient
+
+from backend import metrics
+from backend.api import app, response_cache
+from backend.backend import response_kernel_cache, transition_matrix_cache
+
+class TestMetrics(unittest.TestCase):
+    def test_histogram(self):
+        """
+        Test that the buckets of a histogram are cumulative.
+        """
+        histogram = metrics.Histogram("test_seconds", "Test.", ("stage",), buckets=[1, 10])
+        for value in [0.5, 1, 5, 50]:
+            histogram.observe(value, "a")
+        lines = histogram.render()
+        self.assertIn('test_seconds_bucket{stage="a",le="1"} 2', lines)
+        self.assertIn('test_seconds_bucket{stage="a",le="10"} 3', lines)
+        self.assertIn('test_seconds_bucket{stage="a",le="+Inf"} 4', lines)
+        self.assertIn('test_seconds_sum{stage="a"} 56.5', lines)
+        self.assertIn('test_seconds_count{stage="a"} 4', lines)
+
+    def test_disabled(self):
+        """
+        Test that nothing is recorded when the metrics are turned off.
+        """
+        enabled = metrics.enabled
+        metrics.clear_metrics()
+        try:
+            metrics.enabled = False
+            self.assertIs(metrics.time_stage("test"), metrics.DISABLED_TIMER)
+            self.assertIs(metrics.timed_stage("test")(len), len)
+            metrics.observe_iterations(10)
+            self.assertEqual(metrics.simulation_iterations.get_count(), 0)
+        finally:
+            metrics.enabled = enabled
+
+    @unittest.skipUnless(metrics.enabled, "The metrics are turned off.")
+    def test_metrics_endpoint(self):
+        """
+        Test that requests, errors and the stages of /simulate show up on /metrics.
+        """
+        metrics.clear_metrics()
+        #Nothing is computed for a cached result, so the computation stages wouldn't show up.
+        for cache in [response_cache, response_kernel_cache, transition_matrix_cache]:
+            cache.clear()
+        computation_request = {
+            "productivity_boost_from_research": 0.5,
+            "machine_type": "Electromagnetic plant",
+            "quality_of_production_modules": "Legendary",
+            "number_of_productivity_modules": 2,
+            "quality_of_quality_modules": "Legendary",
+            "number_of_quality_modules": 3,
+            "number_of_iterations": 20,
+            "quality_1_count": 1000,
+            "quality_2_count": 0,
+            "quality_3_count": 0,
+            "quality_4_count": 0}
+        with TestClient(app) as client:
+            self.assertEqual(client.post("/simulate", json=computation_request).status_code, 200)
+            self.assertEqual(client.post("/simulate", json={}).status_code, 422)
+            response = client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/plain"))
+        text = response.text
+        self.assertIn('http_requests_total{method="POST",path="/simulate",status="200"} 1', text)
+        self.assertIn('http_request_errors_total{method="POST",path="/simulate",status="422"} 1',
+                      text)
+        for stage in ["validation", "handler", "serialization"]:
+            self.assertIn(f'simulation_stage_duration_seconds_count{{stage="{stage}"}}', text)
+        #The stages of the computation behind /simulate, see calculate_response_kernel.
+        for stage in ["build_transition_matrix", "response_kernel", "matrix_power"]:
+            self.assertIn(f'simulation_stage_duration_seconds_count{{stage="{stage}"}} 1', text)
+        self.assertIn('simulation_iterations_bucket{le="20"} 1', text)
+        self.assertIn("simulation_infinite_iterations_total 0", text)
+        self.assertIn('cache_size{cache="response_kernels"}', text)
+        #The /metrics request itself is still in flight.
+        self.assertIn("http_requests_in_flight 1", text)
+
+
+if __name__ == '__main__':
+    unittest.main()
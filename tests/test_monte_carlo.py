@@ -0,0 +1,86 @@
+"""
+Tests for the Monte Carlo simulation in monte_carlo.py.
+The sampled mean should agree with the Markov chain in backend.py.
+"""
+
+import time
+import unittest
+
+from backend.backend import NonConvergingChainError
+from backend.monte_carlo import CHUNK_SIZE, run_monte_carlo
+from backend.monte_carlo_request import MonteCarloRequest
+from frontend.computation_request import ComputationRequest
+
+def get_computation_request(number_of_iterations):
+    """
+    Returns a realistic simulation request with a small number of starting items.
+    """
+    return ComputationRequest(
+        productivity_boost_from_research=0.5,
+        machine_type="Electromagnetic plant",
+        quality_of_production_modules="Legendary",
+        number_of_productivity_modules=1,
+        quality_of_quality_modules="Legendary",
+        number_of_quality_modules=4,
+        number_of_iterations=number_of_iterations,
+        quality_1_count=20,
+        quality_2_count=5,
+        quality_3_count=0,
+        quality_4_count=1)
+
+class TestMonteCarlo(unittest.TestCase):
+    """
+    Tests for monte_carlo.py.
+    """
+    def test_mean_matches_markov_chain(self):
+        """
+        Test that the sampled mean is within a few standard errors of the expected value,
+        for a finite and an infinite number of iterations.
+        """
+        for number_of_iterations in [3, "infinite"]:
+            monte_carlo_request = MonteCarloRequest(
+                computation_request=get_computation_request(number_of_iterations),
+                number_of_trials=20000,
+                seed=42,
+                quantiles=[0.1, 0.9],
+                workers=1)
+            result = run_monte_carlo(monte_carlo_request)
+            self.assertLess(result.max_standard_errors_from_analytic, 5)
+            self.assertEqual(len(result.tiers), 5)
+            legendary = result.tiers[4]
+            self.assertLessEqual(legendary.quantiles[0], legendary.mean)
+            self.assertLessEqual(legendary.mean, legendary.quantiles[1])
+
+    def test_reproducible_across_workers(self):
+        """
+        Test that the same seed gives the same result no matter how many processes are used.
+        """
+        results = [
+            run_monte_carlo(MonteCarloRequest(computation_request=get_computation_request(2),
+                                              number_of_trials=CHUNK_SIZE + 100,
+                                              seed=7,
+                                              workers=workers))
+            for workers in [1, 2]
+        ]
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(results[0].number_of_trials, CHUNK_SIZE + 100)
+
+    def test_non_converging_layout(self):
+        """
+        Test that a layout which never converges fails right away,
+        instead of sampling trials for MAX_CYCLES cycles first.
+        """
+        computation_request = get_computation_request("infinite").model_copy(update={
+            "productivity_boost_from_research": 3.0,
+            "number_of_quality_modules": 0,
+            "number_of_recycler_quality_modules": 0})
+        start = time.perf_counter()
+        with self.assertRaises(NonConvergingChainError):
+            run_monte_carlo(MonteCarloRequest(computation_request=computation_request,
+                                              number_of_trials=1000,
+                                              workers=1))
+        self.assertLess(time.perf_counter() - start, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
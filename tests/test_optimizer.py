@@ -0,0 +1,82 @@
+"""
+Tests for the module layout search in optimizer.py.
+"""
+
+import unittest
+
+from backend.backend import run_simulation
+from backend.optimization_request import OptimizationRequest
+from backend.optimizer import optimize_layout
+from frontend.computation_request import ComputationRequest
+
+class TestOptimizer(unittest.TestCase):
+    """
+    Tests for optimizer.py.
+    """
+    def test_pareto_front(self):
+        """
+        Test that the front is sorted, that no candidate is dominated by another,
+        and that the yields agree with the simulation in backend.py.
+        """
+        optimization_request = OptimizationRequest(productivity_boost_from_research=0.5,
+                                                   number_of_iterations=20,
+                                                   quality_1_count=1000)
+        result = optimize_layout(optimization_request)
+        candidates = result.candidates
+        #2 machine types with 5 and 4 module slots, and 5 * 5 module qualities
+        #when there are modules of both types.
+        self.assertEqual(result.number_of_evaluated_layouts, 492)
+        self.assertGreater(len(candidates), 1)
+        for better, worse in zip(candidates, candidates[1:]):
+            self.assertGreater(better.legendary_yield, worse.legendary_yield)
+            self.assertGreater(better.module_cost, worse.module_cost)
+
+        for candidate in candidates:
+            computation_request = ComputationRequest(
+                productivity_boost_from_research=0.5,
+                machine_type=candidate.machine_type,
+                quality_of_production_modules=candidate.quality_of_production_modules,
+                number_of_productivity_modules=candidate.number_of_productivity_modules,
+                quality_of_quality_modules=candidate.quality_of_quality_modules,
+                number_of_quality_modules=candidate.number_of_quality_modules,
+                number_of_iterations=20,
+                quality_1_count=1000,
+                quality_2_count=0,
+                quality_3_count=0,
+                quality_4_count=0)
+            result = run_simulation(computation_request)
+            self.assertAlmostEqual(result.quality_5_count / 1000, 
+                                   candidate.legendary_yield, 
+                                   places=4)
+
+    def test_single_machine_type(self):
+        """
+        Test that the search can be restricted to a single machine type and number of slots.
+        """
+        optimization_request = OptimizationRequest(productivity_boost_from_research=0,
+                                                   machine_type="Electromagnetic plant",
+                                                   module_slots=2)
+        result = optimize_layout(optimization_request)
+        #(0, 0), (1, 0), (0, 1), (2, 0), (0, 2) and (1, 1) modules.
+        self.assertEqual(result.number_of_evaluated_layouts, 1 + 5 + 5 + 5 + 5 + 25)
+        for candidate in result.candidates:
+            self.assertEqual(candidate.machine_type, "Electromagnetic plant")
+
+    def test_skips_non_converging_layouts(self):
+        """
+        Test that layouts whose items never leave the loop are left out,
+        and that the other layouts are still ranked.
+        """
+        optimization_request = OptimizationRequest(productivity_boost_from_research=3,
+                                                   number_of_recycler_quality_modules=0)
+        result = optimize_layout(optimization_request)
+        self.assertEqual(result.number_of_evaluated_layouts, 492)
+        #Productivity is capped, so a single quality module eventually turns
+        #every item into 4 legendary items, and nothing else can beat it.
+        self.assertEqual(len(result.candidates), 1)
+        self.assertEqual(result.candidates[0].number_of_quality_modules, 1)
+        self.assertAlmostEqual(result.candidates[0].legendary_yield, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+"""
+Tests for the precomputed kernel table in precompute.py.
+"""
+
+import os
+import tempfile
+import unittest
+import numpy as np
+
+from backend import backend
+from backend.backend import (NonConvergingChainError,
+                             calculate_response_kernel,
+                             get_matrix_boosts,
+                             run_simulation,
+                             transition_matrix_cache)
+from backend.precompute import PrecomputedKernels, main
+from tests.test_sensitivity import get_computation_request
+
+class TestPrecompute(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory() # pylint: disable=consider-using-with
+        self.path = os.path.join(self.directory.name, "kernels.npy")
+        main(["--output", self.path, "--max-research", "1", "--research-step", "0.5"])
+        self.table = PrecomputedKernels.load(self.path)
+
+    def tearDown(self):
+        backend.use_precomputed_kernels(None)
+        del self.table #The memory map has to be closed before the file can be removed.
+        self.directory.cleanup()
+
+    def test_matches_live_kernels(self):
+        """
+        Test that the table is memory-mapped and has the same kernels as calculate_response_kernel.
+        """
+        self.assertIsInstance(self.table.kernels, np.memmap)
+        for update in [{},
+                       {"machine_type": "Foundry", "productivity_boost_from_research": 1.0},
+                       {"number_of_productivity_modules": 8, "number_of_quality_modules": 0},
+                       {"quality_of_quality_modules": "Normal",
+                        "productivity_boost_from_research": 0}]:
+            request = get_computation_request("infinite").model_copy(update=update)
+            live_kernel = calculate_response_kernel(
+                transition_matrix_cache.get(*get_matrix_boosts(request)), "infinite")
+            np.testing.assert_allclose(self.table.get(request), live_kernel, rtol=1e-12)
+
+    def test_falls_back_to_live_computation(self):
+        """
+        Test that requests which aren't in the table are computed live,
+        and that the results agree with and without the table.
+        The kernels only agree to about 1e-12, so a rounded count could be off by 0.01.
+        """
+        requests = [get_computation_request("infinite"),
+                    get_computation_request(10),
+                    get_computation_request("infinite").model_copy(
+                        update={"productivity_boost_from_research": 0.3}),
+                    get_computation_request("infinite").model_copy(
+                        update={"number_of_recycler_quality_modules": 2})]
+        backend.use_precomputed_kernels(None)
+        expected_results = [run_simulation(request) for request in requests]
+        backend.use_precomputed_kernels(self.table)
+        for request, expected in zip(requests, expected_results):
+            result = run_simulation(request)
+            for count, expected_count in zip(result.model_dump().values(),
+                                             expected.model_dump().values()):
+                self.assertAlmostEqual(count, expected_count, delta=0.01)
+        self.assertEqual(self.table.stats()["hits"], 1)
+        self.assertEqual(self.table.stats()["misses"], 3)
+
+    def test_non_converging_layouts(self):
+        """
+        Test that the table can be built for a recycler without quality modules,
+        and that layouts which never converge raise the same error as without the table.
+        """
+        path = os.path.join(self.directory.name, "no_recycler_modules.npy")
+        main(["--output", path, "--max-research", "3", "--research-step", "3",
+              "--recycler-modules", "0"])
+        table = PrecomputedKernels.load(path)
+        request = get_computation_request("infinite").model_copy(update={
+            "productivity_boost_from_research": 3.0,
+            "number_of_quality_modules": 0,
+            "number_of_recycler_quality_modules": 0})
+        self.assertIsNotNone(table.get_index(request))
+        self.assertIsNone(table.get(request))
+        backend.use_precomputed_kernels(table)
+        with self.assertRaises(NonConvergingChainError):
+            run_simulation(request)
+        self.assertIsNotNone(table.get(request.model_copy(
+            update={"number_of_quality_modules": 2})))
+        del table
+
+    def test_rejects_other_files(self):
+        """
+        Test that a .npy file which isn't a table can't be loaded.
+        """
+        np.save(self.path, np.zeros(3))
+        with self.assertRaises(ValueError):
+            PrecomputedKernels.load(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+"""
+Tests for the derivatives in sensitivity.py.
+The derivatives must match finite differences of the simulation.
+"""
+
+import unittest
+import numpy as np
+
+from backend.backend import build_transition_matrices, calculate_response_kernel
+from backend.cache import MatrixPowers
+from backend.sensitivity import (calculate_kernel_derivatives,
+                                 get_transition_matrix_derivatives,
+                                 run_sensitivity_analysis,
+                                 run_sensitivity_grid)
+from backend.sensitivity_request import SensitivityGridRequest
+from frontend.computation_request import ComputationRequest
+
+def get_kernel(productivity_boost, quality_boost, number_of_iterations):
+    """
+    Returns the response kernel computed without derivatives.
+    """
+    matrix = build_transition_matrices(productivity_boost, quality_boost, 0.248)
+    return calculate_response_kernel(MatrixPowers(matrix), number_of_iterations)
+
+def get_computation_request(number_of_iterations) -> ComputationRequest:
+    """
+    Returns a realistic simulation request.
+    """
+    return ComputationRequest(
+        productivity_boost_from_research=0.5,
+        machine_type="Electromagnetic plant",
+        quality_of_production_modules="Legendary",
+        number_of_productivity_modules=2,
+        quality_of_quality_modules="Legendary",
+        number_of_quality_modules=3,
+        number_of_iterations=number_of_iterations,
+        quality_1_count=1000,
+        quality_2_count=100,
+        quality_3_count=10,
+        quality_4_count=1)
+
+class TestSensitivity(unittest.TestCase):
+    def test_matches_finite_differences(self):
+        """
+        Test that the kernel derivatives match central finite differences.
+        """
+        productivity_boost, quality_boost, step = 1.2, 0.12, 1e-6
+        for number_of_iterations in [1, 7, 100, "infinite"]:
+            kernel, derivatives = calculate_kernel_derivatives(
+                *get_transition_matrix_derivatives(productivity_boost, quality_boost, 0.248),
+                number_of_iterations)
+            np.testing.assert_allclose(kernel, get_kernel(productivity_boost, quality_boost,
+                                                          number_of_iterations))
+            productivity_difference = (
+                get_kernel(productivity_boost + step, quality_boost, number_of_iterations) -
+                get_kernel(productivity_boost - step, quality_boost, number_of_iterations)
+            ) / (2 * step)
+            quality_difference = (
+                get_kernel(productivity_boost, quality_boost + step, number_of_iterations) -
+                get_kernel(productivity_boost, quality_boost - step, number_of_iterations)
+            ) / (2 * step)
+            np.testing.assert_allclose(derivatives[0], productivity_difference, atol=1e-7)
+            np.testing.assert_allclose(derivatives[1], quality_difference, atol=1e-7)
+
+    def test_grid_matches_single_requests(self):
+        """
+        Test that every grid point matches the sensitivity of the single request,
+        and that research doesn't help once the productivity boost is capped.
+        """
+        computation_request = get_computation_request(20)
+        grid = run_sensitivity_grid(SensitivityGridRequest(
+            computation_request=computation_request,
+            productivity_boosts_from_research=[0, 0.7, 3],
+            module_counts=[0, 2],
+            module_type="productivity"))
+        for i, research in enumerate(grid.productivity_boosts_from_research):
+            for j, module_count in enumerate(grid.module_counts):
+                single = run_sensitivity_analysis(computation_request.model_copy(update={
+                    "productivity_boost_from_research": research,
+                    "number_of_productivity_modules": module_count}))
+                self.assertEqual(grid.legendary_counts[i][j], single.result.quality_5_count)
+                self.assertAlmostEqual(grid.productivity_boost_derivatives[i][j],
+                                       single.productivity_boost_derivatives[4])
+                self.assertAlmostEqual(grid.quality_boost_derivatives[i][j],
+                                       single.quality_boost_derivatives[4])
+                self.assertAlmostEqual(grid.research_derivatives[i][j],
+                                       single.research_derivatives[4])
+        self.assertEqual(grid.research_derivatives[2], [0, 0])
+        self.assertGreater(grid.productivity_boost_derivatives[2][0], 0)
+        with self.assertRaises(ValueError):
+            run_sensitivity_grid(SensitivityGridRequest(
+                computation_request=computation_request,
+                productivity_boosts_from_research=[], module_counts=[1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
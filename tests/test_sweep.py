@@ -0,0 +1,139 @@
+"""
+Tests for the command-line sweep in sweep.py.
+"""
+
+import csv
+import importlib.util
+import os
+import tempfile
+import unittest
+
+from backend.backend import run_simulation
+from backend.sweep import get_progress_path, main, run_sweep
+from frontend.computation_request import ComputationRequest
+from tests.test_batch import get_computation_requests
+
+class TestSweep(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory() # pylint: disable=consider-using-with
+        self.input_path = os.path.join(self.directory.name, "scenarios.csv")
+        self.output_path = os.path.join(self.directory.name, "results.csv")
+        #Every request a few times, so there are several chunks.
+        self.computation_requests = get_computation_requests() * 5
+        with open(self.input_path, "w", newline="", encoding="utf-8") as file:
+            writer = csv.DictWriter(file, fieldnames=list(ComputationRequest.model_fields))
+            writer.writeheader()
+            writer.writerows(request.model_dump() for request in self.computation_requests)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def read_output(self) -> list[dict]:
+        """
+        Returns the rows of the output as dicts of floats.
+        """
+        with open(self.output_path, newline="", encoding="utf-8") as file:
+            return [{column: float(value) for column, value in row.items()}
+                    for row in csv.DictReader(file)]
+
+    def test_matches_run_simulation(self):
+        """
+        Test that the results are the same as run_simulation, in input order,
+        with and without a process pool.
+        """
+        expected_rows = [run_simulation(request).model_dump()
+                         for request in self.computation_requests]
+        for workers in [1, 2]:
+            summary = run_sweep(self.input_path, self.output_path, chunk_size=4,
+                                workers=workers, report=lambda line: None)
+            self.assertEqual(summary["scenarios"], len(self.computation_requests))
+            self.assertEqual(self.read_output(), expected_rows)
+            self.assertFalse(os.path.exists(get_progress_path(self.output_path)))
+
+    def test_resumes_after_interruption(self):
+        """
+        Test that an interrupted sweep continues after the last finished chunk,
+        and that a half written chunk is thrown away.
+        """
+        run_sweep(self.input_path, self.output_path, chunk_size=4, workers=1,
+                  report=lambda line: None)
+        with open(self.output_path, encoding="utf-8") as file:
+            expected_output = file.read()
+
+        def interrupt(_):
+            raise KeyboardInterrupt
+        with self.assertRaises(KeyboardInterrupt):
+            run_sweep(self.input_path, self.output_path, chunk_size=4, workers=1,
+                      report=interrupt)
+        with open(self.output_path, "a", encoding="utf-8") as file:
+            file.write("1.00,2.")
+        reports = []
+        summary = run_sweep(self.input_path, self.output_path, chunk_size=4, workers=1,
+                            resume=True, report=reports.append)
+        self.assertEqual(reports[0], "Resuming after 4 scenarios.")
+        self.assertEqual(summary["scenarios"], len(self.computation_requests) - 4)
+        with open(self.output_path, encoding="utf-8") as file:
+            self.assertEqual(file.read(), expected_output)
+
+    def test_invalid_input(self):
+        """
+        Test that unparseable numbers are reported as a ValueError.
+        """
+        with open(self.input_path, "a", newline="", encoding="utf-8") as file:
+            row = get_computation_requests()[0].model_dump()
+            row["productivity_boost_from_research"] = "lots"
+            csv.DictWriter(file, fieldnames=list(row)).writerow(row)
+        with self.assertRaisesRegex(ValueError, "productivity_boost_from_research"):
+            run_sweep(self.input_path, self.output_path, workers=1, report=lambda line: None)
+
+    def test_empty_input(self):
+        """
+        Test that an empty CSV file is reported as a ValueError.
+        """
+        with open(self.input_path, "w", encoding="utf-8"):
+            pass
+        with self.assertRaisesRegex(ValueError, "empty"):
+            run_sweep(self.input_path, self.output_path, workers=1, report=lambda line: None)
+        self.assertEqual(main([self.input_path, self.output_path, "--workers", "1"]), 1)
+
+    @unittest.skipUnless(importlib.util.find_spec("pyarrow") is not None,
+                         "pyarrow isn't installed.")
+    def test_parquet(self):
+        """
+        Test that a Parquet file gives the same results as the CSV file,
+        also when the sweep is resumed in the middle of the file.
+        """
+        import pyarrow # pylint: disable=import-outside-toplevel
+        import pyarrow.parquet # pylint: disable=import-outside-toplevel
+        run_sweep(self.input_path, self.output_path, chunk_size=4, workers=1,
+                  report=lambda line: None)
+        expected_rows = self.read_output()
+        parquet_path = os.path.join(self.directory.name, "scenarios.parquet")
+        rows = [request.model_dump() for request in self.computation_requests]
+        for row in rows:
+            row["number_of_iterations"] = str(row["number_of_iterations"])
+        pyarrow.parquet.write_table(pyarrow.Table.from_pylist(rows), parquet_path)
+        run_sweep(parquet_path, self.output_path, chunk_size=4, workers=2,
+                  report=lambda line: None)
+        self.assertEqual(self.read_output(), expected_rows)
+
+        def interrupt(_):
+            raise KeyboardInterrupt
+        with self.assertRaises(KeyboardInterrupt):
+            run_sweep(parquet_path, self.output_path, chunk_size=4, workers=1, report=interrupt)
+        run_sweep(parquet_path, self.output_path, chunk_size=4, workers=1, resume=True,
+                  report=lambda line: None)
+        self.assertEqual(self.read_output(), expected_rows)
+
+    @unittest.skipIf(importlib.util.find_spec("pyarrow") is not None, "pyarrow is installed.")
+    def test_parquet_without_pyarrow(self):
+        """
+        Test that reading Parquet files without pyarrow gives a clear error.
+        """
+        with self.assertRaises(ValueError):
+            run_sweep(os.path.join(self.directory.name, "scenarios.parquet"), self.output_path,
+                      workers=1, report=lambda line: None)
+
+
+if __name__ == '__main__':
+    unittest.main()
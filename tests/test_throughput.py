@@ -0,0 +1,79 @@
+"""
+Tests for the throughput planner in throughput.py.
+"""
+
+import unittest
+
+from backend.backend import run_simulation
+from backend.throughput import plan_throughput
+from backend.throughput_request import ProductLine, ThroughputRequest
+from tests.test_sensitivity import get_computation_request
+
+def get_product_line(**update) -> ProductLine:
+    """
+    Returns a realistic production line with the same layout as get_computation_request.
+    """
+    return ProductLine(productivity_boost_from_research=0.5,
+                       machine_type="Electromagnetic plant",
+                       quality_of_production_modules="Legendary",
+                       number_of_productivity_modules=2,
+                       quality_of_quality_modules="Legendary",
+                       number_of_quality_modules=3,
+                       crafting_time=10,
+                       target_legendary_per_minute=60).model_copy(update=update)
+
+class TestThroughput(unittest.TestCase):
+    def test_matches_infinite_simulation(self):
+        """
+        Test that the legendary items per raw ingredient are the same as for
+        infinitely many iterations, and that the flows add up.
+        """
+        line = plan_throughput(ThroughputRequest(lines=[get_product_line()])).lines[0]
+        result = run_simulation(get_computation_request("infinite").model_copy(update={
+            "quality_1_count": 100000, "quality_2_count": 0,
+            "quality_3_count": 0, "quality_4_count": 0}))
+        self.assertAlmostEqual(60 / line.input_per_minute * 100000, result.quality_5_count,
+                               places=1)
+        self.assertAlmostEqual(line.legendary_per_minute, 60)
+        flows = line.state_flows_per_minute
+        #The assemblers make 1 + 0.5 (electromagnetic plant) + 0.5 (research)
+        #+ 2 * 0.25 (modules) = 2.5 items per ingredient.
+        self.assertAlmostEqual(sum(flows[5:]), 2.5 * sum(flows[:5]))
+        #The recyclers give back a quarter of the items, and the rest is raw input.
+        self.assertAlmostEqual(sum(flows[:5]), line.input_per_minute + sum(flows[5:9]) / 4)
+        self.assertAlmostEqual(line.assemblers, sum(flows[:5]) / 60 * 10 / 2)
+        self.assertAlmostEqual(line.recyclers, sum(flows[5:9]) / 60 * 10 / 16 / 0.5)
+        self.assertEqual(line.assemblers_rounded_up, 81)
+
+    def test_many_lines(self):
+        """
+        Test that every line in a big request is planned on its own,
+        and that the rates scale with the target.
+        """
+        lines = [get_product_line(target_legendary_per_minute=float(target),
+                                  assembler_crafting_speed=1 + target % 3)
+                 for target in range(1, 301)]
+        results = plan_throughput(ThroughputRequest(lines=lines)).lines
+        self.assertEqual(len(results), 300)
+        for target, result in enumerate(results, start=1):
+            self.assertAlmostEqual(result.input_per_minute,
+                                   results[0].input_per_minute * target, places=6)
+            self.assertAlmostEqual(result.assemblers * (1 + target % 3),
+                                   results[0].assemblers * 2 * target, places=6)
+
+    def test_invalid_lines(self):
+        """
+        Test that invalid lines and lines which never make legendary items raise a ValueError.
+        """
+        for update in [{"crafting_time": 0},
+                       {"target_legendary_per_minute": -1},
+                       {"number_of_quality_modules": 0, "number_of_recycler_quality_modules": 0},
+                       {"number_of_quality_modules": 0, "number_of_recycler_quality_modules": 0,
+                        "productivity_boost_from_research": 3}]:
+            with self.assertRaises(ValueError):
+                plan_throughput(ThroughputRequest(lines=[get_product_line(),
+                                                         get_product_line(**update)]))
+
+
+if __name__ == '__main__':
+    unittest.main()